@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, PayrollRecord, SalaryDetails, SalaryRevision
+from .models import Employee, PayrollRecord, SalaryDetails, SalaryRevision, PayrollMonthSummary, PayslipDelivery
 
 admin.site.register(Employee)
 admin.site.register(SalaryRevision)
@@ -12,4 +12,15 @@ class PayrollRecordAdmin(admin.ModelAdmin):
 @admin.register(SalaryDetails)
 class SalaryDetailAdmin(admin.ModelAdmin):
     list_display = ('employee', 'basic_salary', 'housing_allowance', 'transport_allowance', 'other_allowance', 'gross_salary', 'bank_name', 'account_no', 'iban', 'swift_code')
-    readonly_fields = ('gross_salary',)
\ No newline at end of file
+    readonly_fields = ('gross_salary',)
+
+@admin.register(PayrollMonthSummary)
+class PayrollMonthSummaryAdmin(admin.ModelAdmin):
+    list_display = ('month', 'year', 'total_salary', 'total_overtime_days', 'headcount', 'average_salary', 'updated_at')
+    readonly_fields = ('total_salary', 'total_overtime_days', 'headcount', 'average_salary', 'average_overtime_days', 'updated_at')
+
+@admin.register(PayslipDelivery)
+class PayslipDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('payroll_record', 'status', 'attempts', 'sent_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('task_id', 'attempts', 'last_error', 'sent_at', 'updated_at')
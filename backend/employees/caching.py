@@ -0,0 +1,61 @@
+"""
+Versioned cache for the admin aggregate endpoints.
+
+Every cached value is stored under the current aggregates version, so a write only has to
+bump the version to make all previous entries unreachable. Concurrent misses are coalesced:
+the first request takes a short-lived lock and computes, the others wait for its result.
+"""
+import time
+from django.core.cache import cache
+from .constants import (
+    AGGREGATE_CACHE_TIMEOUT, AGGREGATE_CACHE_LOCK_TIMEOUT,
+    AGGREGATE_CACHE_WAIT_TIMEOUT, AGGREGATE_CACHE_POLL_INTERVAL
+)
+
+AGGREGATES_VERSION_KEY = 'employees:aggregates:version'
+_MISSING = object()
+
+
+def get_aggregates_version():
+    """Current aggregates version, started from the clock so an evicted counter never reuses old keys"""
+    version = cache.get(AGGREGATES_VERSION_KEY)
+    if version is None:
+        cache.add(AGGREGATES_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(AGGREGATES_VERSION_KEY)
+    return version
+
+
+def invalidate_aggregates():
+    """Make every cached aggregate stale by moving to a new version"""
+    try:
+        cache.incr(AGGREGATES_VERSION_KEY)
+    except ValueError:
+        get_aggregates_version()
+
+
+def get_or_compute(name, compute, timeout=AGGREGATE_CACHE_TIMEOUT):
+    """Return the cached value of ``name`` or compute it once for all concurrent callers"""
+    key = f'employees:aggregates:{get_aggregates_version()}:{name}'
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=AGGREGATE_CACHE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Another request is computing the value: wait for it instead of recomputing
+    deadline = time.monotonic() + AGGREGATE_CACHE_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(AGGREGATE_CACHE_POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return compute()
@@ -34,3 +34,93 @@ DEFAULT_LEAVE_BALANCES = {
     'emergency_leave_balance': 5.0,
     'other_leave_balance': 5.0,
 }
+
+# Payroll run constants
+# Pay is on a 30-day calendar basis: a day costs basic / 30 in every month, and total_workable_days
+# is the payable days on that basis, entered by hand (30 is a full month). Unpaid leave is counted in
+# calendar days to match; leave balances use the working-day calendar (leaves.working_days) instead.
+PAYROLL_DAYS_PER_MONTH = 30
+DEFAULT_TOTAL_WORKABLE_DAYS = PAYROLL_DAYS_PER_MONTH
+PAYROLL_RUN_BATCH_SIZE = 500
+PAYROLL_ADJUSTMENT_FIELDS = [
+    'overtime_days', 'normal_overtime_days', 'unpaid_days',
+    'total_workable_days', 'other_deductions', 'remarks',
+]
+PAYROLL_RECOMPUTED_FIELDS = [
+    'current_basic_salary', 'current_housing_allowance', 'current_transport_allowance', 'current_other_allowance',
+    'current_gross_salary', 'current_daily_salary',
+    'overtime_amount', 'normal_overtime_amount', 'unpaid_amount', 'total_salary_for_month',
+]
+
+# Payroll simulation constants
+SALARY_COMPONENT_FIELDS = ['basic_salary', 'housing_allowance', 'transport_allowance', 'other_allowance']
+MONTHS_PER_YEAR = 12
+
+# Aggregate cache constants (seconds)
+AGGREGATE_CACHE_TIMEOUT = 5 * 60
+AGGREGATE_CACHE_LOCK_TIMEOUT = 30
+AGGREGATE_CACHE_WAIT_TIMEOUT = 10
+AGGREGATE_CACHE_POLL_INTERVAL = 0.05
+
+# List orderings used for keyset pagination (last field must be unique)
+EMPLOYEE_LIST_ORDERING = ('first_name', 'last_name', 'id')
+SALARY_DETAILS_LIST_ORDERING = ('id',)
+PAYROLL_LIST_ORDERING = ('-year', '-month', '-id')
+
+# Salary slip email delivery
+PAYSLIP_DELIVERY_STATUS_CHOICES = [
+    ('Queued', 'Queued'),
+    ('Sending', 'Sending'),
+    ('Retrying', 'Retrying'),
+    ('Sent', 'Sent'),
+    ('Failed', 'Failed'),
+]
+PAYSLIP_EMAIL_MAX_RETRIES = 5
+PAYSLIP_EMAIL_RETRY_BACKOFF = 30  # seconds, doubled on every retry
+PAYSLIP_EMAIL_RETRY_BACKOFF_MAX = 15 * 60
+PAYSLIP_DISPATCH_BATCH_SIZE = 50
+PAYSLIP_DISPATCH_SEND_INTERVAL = 0.2  # seconds between emails, i.e. at most 300 per minute
+PAYSLIP_DISPATCH_LOCK_TIMEOUT = 60 * 60
+
+# Rendered payslip cache
+PAYSLIP_TEMPLATE_VERSION = 2  # bump whenever the payslip layout changes to retire cached PDFs
+PAYSLIP_EMPLOYEE_FIELDS = ('first_name', 'last_name', 'designation', 'department', 'joining_date')
+PAYSLIP_PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PAYSLIP_PDF_CACHE_EVICT_RATIO = 0.9  # evict down to this share of the cap so each write does not evict again
+
+# Streamed exports
+EXPORT_CHUNK_SIZE = 500  # rows fetched per round trip by the server-side cursor
+
+# Payroll register export: (column header, PayrollRecord lookup). Pay figures come from the record's
+# salary snapshot, never from today's SalaryDetails, so a past month exports the same after a revision.
+PAYROLL_REGISTER_COLUMNS = [
+    ('Employee ID', 'employee_id'),
+    ('Employee Name', 'employee_name'),
+    ('Department', 'employee__department'),
+    ('Designation', 'employee__designation'),
+    ('Month', 'month'),
+    ('Year', 'year'),
+    ('Basic Salary', 'current_basic_salary'),
+    ('Housing Allowance', 'current_housing_allowance'),
+    ('Transport Allowance', 'current_transport_allowance'),
+    ('Other Allowance', 'current_other_allowance'),
+    ('Gross Salary', 'current_gross_salary'),
+    ('Total Workable Days', 'total_workable_days'),
+    ('Holiday Overtime Days', 'overtime_days'),
+    ('Holiday Overtime Amount', 'overtime_amount'),
+    ('Normal Overtime Days', 'normal_overtime_days'),
+    ('Normal Overtime Amount', 'normal_overtime_amount'),
+    ('Unpaid Days', 'unpaid_days'),
+    ('Unpaid Amount', 'unpaid_amount'),
+    ('Other Deductions', 'other_deductions'),
+    ('Net Pay', 'total_salary_for_month'),
+]
+PAYROLL_REGISTER_FORMATS = ('csv', 'xlsx')
+
+# UAE Wage Protection System salary information file (SIF)
+WPS_CURRENCY = 'AED'
+WPS_IBAN_COUNTRY = 'AE'
+WPS_IBAN_LENGTH = 23
+WPS_ROUTING_CODE_LENGTH = 9
+WPS_PERSON_ID_LENGTH = 14
+WPS_EMPLOYER_ID_LENGTH = 13
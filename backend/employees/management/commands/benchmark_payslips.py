@@ -0,0 +1,48 @@
+import datetime
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from employees.models import Employee, PayrollRecord
+from employees.payslip import get_payslip_assets, render_payslip_pdf
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-slip render time of the payslip renderer, without the PDF cache or the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='Number of payslips to render.')
+
+    def handle(self, *args, **options):
+        count = max(options['count'], 1)
+        employee = Employee(first_name='Bench', last_name='Mark', designation='Developer', department='IT',
+                            joining_date=datetime.date(2020, 1, 1))
+        records = [
+            PayrollRecord(
+                id=index, employee=employee, month=index % 12 + 1, year=2025, overtime_days=index % 3,
+                normal_overtime_days=index % 2, unpaid_days=index % 4, other_deductions=Decimal('50.00'),
+                current_basic_salary=Decimal('3000.00'), current_gross_salary=Decimal('4500.00'),
+                total_salary_for_month=Decimal('4400.00')
+            )
+            for index in range(1, count + 1)
+        ]
+
+        get_payslip_assets.cache_clear()
+        start = time.perf_counter()
+        get_payslip_assets()
+        setup = time.perf_counter() - start
+
+        timings = []
+        for record in records:
+            start = time.perf_counter()
+            render_payslip_pdf(employee, record)
+            timings.append(time.perf_counter() - start)
+
+        timings_ms = sorted(timing * 1000 for timing in timings)
+        p95 = timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))]
+        self.stdout.write(f"Shared styles and logo built once in {setup * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {count} payslips: mean {statistics.mean(timings_ms):.2f} ms, "
+            f"median {statistics.median(timings_ms):.2f} ms, p95 {p95:.2f} ms, "
+            f"{count / sum(timings):.0f} slips/s"
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from employees.services import PayrollRunService
+
+
+class Command(BaseCommand):
+    help = 'Create the payroll records of all employees for a month/year in one pass.'
+
+    def add_arguments(self, parser):
+        today = timezone.now().date()
+        parser.add_argument('--month', type=int, default=today.month)
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--allow-missing', action='store_true',
+                            help='Run even if some employees have no salary details (they are skipped).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Compute the payroll without writing any record.')
+
+    def handle(self, *args, **options):
+        month, year = options['month'], options['year']
+        if month < 1 or month > 12:
+            self.stdout.write(self.style.ERROR("Month must be between 1 and 12."))
+            return
+
+        result = PayrollRunService.run_payroll(
+            month, year, allow_missing=options['allow_missing'], dry_run=options['dry_run']
+        )
+
+        for employee in result['missing_salary_details']:
+            self.stdout.write(self.style.WARNING(
+                f"No salary details for {employee['employee_full_name']} (employee {employee['employee']})."
+            ))
+        if not result['completed']:
+            self.stdout.write(self.style.ERROR(
+                "Payroll run aborted. Add the missing salary details or use --allow-missing."
+            ))
+            return
+
+        action = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {result['created']} payroll records for {month}/{year} "
+            f"(total AED {result['total_salary']:.2f}, {len(result['already_processed'])} already processed)."
+        ))
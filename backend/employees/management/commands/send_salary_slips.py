@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from employees.services import PayslipDispatchService
+
+
+class Command(BaseCommand):
+    help = 'Email the salary slips of a month/year that have not been sent yet.'
+
+    def add_arguments(self, parser):
+        today = timezone.now().date()
+        parser.add_argument('--month', type=int, default=today.month)
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes rendering PDFs (defaults to the number of cores).')
+
+    def handle(self, *args, **options):
+        month, year = options['month'], options['year']
+        if month < 1 or month > 12:
+            self.stdout.write(self.style.ERROR("Month must be between 1 and 12."))
+            return
+
+        result = PayslipDispatchService.send_period(month, year, workers=options['workers'])
+        if result is None:
+            self.stdout.write(self.style.ERROR(f"Salary slips for {month}/{year} are already being sent."))
+            return
+
+        for failure in result['failed']:
+            self.stdout.write(self.style.WARNING(
+                f"Payroll record {failure['payroll_record']} failed: {failure['error']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {result['sent']} salary slips for {month}/{year} "
+            f"({result['already_sent']} already sent, {len(result['failed'])} failed)."
+        ))
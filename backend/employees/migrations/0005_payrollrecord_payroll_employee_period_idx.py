@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_alter_employee_father_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payrollrecord',
+            index=models.Index(fields=['employee', 'year', 'month'], name='payroll_employee_period_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:05
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_payroll_month_summary(apps, schema_editor):
+    PayrollRecord = apps.get_model('employees', 'PayrollRecord')
+    PayrollMonthSummary = apps.get_model('employees', 'PayrollMonthSummary')
+    periods = PayrollRecord.objects.values('year', 'month').annotate(
+        total_salary=Sum('total_salary_for_month'),
+        total_overtime_days=Sum('overtime_days'),
+        headcount=Count('id'),
+    )
+    PayrollMonthSummary.objects.bulk_create([
+        PayrollMonthSummary(
+            year=period['year'],
+            month=period['month'],
+            total_salary=period['total_salary'] or Decimal(0),
+            total_overtime_days=period['total_overtime_days'] or 0,
+            headcount=period['headcount'],
+            average_salary=round((period['total_salary'] or Decimal(0)) / period['headcount'], 2),
+            average_overtime_days=round(Decimal(period['total_overtime_days'] or 0) / period['headcount'], 2),
+        )
+        for period in periods
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_payrollrecord_payroll_employee_period_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollMonthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)], verbose_name='Month')),
+                ('year', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1900), django.core.validators.MaxValueValidator(2100)], verbose_name='Year')),
+                ('total_salary', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Salary')),
+                ('total_overtime_days', models.PositiveIntegerField(default=0, verbose_name='Total Holiday Overtime Days')),
+                ('headcount', models.PositiveIntegerField(default=0, verbose_name='Headcount')),
+                ('average_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Average Salary')),
+                ('average_overtime_days', models.DecimalField(decimal_places=2, default=0, max_digits=6, verbose_name='Average Holiday Overtime Days')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payrollrecord',
+            index=models.Index(fields=['year', 'month'], name='payroll_period_idx'),
+        ),
+        migrations.RunPython(backfill_payroll_month_summary, migrations.RunPython.noop),
+    ]
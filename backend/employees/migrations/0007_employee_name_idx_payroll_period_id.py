@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_payrollmonthsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='employee_name_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='payrollrecord',
+            name='payroll_period_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payrollrecord',
+            index=models.Index(fields=['year', 'month', 'id'], name='payroll_period_idx'),
+        ),
+    ]
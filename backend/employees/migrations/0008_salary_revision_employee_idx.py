@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0007_employee_name_idx_payroll_period_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salaryrevision',
+            index=models.Index(fields=['employee', 'revision_date'], name='salary_revision_employee_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0008_salary_revision_employee_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayslipDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Queued', 'Queued'), ('Sending', 'Sending'), ('Retrying', 'Retrying'), ('Sent', 'Sent'), ('Failed', 'Failed')], default='Queued', max_length=10)),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='Job ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payroll_record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payslip_delivery', to='employees.payrollrecord')),
+            ],
+        ),
+    ]
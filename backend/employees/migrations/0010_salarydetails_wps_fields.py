@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_payslipdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salarydetails',
+            name='routing_code',
+            field=models.CharField(blank=True, help_text="Routing code of the employee's bank, the agent ID of the WPS salary file", max_length=9, null=True, verbose_name='Bank Routing Code'),
+        ),
+        migrations.AddField(
+            model_name='salarydetails',
+            name='wps_person_id',
+            field=models.CharField(blank=True, help_text='Labour card personal number used in the WPS salary file', max_length=14, null=True, verbose_name='WPS Person ID'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:58
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_allowances(apps, schema_editor):
+    """Records written before the snapshot take today's salary details, the best figures left for them"""
+    PayrollRecord = apps.get_model('employees', 'PayrollRecord')
+    SalaryDetails = apps.get_model('employees', 'SalaryDetails')
+    salary_details = SalaryDetails.objects.filter(employee_id=models.OuterRef('employee_id'))
+
+    def current(field):
+        return Coalesce(models.Subquery(salary_details.values(field)[:1]), models.Value(0),
+                        output_field=models.DecimalField())
+
+    PayrollRecord.objects.update(**{
+        f'current_{field}': current(field) for field in ('housing_allowance', 'transport_allowance', 'other_allowance')
+    })
+    PayrollRecord.objects.filter(current_basic_salary=0, current_gross_salary=0).update(
+        current_basic_salary=current('basic_salary'), current_gross_salary=current('gross_salary'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_salarydetails_wps_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrecord',
+            name='current_housing_allowance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Housing Allowance'),
+        ),
+        migrations.AddField(
+            model_name='payrollrecord',
+            name='current_transport_allowance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Transport Allowance'),
+        ),
+        migrations.AddField(
+            model_name='payrollrecord',
+            name='current_other_allowance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Other Allowance'),
+        ),
+        migrations.RunPython(backfill_allowances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0011_payrollrecord_allowance_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='payrollrecord',
+            unique_together={('employee', 'year', 'month')},
+        ),
+        migrations.RemoveIndex(
+            model_name='payrollrecord',
+            name='payroll_employee_period_idx',
+        ),
+    ]
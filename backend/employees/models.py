@@ -8,7 +8,7 @@ import datetime
 from .constants import (
     DEPARTMENT_CHOICES, GENDER_CHOICES, MARITAL_CHOICES,
     MAX_FILE_SIZE, VALID_FILE_EXTENSIONS, VALID_MIME_TYPES,
-    DEFAULT_CHILDREN_COUNT, DEFAULT_LEAVE_BALANCES
+    DEFAULT_CHILDREN_COUNT, DEFAULT_LEAVE_BALANCES, PAYSLIP_DELIVERY_STATUS_CHOICES
 )
 
 class Employee(models.Model):
@@ -74,6 +74,11 @@ class Employee(models.Model):
     blood_group = models.CharField(max_length=10, verbose_name='Blood Group', blank=True, null=True)
     allergies = models.TextField(verbose_name='Allergies', blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_name', 'last_name', 'id'], name='employee_name_idx'),
+        ]
+
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
 
@@ -89,6 +94,10 @@ class SalaryDetails(models.Model):
     account_no = models.CharField(max_length=100, verbose_name='Account No', blank=True, null=True)
     iban = models.CharField(max_length=100, verbose_name='IBAN', blank=True, null=True)
     swift_code = models.CharField(max_length=100, verbose_name='SWIFT Code', blank=True, null=True)
+    routing_code = models.CharField(max_length=9, verbose_name='Bank Routing Code', blank=True, null=True,
+                                    help_text='Routing code of the employee\'s bank, the agent ID of the WPS salary file')
+    wps_person_id = models.CharField(max_length=14, verbose_name='WPS Person ID', blank=True, null=True,
+                                     help_text='Labour card personal number used in the WPS salary file')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -132,6 +141,7 @@ class PayrollRecord(models.Model):
     unpaid_days = models.PositiveIntegerField(default=0, verbose_name="Unpaid Days")
     unpaid_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0, verbose_name="Unpaid Amount")
+    # Payable days on the 30-day basis, entered by hand; see PAYROLL_DAYS_PER_MONTH
     total_workable_days = models.PositiveIntegerField(default=30, verbose_name="Total Workable Days")
     other_deductions = models.DecimalField(
         max_digits=10, decimal_places=2, default=0, verbose_name="Other Deductions")
@@ -141,16 +151,31 @@ class PayrollRecord(models.Model):
         max_digits=10, decimal_places=2, default=0, verbose_name="Gross Salary")
     current_basic_salary = models.DecimalField(
         max_digits=10, decimal_places=2, default=0, verbose_name="Basic Salary")
+    current_housing_allowance = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Housing Allowance")
+    current_transport_allowance = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Transport Allowance")
+    current_other_allowance = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Other Allowance")
     remarks = models.TextField(blank=True, null=True, verbose_name="Remarks")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('employee', 'month', 'year')
+        # In period order, so the unique index also serves an employee's records by period
+        unique_together = ('employee', 'year', 'month')
+        indexes = [
+            models.Index(fields=['year', 'month', 'id'], name='payroll_period_idx'),
+        ]
 
-    def calculate_salary(self):
+    def calculate_salary(self, salary_details=None):
+        """
+        Calculate the month's total salary. Pass ``salary_details`` when it is
+        already loaded to avoid the lazy ``employee.salary_details`` lookup.
+        """
         try:
-            if self.total_workable_days == 30:
+            if salary_details is None:
                 salary_details = self.employee.salary_details
+            if self.total_workable_days == 30:
                 basic_salary = Decimal(salary_details.basic_salary)
                 daily_salary = basic_salary / Decimal(30)
                 overtime = self.overtime_days * (daily_salary * Decimal(1.5))
@@ -158,7 +183,6 @@ class PayrollRecord(models.Model):
                 unpaid_deduction = self.unpaid_days * daily_salary
                 return (Decimal(salary_details.gross_salary) + overtime + normal_overtime) - (unpaid_deduction + self.other_deductions)
             if self.total_workable_days < 30:
-                salary_details = self.employee.salary_details
                 daily_salary_gross = Decimal(salary_details.gross_salary) / Decimal(30) # Daily salary in terms of Gross
                 daily_salary_basic = Decimal(salary_details.basic_salary) / Decimal(30) # Daily salary in terms of Basic
                 salary_of_month = Decimal(daily_salary_gross) * Decimal(self.total_workable_days)
@@ -166,14 +190,78 @@ class PayrollRecord(models.Model):
         except AttributeError:
             raise ValidationError("Salary details for this employee are not defined.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember what the loaded row adds to the month's rollup, so a save only applies the difference"""
+        instance = super().from_db(db, field_names, values)
+        instance._remember_rollup_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_rollup_values()
+
+    def _remember_rollup_values(self):
+        fields = ('year', 'month', 'total_salary_for_month', 'overtime_days')
+        if all(field in self.__dict__ for field in fields):
+            from .services import PayrollSummaryService
+            self._rollup_values = PayrollSummaryService.get_rollup_values(self)
+        else:
+            self.__dict__.pop('_rollup_values', None)
+
+    def snapshot_salary(self, salary_details):
+        """Copy the salary components the record is paid on, so later revisions do not change its figures"""
+        self.current_basic_salary = salary_details.basic_salary
+        self.current_housing_allowance = salary_details.housing_allowance or 0
+        self.current_transport_allowance = salary_details.transport_allowance or 0
+        self.current_other_allowance = salary_details.other_allowance or 0
+        self.current_gross_salary = salary_details.gross_salary
+
     def save(self, *args, **kwargs):
         self.total_salary_for_month = self.calculate_salary()
+        if self._state.adding:
+            self.snapshot_salary(self.employee.salary_details)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Payroll for {self.employee.first_name} {self.employee.last_name} ({self.month}/{self.year})"
 
 
+class PayslipDelivery(models.Model):
+    """Email delivery status of a payroll record's salary slip, updated by the send task"""
+    payroll_record = models.OneToOneField(PayrollRecord, on_delete=models.CASCADE, related_name='payslip_delivery')
+    status = models.CharField(max_length=10, choices=PAYSLIP_DELIVERY_STATUS_CHOICES, default='Queued')
+    task_id = models.CharField(max_length=255, blank=True, verbose_name="Job ID")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Salary slip delivery for payroll {self.payroll_record_id}: {self.status}"
+
+
+class PayrollMonthSummary(models.Model):
+    """Per-month rollup of PayrollRecord, kept up to date by the employees signals"""
+    month = models.PositiveIntegerField(verbose_name="Month", validators=[
+        MinValueValidator(1), MaxValueValidator(12)])
+    year = models.PositiveIntegerField(verbose_name="Year", validators=[
+        MinValueValidator(1900), MaxValueValidator(2100)])
+    total_salary = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total Salary")
+    total_overtime_days = models.PositiveIntegerField(default=0, verbose_name="Total Holiday Overtime Days")
+    headcount = models.PositiveIntegerField(default=0, verbose_name="Headcount")
+    average_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Average Salary")
+    average_overtime_days = models.DecimalField(max_digits=6, decimal_places=2, default=0, verbose_name="Average Holiday Overtime Days")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('year', 'month')
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        return f"Payroll summary ({self.month}/{self.year})"
+
+
 class SalaryRevision(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='salary_revisions')
     revised_basic_salary = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Revised Basic Salary')
@@ -189,6 +277,11 @@ class SalaryRevision(models.Model):
     revision_date = models.DateTimeField(auto_now_add=True, verbose_name='Revision Date')
     revised_salary_effective_from = models.DateField(verbose_name='Revised Salary Effective From')
     revision_reason = models.TextField(verbose_name='Reason for Revision')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'revision_date'], name='salary_revision_employee_idx'),
+        ]
     
     def __str__(self):
         return f"Salary Revision for {self.employee.first_name} {self.employee.last_name} on {self.revision_date}"
@@ -197,6 +290,12 @@ class SalaryRevision(models.Model):
         self.revised_gross_salary = self.calculate_revised_gross_salary()
         super().save(*args, **kwargs)
         self.update_salary_details()
+        self.recomputed_payroll = self.recompute_payroll()
+
+    def recompute_payroll(self):
+        """Recompute payroll records from the effective month onwards using service layer"""
+        from .services import PayrollRecomputeService
+        return PayrollRecomputeService.recompute_for_revision(self)
 
     def update_salary_details(self):
         try:
@@ -0,0 +1,174 @@
+"""
+The single payslip renderer, shared by the download endpoint and the salary slip emails.
+
+Styles, table styles and the decoded company logo are built once per process and reused
+by every render, so a slip only pays for laying out its own figures.
+"""
+import io
+import logging
+from functools import lru_cache
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable
+from .pdf_cache import payslip_pdf_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_PDF_SIZE = 10 * 1024 * 1024  # 10MB
+PAYSLIP_PDF_VARIANT = 'payslip'
+LOGO_WIDTH, LOGO_HEIGHT = 100, 40
+
+
+class LogoFlowable(Flowable):
+    """Draws the already decoded logo, so the image file is not opened and decoded on every render"""
+
+    def __init__(self, image):
+        super().__init__()
+        self.image = image
+        self.width, self.height = LOGO_WIDTH, LOGO_HEIGHT
+        self.hAlign = 'LEFT'
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height, mask='auto')
+
+
+def load_logo():
+    """Read and decode the company logo, or None when it is missing"""
+    logo_path = getattr(settings, 'COMPANY_LOGO_PATH', 'media/company-images/logo.png')
+    try:
+        with open(logo_path, 'rb') as logo_file:
+            image = ImageReader(io.BytesIO(logo_file.read()))
+        image.getRGBData()  # decode now rather than in the first render
+        return image
+    except Exception as e:
+        # Log error but don't crash the PDF generation
+        logger.warning('Logo not found at %s: %s', logo_path, e)
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_payslip_assets():
+    """Styles and logo shared by every render in this process"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle("title", parent=styles["Heading1"], fontSize=16, textColor=colors.black, alignment=1),
+        'normal': styles["BodyText"],
+        'logo': load_logo(),
+        'details': TableStyle([
+            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+        ]),
+        'earnings_deductions': TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+            ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ]),
+        'net_pay': TableStyle([
+            ("BACKGROUND", (0, 0), (-1, -1), colors.beige),
+            ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+        ]),
+    }
+
+
+def get_payslip_amounts(payroll_record):
+    """The figures printed on the payslip"""
+    basic_salary = round(float(payroll_record.current_basic_salary or 0), 2)
+    gross_salary = round(float(payroll_record.current_gross_salary or 0), 2)
+    unpaid_days = payroll_record.unpaid_days or 0
+    other_deductions = round(float(payroll_record.other_deductions or 0), 2)
+
+    daily_salary_gross = round(gross_salary / 30 if gross_salary else 0, 2)
+    non_working_days = 30 - payroll_record.total_workable_days or 0
+    non_working_days_amount = round(daily_salary_gross * non_working_days, 2)
+    daily_salary = round(basic_salary / 30 if basic_salary else 0, 2)
+    unpaid_leaves_amount = round(daily_salary * unpaid_days, 2)
+    holiday_overtime_amount = round((payroll_record.overtime_days or 0) * 1.5 * daily_salary, 2)
+    normal_overtime_amount = round((payroll_record.normal_overtime_days or 0) * 1.25 * daily_salary, 2)
+
+    return {
+        'basic_salary': basic_salary,
+        'gross_salary': gross_salary,
+        'daily_salary_gross': daily_salary_gross,
+        'worked_days': payroll_record.total_workable_days - unpaid_days,
+        'unpaid_leaves_amount': unpaid_leaves_amount,
+        'holiday_overtime_amount': holiday_overtime_amount,
+        'normal_overtime_amount': normal_overtime_amount,
+        'other_deductions': other_deductions,
+        'non_working_days_amount': non_working_days_amount,
+        'total_earnings': gross_salary + holiday_overtime_amount + normal_overtime_amount,
+        'total_deductions': round(unpaid_leaves_amount + other_deductions + non_working_days_amount, 2),
+        'net_pay': round(float(payroll_record.total_salary_for_month or 0), 2),
+    }
+
+
+def render_payslip_pdf(employee, payroll_record):
+    """Render a payslip and return the PDF bytes"""
+    assets = get_payslip_assets()
+    amounts = get_payslip_amounts(payroll_record)
+    buffer = io.BytesIO()
+    pdf = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=20, leftMargin=20, topMargin=40, bottomMargin=20)
+    pdf.title = f"Payslip - {employee.first_name} {employee.last_name} - {payroll_record.month}/{payroll_record.year}"
+
+    elements = []
+    if assets['logo'] is not None:
+        elements.append(LogoFlowable(assets['logo']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph("<b>Payslip</b>", assets['title']))
+    elements.append(Spacer(1, 20))
+
+    details_table = Table([
+        ["Date of Joining:", str(employee.joining_date), "Employee Name:", f"{employee.first_name} {employee.last_name}"],
+        ["Pay Period:", f"{payroll_record.month}/{payroll_record.year}", "Designation:", employee.designation],
+        ["Worked Days:", f"{amounts['worked_days']}", "Department:", employee.department],
+        ["Basic Salary:", amounts['basic_salary'], "Per day Salary:", amounts['daily_salary_gross']],
+    ], colWidths=[150, 100, 150, 100])
+    details_table.setStyle(assets['details'])
+    elements.append(details_table)
+    elements.append(Spacer(1, 20))
+
+    # Earnings and Deductions table
+    earnings_deductions_table = Table([
+        ["Earnings", "Amount (AED)", "Deductions", "Amount (AED)"],
+        ["Monthly Gross Salary", f"AED {amounts['gross_salary']:.2f}",
+         "Unpaid Leaves", f"AED {amounts['unpaid_leaves_amount']:.2f}"],
+        ["Holiday Overtime", f"AED {amounts['holiday_overtime_amount']:.2f}",
+         "Other Deductions", f"AED {amounts['other_deductions']:.2f}"],
+        ["Normal Overtime", f"AED {amounts['normal_overtime_amount']:.2f}",
+         "Non Working Days Amount", f" AED {amounts['non_working_days_amount']:.2f}"],
+        ["Total Earnings", f"AED {amounts['total_earnings']:.2f}",
+         "Total Deductions", f"AED {amounts['total_deductions']:.2f}"],
+    ], colWidths=[150, 100, 150, 100])
+    earnings_deductions_table.setStyle(assets['earnings_deductions'])
+    elements.append(earnings_deductions_table)
+    elements.append(Spacer(1, 20))
+
+    # Net Pay
+    net_pay_table = Table([["Net Pay:", f"AED {amounts['net_pay']:.2f}"]], colWidths=[150, 300])
+    net_pay_table.setStyle(assets['net_pay'])
+    elements.append(net_pay_table)
+
+    # Footer
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph(
+        "<font size=10><i>This is a system-generated payslip. No signature required.</i></font>", assets['normal']
+    ))
+
+    pdf.build(elements)
+    pdf_content = buffer.getvalue()
+    if len(pdf_content) > MAX_PDF_SIZE:
+        raise Exception("Generated PDF is too large")
+    return pdf_content
+
+
+def get_payslip_pdf(payroll_record):
+    """The payslip PDF of a record, rendered once and then served from the PDF cache"""
+    return payslip_pdf_cache.get_or_render(payroll_record, PAYSLIP_PDF_VARIANT, render_payslip_pdf)
+
@@ -0,0 +1,201 @@
+"""
+Content-addressed disk cache for rendered payslip PDFs.
+
+A payslip is stored under a hash of everything it is rendered from: the payroll record's
+fields, the employee fields printed on it and the template version. A changed record hashes
+to a new name, so a stale PDF is never served, and the old file is dropped when the new one
+is written. Each record's files live in a subdirectory named after it, so dropping a record's
+renders only lists that subdirectory. The cache is capped in size and the least recently served
+files go first.
+Its size is tracked in the Django cache, so a write only scans the directory when it goes over
+the cap (or when nothing is tracked yet).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+from .constants import (
+    PAYSLIP_TEMPLATE_VERSION, PAYSLIP_EMPLOYEE_FIELDS,
+    PAYSLIP_PDF_CACHE_MAX_BYTES, PAYSLIP_PDF_CACHE_EVICT_RATIO
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PayslipPDFCache:
+    """Rendered payslips on disk, one file per record and variant"""
+
+    def get_directory(self):
+        directory = getattr(settings, 'PAYSLIP_PDF_CACHE_DIR', None) or os.path.join(
+            tempfile.gettempdir(), 'payroll-payslip-cache'
+        )
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        return directory
+
+    def get_max_bytes(self):
+        return getattr(settings, 'PAYSLIP_PDF_CACHE_MAX_BYTES', PAYSLIP_PDF_CACHE_MAX_BYTES)
+
+    def get_size_key(self):
+        directory = hashlib.sha256(self.get_directory().encode()).hexdigest()[:16]
+        return f'employees:payslip-pdf-cache:bytes:{directory}'
+
+    def get_record_directory(self, payroll_id):
+        return os.path.join(self.get_directory(), str(payroll_id))
+
+    def get_files(self):
+        """``(last served, size, path)`` of every cached PDF, in the record subdirectories"""
+        files = []
+        with os.scandir(self.get_directory()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    files.extend(self._scan(entry.path))
+        return files
+
+    @staticmethod
+    def _scan(directory):
+        """``(last served, size, path)`` of the PDFs directly in ``directory``"""
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.pdf'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return files
+
+    def add_size(self, delta):
+        """Add ``delta`` bytes to the tracked directory size and return it; counted from disk when not tracked yet"""
+        key = self.get_size_key()
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            size = sum(file_size for _, file_size, _ in self.get_files())
+            cache.set(key, size, timeout=None)
+            return size
+
+    def get_key(self, payroll_record, variant):
+        """Hash of the record's fields, the printed employee fields, the template version and the variant"""
+        employee = payroll_record.employee
+        content = {
+            'version': PAYSLIP_TEMPLATE_VERSION,
+            'variant': variant,
+            'payroll': {field.attname: getattr(payroll_record, field.attname)
+                        for field in payroll_record._meta.concrete_fields},
+            'employee': {field: getattr(employee, field) for field in PAYSLIP_EMPLOYEE_FIELDS},
+        }
+        encoded = json.dumps(content, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get_path(self, payroll_record, variant):
+        name = f'{variant}-{self.get_key(payroll_record, variant)}.pdf'
+        return os.path.join(self.get_record_directory(payroll_record.pk), name)
+
+    def get(self, payroll_record, variant):
+        """Cached PDF bytes, or None on a miss. A hit refreshes the file's position in the LRU order."""
+        path = self.get_path(payroll_record, variant)
+        try:
+            with open(path, 'rb') as pdf_file:
+                content = pdf_file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return content
+
+    def put(self, payroll_record, variant, content):
+        """Write atomically, drop the record's older renders and keep the directory under its cap"""
+        path = self.get_path(payroll_record, variant)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.purge(payroll_record.pk, variant, keep=path)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as temp_file:
+                temp_file.write(content)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self.add_size(len(content) - replaced) > self.get_max_bytes():
+            self.evict()
+
+    def get_or_render(self, payroll_record, variant, render):
+        """Serve the cached PDF, rendering and storing it with ``render(employee, payroll_record)`` on a miss"""
+        content = self.get(payroll_record, variant)
+        if content is None:
+            content = render(payroll_record.employee, payroll_record)
+            try:
+                self.put(payroll_record, variant, content)
+            except OSError:
+                # A full or read-only disk only costs the next render
+                logger.warning('Could not cache payslip %s', payroll_record.pk, exc_info=True)
+        return content
+
+    def purge(self, payroll_id, variant=None, keep=None):
+        """Remove the cached renders of a payroll record, of one variant or all of them, except the ``keep`` path"""
+        directory = self.get_record_directory(payroll_id)
+        prefix = f'{variant}-' if variant else ''
+        freed = 0
+        for _, _, path in self._scan(directory):
+            if os.path.basename(path).startswith(prefix) and path != keep:
+                freed += self._remove(path)
+        if variant is None:
+            self._remove_directory(directory)
+        if freed:
+            self.add_size(-freed)
+
+    def evict(self):
+        """Remove the least recently served files once the directory is over its cap, and re-count its size"""
+        max_bytes = self.get_max_bytes()
+        files = self.get_files()
+        total = sum(size for _, size, _ in files)
+        if total > max_bytes:
+            target = max_bytes * PAYSLIP_PDF_CACHE_EVICT_RATIO
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                total -= self._remove(path)
+        # Reset from disk, which also corrects any drift from other processes' writes
+        cache.set(self.get_size_key(), total, timeout=None)
+
+    def clear(self):
+        for _, _, path in self.get_files():
+            self._remove(path)
+        with os.scandir(self.get_directory()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    self._remove_directory(entry.path)
+        cache.delete(self.get_size_key())
+
+    @staticmethod
+    def _remove_directory(directory):
+        """Delete a record's subdirectory if it is empty"""
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        """Delete a cached file and return the bytes freed"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+
+payslip_pdf_cache = PayslipPDFCache()
@@ -1,12 +1,54 @@
 from rest_framework import serializers
-from .models import Employee, SalaryDetails, PayrollRecord, SalaryRevision
+from .models import Employee, SalaryDetails, PayrollRecord, SalaryRevision, PayslipDelivery
 from users.serializers import CustomUserSerializer
+from .constants import PAYROLL_ADJUSTMENT_FIELDS
 from decimal import Decimal
-from django.db.models import Sum, F, Count
-from django.utils import timezone
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Lets clients choose the serialized fields with ``?fields=a,b`` or ``?omit=c,d``.
+    Views pass ``request.query_params`` as the ``query_params`` context entry and use
+    ``restrict_queryset`` so that only the columns behind the kept fields are fetched.
+    """
+    # Serializer fields that are computed from other model columns
+    fieldset_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        query_params = self.context.get('query_params')
+        if query_params is None:
+            return
+        kept = self.get_kept_fields(query_params, self.fields.keys())
+        for name in list(self.fields.keys()):
+            if name not in kept:
+                self.fields.pop(name)
+
+    @staticmethod
+    def parse_field_list(value):
+        return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+    @classmethod
+    def get_kept_fields(cls, query_params, available):
+        available = set(available)
+        requested = cls.parse_field_list(query_params.get('fields')) & available
+        kept = requested or available
+        return kept - cls.parse_field_list(query_params.get('omit'))
+
+    @classmethod
+    def restrict_queryset(cls, queryset, query_params, required=()):
+        """Limit the queryset to the columns the kept fields need, plus ``required`` (e.g. ordering fields)"""
+        if 'fields' not in query_params and 'omit' not in query_params:
+            return queryset
+        kept = cls.get_kept_fields(query_params, cls().fields.keys())
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = set(name.lstrip('-') for name in required)
+        for name in kept:
+            columns.update(cls.fieldset_sources.get(name, [name]))
+        return queryset.only(*(columns & model_fields))
+
+
+class EmployeeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Employee
         fields = '__all__'
@@ -52,7 +94,7 @@ class SalaryDetailsSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'employee', 'employee_full_name', 'basic_salary', 'housing_allowance', 
             'transport_allowance', 'other_allowance', 'gross_salary', 'bank_name', 
-            'account_no', 'iban', 'swift_code', 'created_at', 'updated_at',
+            'account_no', 'iban', 'swift_code', 'routing_code', 'wps_person_id', 'created_at', 'updated_at',
         ]
         read_only_fields = ['id', 'gross_salary', 'created_at', 'updated_at']
 
@@ -93,7 +135,7 @@ class PayrollRecordSerializer(serializers.ModelSerializer):
         Example: Ensure the month and year are valid.
         """
         month = data.get('month')
-        if month < 1 or month > 12:
+        if month is not None and (month < 1 or month > 12):
             raise serializers.ValidationError({"month": "Month must be between 1 and 12."})
         return data
 
@@ -121,9 +163,26 @@ class PayrollRecordSerializer(serializers.ModelSerializer):
             return None
 
 
+class PayrollAdjustmentSerializer(serializers.ModelSerializer):
+    """One employee's overrides for a payroll run; only the fields sent are applied"""
+    employee = serializers.IntegerField(min_value=1)
 
+    class Meta:
+        model = PayrollRecord
+        fields = ['employee', *PAYROLL_ADJUSTMENT_FIELDS]
+
+
+class PayrollRunSerializer(serializers.Serializer):
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    year = serializers.IntegerField(min_value=1900, max_value=2100)
+    adjustments = PayrollAdjustmentSerializer(many=True, required=False)
+    allow_missing = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
 
-class EmployeeDetailsWithSalarySerializer(serializers.ModelSerializer):
+
+
+
+class EmployeeDetailsWithSalarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     salary_details = SalaryDetailsSerializer(read_only=True)
     # payroll_records = PayrollRecordSerializer(many=True, read_only=True, source='payrollrecord_set')
 
@@ -135,8 +194,9 @@ class EmployeeDetailsWithSalarySerializer(serializers.ModelSerializer):
         ]
 
 
-class ColleagueSerializer(serializers.ModelSerializer):
+class ColleagueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
+    fieldset_sources = {'full_name': ['first_name', 'last_name']}
 
     class Meta:
         model = Employee
@@ -156,74 +216,6 @@ class DashboardSerializer(serializers.Serializer):
     monthly_data = serializers.ListField(child=serializers.DictField())
     total_employees = serializers.IntegerField()
     average_salary_for_month = serializers.DecimalField(max_digits=10, decimal_places=2)
-
-    def to_representation(self, instance):
-        # Get the current year and month
-        today = timezone.now()
-        current_month = today.month
-        current_year = today.year
-        previous_month = current_month - 1 if current_month > 1 else 12
-        previous_month_year = current_year if current_month > 1 else current_year - 1
-
-        # Get total salary for the current month
-        total_salary_for_month = PayrollRecord.objects.filter(
-            month=current_month, year=current_year
-        ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-        # Get total overtime for the current month
-        total_overtime_for_month = PayrollRecord.objects.filter(
-            month=current_month, year=current_year
-        ).aggregate(total_overtime=Sum('overtime_days'))['total_overtime'] or Decimal(0)
-
-        # Get previous month's total salary
-        previous_month_salary = PayrollRecord.objects.filter(
-            month=previous_month, year=previous_month_year
-        ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-        # Get previous month's total overtime
-        previous_month_overtime = PayrollRecord.objects.filter(
-            month=previous_month, year=previous_month_year
-        ).aggregate(total_overtime=Sum('overtime_days'))['total_overtime'] or Decimal(0)
-
-        # Gather monthly totals for all months available in the PayrollRecord database
-        monthly_data = PayrollRecord.objects.values('year', 'month').annotate(
-            total_salary=Sum('total_salary_for_month'),
-            total_overtime=Sum('overtime_days')
-        ).order_by('-year', '-month')
-
-        # Prepare monthly data in a list of dicts format for serialization
-        monthly_data_list = [
-            {
-                'month': data['month'],
-                'year': data['year'],
-                'total_salary': data['total_salary'] or Decimal(0),
-                'total_overtime': data['total_overtime'] or Decimal(0),
-            }
-            for data in monthly_data
-        ]
-
-        # Get the total number of employees
-        total_employees = Employee.objects.count()
-
-        # Calculate the average salary for the current month
-        # Get the total salary of all employees for the current month
-        total_salary_current_month = PayrollRecord.objects.filter(
-            month=current_month, year=current_year
-        ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-        # Calculate the average salary if there are employees
-        average_salary_for_month = total_salary_current_month / total_employees if total_employees > 0 else Decimal(0)
-
-        # Return the aggregated data including the total number of employees and average salary
-        return {
-            'total_salary_for_month': total_salary_for_month,
-            'total_overtime_for_month': total_overtime_for_month,
-            'previous_month_salary': previous_month_salary,
-            'previous_month_overtime': previous_month_overtime,
-            'monthly_data': monthly_data_list,
-            'total_employees': total_employees,
-            'average_salary_for_month': average_salary_for_month, 
-        }
     
 
 
@@ -254,4 +246,13 @@ class SalaryRevisionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SalaryRevision
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class PayslipDeliverySerializer(serializers.ModelSerializer):
+    job_id = serializers.CharField(source='task_id', read_only=True)
+
+    class Meta:
+        model = PayslipDelivery
+        fields = ['payroll_record', 'status', 'job_id', 'attempts', 'last_error', 'sent_at', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,844 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction, IntegrityError
+from django.db.models import F, Q, Sum, Count, OuterRef, Subquery, Value, Case, When, FloatField
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from decimal import Decimal, InvalidOperation
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import calendar
+import csv
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import smtplib
+import time
+import uuid
+import zipfile
+from .caching import get_or_compute, invalidate_aggregates
+from .models import Employee, SalaryDetails, PayrollRecord, PayrollMonthSummary, SalaryRevision, PayslipDelivery
+from .payslip import get_payslip_pdf
+from leaves.services import LeaveService
+from .constants import (
+    DEFAULT_TOTAL_WORKABLE_DAYS, PAYROLL_DAYS_PER_MONTH, PAYROLL_RUN_BATCH_SIZE, PAYROLL_ADJUSTMENT_FIELDS,
+    DEPARTMENT_CHOICES, SALARY_COMPONENT_FIELDS, MONTHS_PER_YEAR, PAYROLL_RECOMPUTED_FIELDS,
+    PAYSLIP_EMAIL_RETRY_BACKOFF, PAYSLIP_EMAIL_RETRY_BACKOFF_MAX,
+    PAYSLIP_DISPATCH_BATCH_SIZE, PAYSLIP_DISPATCH_SEND_INTERVAL, PAYSLIP_DISPATCH_LOCK_TIMEOUT,
+    EXPORT_CHUNK_SIZE, PAYROLL_REGISTER_COLUMNS, WPS_CURRENCY, WPS_IBAN_COUNTRY, WPS_IBAN_LENGTH,
+    WPS_ROUTING_CODE_LENGTH, WPS_PERSON_ID_LENGTH, WPS_EMPLOYER_ID_LENGTH
+)
+
+
+class PayrollRunService:
+    """Service class for building a month's payroll for all employees in one pass"""
+
+    @staticmethod
+    def get_employees_without_salary_details():
+        """Pre-flight check: employees that cannot be paid because they have no salary details"""
+        return [
+            {'employee': employee['id'], 'employee_full_name': f"{employee['first_name']} {employee['last_name']}"}
+            for employee in Employee.objects.filter(salary_details__isnull=True).values('id', 'first_name', 'last_name')
+        ]
+
+    @staticmethod
+    def build_payroll_record(salary_details, month, year, adjustment=None):
+        """Build an unsaved payroll record with every amount computed in memory"""
+        adjustment = adjustment or {}
+        record = PayrollRecord(
+            employee_id=salary_details.employee_id,
+            month=month,
+            year=year,
+            **{field: adjustment[field] for field in PAYROLL_ADJUSTMENT_FIELDS if field in adjustment}
+        )
+        for field in ('overtime_days', 'normal_overtime_days', 'unpaid_days', 'total_workable_days'):
+            setattr(record, field, int(getattr(record, field)))
+        record.other_deductions = Decimal(str(record.other_deductions or 0))
+        PayrollRunService.apply_salary_details(record, salary_details)
+        if record.total_salary_for_month is None:
+            raise ValidationError(f"Total workable days cannot exceed {DEFAULT_TOTAL_WORKABLE_DAYS}.")
+        return record
+
+    @staticmethod
+    def apply_salary_details(record, salary_details):
+        """Fill a payroll record's salary snapshot, overtime/unpaid amounts and total from salary details"""
+        daily_salary = Decimal(salary_details.basic_salary) / Decimal(30)
+        record.snapshot_salary(salary_details)
+        record.current_daily_salary = round(daily_salary, 2)
+        record.overtime_amount = round(record.overtime_days * daily_salary * Decimal(1.5), 2)
+        record.normal_overtime_amount = round(record.normal_overtime_days * daily_salary * Decimal(1.25), 2)
+        record.unpaid_amount = round(record.unpaid_days * daily_salary, 2)
+        total = record.calculate_salary(salary_details)
+        # Rounded as the column stores it, so run totals and rollup deltas add up the stored values
+        record.total_salary_for_month = None if total is None else round(total, 2)
+        return record
+
+    @staticmethod
+    def get_unpaid_leave_days(month, year):
+        """
+        Calendar days of approved unpaid leave inside the month, per employee id, at most
+        PAYROLL_DAYS_PER_MONTH. calculate_salary prices a day at basic / 30 whatever the month, so
+        unpaid days are counted on that calendar basis too: weekends inside an unpaid leave are
+        unpaid, and a whole month of unpaid leave deducts exactly the basic salary.
+        """
+        month_start = datetime.date(year, month, 1)
+        month_end = datetime.date(year, month, calendar.monthrange(year, month)[1])
+        unpaid_days = defaultdict(int)
+        leaves = LeaveService.get_leaves_between(month_start, month_end).filter(status='Approved', leave_type='Unpaid')
+        for employee_id, start_date, end_date in leaves.values_list('employee_id', 'start_date', 'end_date'):
+            unpaid_days[employee_id] += (min(end_date, month_end) - max(start_date, month_start)).days + 1
+        return {employee_id: min(days, PAYROLL_DAYS_PER_MONTH) for employee_id, days in unpaid_days.items()}
+
+    @staticmethod
+    def run_payroll(month, year, adjustments=None, allow_missing=False, dry_run=False):
+        """
+        Create the payroll records of every employee for a month/year.
+        ``adjustments`` maps an employee id to overrides such as overtime or unpaid days.
+        Unpaid days default to the employee's approved unpaid leave in the month, in calendar days.
+        Employees that already have a record for the period are left untouched.
+        """
+        adjustments = adjustments or {}
+        result = {
+            'month': month,
+            'year': year,
+            'missing_salary_details': PayrollRunService.get_employees_without_salary_details(),
+            'already_processed': [],
+            'created': 0,
+            'total_salary': Decimal(0),
+            'completed': False,
+        }
+        if result['missing_salary_details'] and not allow_missing:
+            return result
+
+        existing = set(
+            PayrollRecord.objects.filter(month=month, year=year).values_list('employee_id', flat=True)
+        )
+        unpaid_leave_days = PayrollRunService.get_unpaid_leave_days(month, year)
+        records = []
+        for salary_details in SalaryDetails.objects.all():
+            if salary_details.employee_id in existing:
+                result['already_processed'].append(salary_details.employee_id)
+                continue
+            adjustment = adjustments.get(salary_details.employee_id) or {}
+            if 'unpaid_days' not in adjustment and unpaid_leave_days.get(salary_details.employee_id):
+                adjustment = {**adjustment, 'unpaid_days': unpaid_leave_days[salary_details.employee_id]}
+            records.append(PayrollRunService.build_payroll_record(salary_details, month, year, adjustment))
+
+        if not dry_run:
+            with transaction.atomic():
+                PayrollRecord.objects.bulk_create(records, batch_size=PAYROLL_RUN_BATCH_SIZE)
+                # bulk_create does not send post_save, so add the records to the month's rollup here
+                PayrollSummaryService.apply_delta(
+                    year, month, total_salary=sum((record.total_salary_for_month for record in records), Decimal(0)),
+                    overtime_days=sum(record.overtime_days for record in records), headcount=len(records),
+                )
+                transaction.on_commit(invalidate_aggregates)
+
+        result['created'] = len(records)
+        result['total_salary'] = sum((record.total_salary_for_month for record in records), Decimal(0))
+        result['completed'] = True
+        return result
+
+
+class PayrollRecomputeService:
+    """Service class for bringing saved payroll records in line with revised salary details"""
+
+    @staticmethod
+    def get_affected_records(employee, effective_from):
+        """Payroll records of the employee from the effective month onwards (served by the employee/period unique index)"""
+        return PayrollRecord.objects.filter(employee=employee).filter(
+            Q(year__gt=effective_from.year) | Q(year=effective_from.year, month__gte=effective_from.month)
+        ).order_by('year', 'month')
+
+    @staticmethod
+    def recompute_for_revision(revision):
+        """
+        Recompute the payroll records affected by a salary revision in one bulk update.
+        Returns the periods whose total changed with their previous and new totals.
+        """
+        salary_details = SalaryDetails.objects.get(employee_id=revision.employee_id)
+        records = list(PayrollRecomputeService.get_affected_records(
+            revision.employee_id, revision.revised_salary_effective_from
+        ))
+
+        changes = []
+        for record in records:
+            previous_total = record.total_salary_for_month
+            PayrollRunService.apply_salary_details(record, salary_details)
+            if record.total_salary_for_month != previous_total:
+                changes.append({
+                    'id': record.id,
+                    'month': record.month,
+                    'year': record.year,
+                    'previous_total_salary': previous_total,
+                    'total_salary': record.total_salary_for_month,
+                })
+
+        if records:
+            with transaction.atomic():
+                PayrollRecord.objects.bulk_update(records, PAYROLL_RECOMPUTED_FIELDS, batch_size=PAYROLL_RUN_BATCH_SIZE)
+                differences = defaultdict(Decimal)
+                for change in changes:
+                    differences[change['year'], change['month']] += change['total_salary'] - change['previous_total_salary']
+                for (year, month), difference in differences.items():
+                    PayrollSummaryService.apply_delta(year, month, total_salary=difference)
+                transaction.on_commit(invalidate_aggregates)
+        return {'recomputed': len(records), 'changed': changes}
+
+
+class SalaryRevisionService:
+    """Service class for salary revision queries"""
+
+    @staticmethod
+    def get_latest_revisions():
+        """
+        The latest salary revision of every employee in a single query, with the employee and
+        salary details joined in for the nested serializers. The correlated subquery is an index
+        seek on (employee, revision_date) per employee; ties on revision_date go to the newest id.
+        """
+        latest = SalaryRevision.objects.filter(employee=OuterRef('employee')).order_by(
+            '-revision_date', '-id'
+        ).values('id')[:1]
+        return SalaryRevision.objects.filter(id=Subquery(latest)).select_related(
+            'employee__salary_details'
+        ).order_by('employee_id')
+
+
+class PayrollSummaryService:
+    """Service class for the per-month payroll rollup read by the dashboard"""
+
+    @staticmethod
+    def get_rollup_values(record):
+        """The (year, month, total salary as stored, holiday overtime days) a record contributes to the rollup"""
+        return (record.year, record.month, round(Decimal(record.total_salary_for_month or 0), 2), record.overtime_days or 0)
+
+    @staticmethod
+    def record_changed(previous, current):
+        """
+        Move a record's contribution from ``previous`` to ``current``, both rollup values or None
+        for a created or deleted record. An unchanged record costs no query.
+        """
+        if previous and current and previous[:2] == current[:2]:
+            PayrollSummaryService.apply_delta(*current[:2], total_salary=current[2] - previous[2],
+                                              overtime_days=current[3] - previous[3])
+            return
+        if previous:
+            PayrollSummaryService.apply_delta(*previous[:2], total_salary=-previous[2],
+                                              overtime_days=-previous[3], headcount=-1)
+        if current:
+            PayrollSummaryService.apply_delta(*current[:2], total_salary=current[2],
+                                              overtime_days=current[3], headcount=1)
+
+    @staticmethod
+    def apply_delta(year, month, total_salary=Decimal(0), overtime_days=0, headcount=0):
+        """
+        Add differences to a period's rollup in one UPDATE, which recomputes the averages from the
+        new totals, and create the row for the period's first record. A period left without records
+        loses its row.
+        """
+        if not (total_salary or overtime_days or headcount):
+            return
+        summaries = PayrollMonthSummary.objects.filter(year=year, month=month)
+        new_headcount = F('headcount') + headcount
+
+        def average(field, delta):
+            return Case(
+                When(headcount__gt=-headcount, then=Cast(F(field) + delta, FloatField()) / new_headcount),
+                default=Value(0), output_field=FloatField(),
+            )
+
+        changes = {
+            'total_salary': F('total_salary') + total_salary,
+            'total_overtime_days': F('total_overtime_days') + overtime_days,
+            'headcount': new_headcount,
+            'average_salary': average('total_salary', total_salary),
+            'average_overtime_days': average('total_overtime_days', overtime_days),
+            'updated_at': timezone.now(),
+        }
+        if summaries.update(**changes):
+            if headcount < 0:
+                summaries.filter(headcount=0).delete()
+            return
+        if headcount <= 0:
+            # Records without a rollup row (written before it existed): count them from scratch
+            PayrollSummaryService.refresh_period(year, month)
+            return
+        try:
+            with transaction.atomic():
+                PayrollMonthSummary.objects.create(
+                    year=year, month=month, total_salary=total_salary, total_overtime_days=overtime_days,
+                    headcount=headcount, average_salary=round(Decimal(total_salary) / headcount, 2),
+                    average_overtime_days=round(Decimal(overtime_days) / headcount, 2),
+                )
+        except IntegrityError:
+            # A concurrent write created the period's row first
+            summaries.update(**changes)
+
+    @staticmethod
+    def refresh_period(year, month):
+        """Recalculate the rollup of one pay period from its payroll records, to repair it"""
+        totals = PayrollRecord.objects.filter(year=year, month=month).aggregate(
+            total_salary=Sum('total_salary_for_month'),
+            total_overtime_days=Sum('overtime_days'),
+            headcount=Count('id'),
+        )
+        headcount = totals['headcount']
+        if not headcount:
+            PayrollMonthSummary.objects.filter(year=year, month=month).delete()
+            return None
+
+        total_salary = totals['total_salary'] or Decimal(0)
+        total_overtime_days = totals['total_overtime_days'] or 0
+        summary, _ = PayrollMonthSummary.objects.update_or_create(
+            year=year,
+            month=month,
+            defaults={
+                'total_salary': total_salary,
+                'total_overtime_days': total_overtime_days,
+                'headcount': headcount,
+                'average_salary': round(total_salary / headcount, 2),
+                'average_overtime_days': round(Decimal(total_overtime_days) / headcount, 2),
+            },
+        )
+        return summary
+
+    @staticmethod
+    def cached_dashboard_summary():
+        """Dashboard figures served from the aggregates cache, computed once per version and month"""
+        today = timezone.now()
+        return get_or_compute(f'dashboard_summary:{today.year}-{today.month}', PayrollSummaryService.dashboard_summary)
+
+    @staticmethod
+    def dashboard_summary():
+        """Dashboard figures read from the monthly rollup instead of scanning PayrollRecord"""
+        today = timezone.now()
+        current_month = today.month
+        current_year = today.year
+        previous_month = current_month - 1 if current_month > 1 else 12
+        previous_month_year = current_year if current_month > 1 else current_year - 1
+
+        summaries = {
+            (summary.year, summary.month): summary
+            for summary in PayrollMonthSummary.objects.order_by('-year', '-month')
+        }
+        current = summaries.get((current_year, current_month))
+        previous = summaries.get((previous_month_year, previous_month))
+        total_employees = Employee.objects.count()
+
+        return {
+            'total_salary_for_month': current.total_salary if current else Decimal(0),
+            'total_overtime_for_month': current.total_overtime_days if current else Decimal(0),
+            'previous_month_salary': previous.total_salary if previous else Decimal(0),
+            'previous_month_overtime': previous.total_overtime_days if previous else Decimal(0),
+            'monthly_data': [
+                {
+                    'month': summary.month,
+                    'year': summary.year,
+                    'total_salary': summary.total_salary,
+                    'total_overtime': summary.total_overtime_days,
+                    'headcount': summary.headcount,
+                    'average_salary': summary.average_salary,
+                }
+                for summary in summaries.values()
+            ],
+            'total_employees': total_employees,
+            # Over all employees, as the dashboard always showed; monthly_data averages over the period's headcount
+            'average_salary_for_month': (
+                round(current.total_salary / total_employees, 2) if current and total_employees else Decimal(0)
+            ),
+        }
+
+
+class PayrollSimulationService:
+    """
+    Service class for what-if payroll cost projections.
+    Salary components are loaded once into column lists and every scenario rule is applied
+    column-wise; a projection never writes to SalaryDetails or SalaryRevision.
+    """
+
+    @staticmethod
+    def load_salary_columns():
+        """Load every employee's department and salary components as columns in one query"""
+        rows = list(SalaryDetails.objects.values_list('employee__department', *SALARY_COMPONENT_FIELDS))
+        if not rows:
+            return [], {field: [] for field in SALARY_COMPONENT_FIELDS}
+        departments, *components = zip(*rows)
+        return list(departments), {
+            field: [value or Decimal('0') for value in column]
+            for field, column in zip(SALARY_COMPONENT_FIELDS, components)
+        }
+
+    @staticmethod
+    def parse_rules(rules):
+        """
+        Validate scenario rules such as {"department": "IT", "percent": 5, "components": ["basic_salary"]}.
+        A rule without a department applies to every department that has no rule of its own. When
+        several rules cover the same department and component, the last one wins.
+        """
+        departments = [choice[0] for choice in DEPARTMENT_CHOICES]
+        parsed = []
+        for rule in rules:
+            department = rule.get('department')
+            if department is not None and department not in departments:
+                raise ValidationError(f"Unknown department: {department}.")
+            try:
+                factor = Decimal(1) + Decimal(str(rule.get('percent', 0))) / Decimal(100)
+            except InvalidOperation:
+                raise ValidationError("Scenario percent must be a number.")
+            components = rule.get('components', SALARY_COMPONENT_FIELDS)
+            unknown = set(components) - set(SALARY_COMPONENT_FIELDS)
+            if unknown:
+                raise ValidationError(f"Unknown salary components: {', '.join(sorted(unknown))}.")
+            parsed.append((department, factor, components))
+        return parsed
+
+    @staticmethod
+    def factors_by_department(rules, field):
+        """Resolve the multiplier of one salary component for every department; a later rule overrides an earlier one"""
+        default = Decimal(1)
+        factors = {}
+        for department, factor, components in rules:
+            if field not in components:
+                continue
+            if department is None:
+                default = factor
+            else:
+                factors[department] = factor
+        return factors, default
+
+    @staticmethod
+    def gross_column(columns):
+        """Column-wise SalaryDetails.calculate_gross_salary"""
+        return [sum(values, Decimal('0')) for values in zip(*(columns[field] for field in SALARY_COMPONENT_FIELDS))]
+
+    @staticmethod
+    def cached_simulate(rules):
+        """Projection served from the aggregates cache, keyed by the scenario rules"""
+        digest = hashlib.sha1(json.dumps(rules, sort_keys=True, default=str).encode()).hexdigest()
+        return get_or_compute(f'payroll_simulation:{digest}', lambda: PayrollSimulationService.simulate(rules))
+
+    @staticmethod
+    def simulate(rules):
+        """
+        Project monthly and annual payroll cost per department and in total.
+        Costs follow PayrollRecord.calculate_salary for a standard 30-day month with no
+        overtime or deductions, which is the employee's gross salary.
+        """
+        rules = PayrollSimulationService.parse_rules(rules)
+        departments, columns = PayrollSimulationService.load_salary_columns()
+
+        projected_columns = {}
+        for field in SALARY_COMPONENT_FIELDS:
+            factors, default = PayrollSimulationService.factors_by_department(rules, field)
+            # Revised components are stored with two decimals, as a SalaryRevision would save them
+            projected_columns[field] = [
+                (value * factors.get(department, default)).quantize(Decimal('0.01'))
+                for department, value in zip(departments, columns[field])
+            ]
+
+        current_gross = PayrollSimulationService.gross_column(columns)
+        projected_gross = PayrollSimulationService.gross_column(projected_columns)
+
+        summary = {}
+        for department, current, projected in zip(departments, current_gross, projected_gross):
+            totals = summary.setdefault(department, [0, Decimal('0'), Decimal('0')])
+            totals[0] += 1
+            totals[1] += current
+            totals[2] += projected
+
+        def cost_row(headcount, current, projected):
+            return {
+                'headcount': headcount,
+                'current_monthly_cost': current,
+                'projected_monthly_cost': projected,
+                'current_annual_cost': current * MONTHS_PER_YEAR,
+                'projected_annual_cost': projected * MONTHS_PER_YEAR,
+                'difference_annual_cost': (projected - current) * MONTHS_PER_YEAR,
+            }
+
+        return {
+            'departments': [
+                {'department': department, **cost_row(*summary[department])}
+                for department in sorted(summary)
+            ],
+            'total': cost_row(len(departments), sum(current_gross, Decimal('0')), sum(projected_gross, Decimal('0'))),
+        }
+
+
+class PayslipDeliveryService:
+    """Service class for rendering salary slips and emailing them from a background task"""
+
+    @staticmethod
+    def build_email(payroll_record, pdf_content, connection=None):
+        """The salary slip email with the PDF attached from memory"""
+        employee = payroll_record.employee
+        email = EmailMessage(
+            subject=f"Salary Slip for {payroll_record.month}/{payroll_record.year}",
+            body=f"Dear {employee.first_name},\n\nPlease find your salary slip for the month {payroll_record.month}/{payroll_record.year} attached.",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[employee.user.email],
+            connection=connection,
+        )
+        email.attach(f"salary_slip_{payroll_record.month}_{payroll_record.year}.pdf", pdf_content, 'application/pdf')
+        return email
+
+    @staticmethod
+    def queue(payroll_record):
+        """
+        Record the delivery as queued and hand it to the send task.
+        The job id is chosen up front so it is stored before a worker can pick the job up.
+        """
+        from .tasks import send_salary_slip_email
+
+        task_id = str(uuid.uuid4())
+        delivery, _ = PayslipDelivery.objects.update_or_create(
+            payroll_record=payroll_record,
+            defaults={'status': 'Queued', 'task_id': task_id, 'attempts': 0, 'last_error': '', 'sent_at': None},
+        )
+        transaction.on_commit(lambda: send_salary_slip_email.apply_async((payroll_record.id,), task_id=task_id))
+        return delivery
+
+    @staticmethod
+    def deliver(payroll_id):
+        """Render and send one salary slip, keeping its delivery row up to date"""
+        payroll_record = PayrollRecord.objects.select_related('employee__user').get(id=payroll_id)
+        delivery, _ = PayslipDelivery.objects.get_or_create(payroll_record=payroll_record)
+        delivery.status = 'Sending'
+        delivery.attempts += 1
+        delivery.save(update_fields=['status', 'attempts', 'updated_at'])
+
+        pdf_content = get_payslip_pdf(payroll_record)
+        PayslipDeliveryService.build_email(payroll_record, pdf_content).send(fail_silently=False)
+
+        delivery.status = 'Sent'
+        delivery.sent_at = timezone.now()
+        delivery.last_error = ''
+        delivery.save(update_fields=['status', 'sent_at', 'last_error', 'updated_at'])
+        return delivery
+
+    @staticmethod
+    def mark(payroll_id, status, error):
+        PayslipDelivery.objects.filter(payroll_record_id=payroll_id).update(
+            status=status, last_error=str(error), updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def is_transient_error(exc):
+        """Connection problems and 4xx SMTP replies are worth retrying; anything else is not"""
+        if isinstance(exc, smtplib.SMTPResponseException):
+            return 400 <= exc.smtp_code < 500
+        return isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError))
+
+    @staticmethod
+    def retry_countdown(retries):
+        """Exponential backoff with jitter, so retries of a whole month do not hit the server together"""
+        countdown = min(PAYSLIP_EMAIL_RETRY_BACKOFF * 2 ** retries, PAYSLIP_EMAIL_RETRY_BACKOFF_MAX)
+        return countdown + random.uniform(0, PAYSLIP_EMAIL_RETRY_BACKOFF)
+
+
+class PayslipDispatchService:
+    """
+    Service class for emailing every salary slip of a pay period in one run.
+    PDFs are rendered across a process pool one batch at a time and sent through a single
+    SMTP connection. Each slip is marked sent as soon as it goes out, so a run that stops
+    half way can simply be started again and only the remaining slips are sent.
+    """
+
+    @staticmethod
+    def get_pending_records(month, year):
+        """The period's payroll records whose slip has not been sent yet"""
+        return PayrollRecord.objects.filter(month=month, year=year).exclude(
+            payslip_delivery__status='Sent'
+        ).select_related('employee__user').order_by('id')
+
+    @staticmethod
+    def render(payroll_record):
+        """Runs in the pool workers: only uses the preloaded employee, never the database"""
+        return get_payslip_pdf(payroll_record)
+
+    @staticmethod
+    def get_worker_count():
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def send_period(month, year, workers=None, batch_size=PAYSLIP_DISPATCH_BATCH_SIZE,
+                    send_interval=PAYSLIP_DISPATCH_SEND_INTERVAL):
+        """
+        Send the salary slips of a month/year that have not been sent yet.
+        Returns None when another run for the same period holds the lock.
+        """
+        lock_key = f'payslip-dispatch:{year}:{month}'
+        if not cache.add(lock_key, True, PAYSLIP_DISPATCH_LOCK_TIMEOUT):
+            return None
+        try:
+            return PayslipDispatchService._send_pending(
+                month, year, workers or PayslipDispatchService.get_worker_count(), batch_size, send_interval
+            )
+        finally:
+            cache.delete(lock_key)
+
+    @staticmethod
+    def _send_pending(month, year, workers, batch_size, send_interval):
+        already_sent = PayslipDelivery.objects.filter(
+            payroll_record__month=month, payroll_record__year=year, status='Sent'
+        ).count()
+        result = {'sent': 0, 'failed': [], 'already_sent': already_sent}
+        pending = PayslipDispatchService.get_pending_records(month, year)
+        last_id = 0
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        connection = get_connection()
+        next_send = time.monotonic()
+        try:
+            connection.open()
+            while True:
+                # Keyset over the id, so slips that failed in this run are not picked up again
+                batch = list(pending.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                PayslipDelivery.objects.bulk_create(
+                    [PayslipDelivery(payroll_record=record) for record in batch], ignore_conflicts=True
+                )
+                # One future per slip, so a slip that fails to render only fails itself
+                renders = [executor.submit(PayslipDispatchService.render, record) if executor else None
+                           for record in batch]
+                for record, rendering in zip(batch, renders):
+                    try:
+                        pdf_content = rendering.result() if rendering else PayslipDispatchService.render(record)
+                        time.sleep(max(0, next_send - time.monotonic()))
+                        next_send = time.monotonic() + send_interval
+                        PayslipDispatchService._send_one(connection, record, pdf_content)
+                    except Exception as exc:
+                        PayslipDeliveryService.mark(record.id, 'Failed', exc)
+                        result['failed'].append({'payroll_record': record.id, 'error': str(exc)})
+                    else:
+                        result['sent'] += 1
+        finally:
+            connection.close()
+            if executor:
+                executor.shutdown()
+        return result
+
+    @staticmethod
+    def _send_one(connection, payroll_record, pdf_content):
+        """Send one slip on the shared connection, reconnecting once if the server dropped it"""
+        email = PayslipDeliveryService.build_email(payroll_record, pdf_content, connection=connection)
+        try:
+            email.send(fail_silently=False)
+        except smtplib.SMTPServerDisconnected:
+            connection.close()
+            connection.open()
+            email.send(fail_silently=False)
+        PayslipDelivery.objects.filter(payroll_record=payroll_record).update(
+            status='Sent', attempts=F('attempts') + 1, last_error='', sent_at=timezone.now(), updated_at=timezone.now()
+        )
+
+
+class StreamBuffer:
+    """Write-only file object whose content is handed out and dropped chunk by chunk"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class PayslipArchiveService:
+    """
+    Service class for exporting every payslip of a pay period as one ZIP archive.
+    Entries are rendered (or read from the PDF cache) while the archive is being written and
+    each one is handed to the response as soon as it is compressed, so only one PDF is held
+    in memory at a time.
+    """
+
+    @staticmethod
+    def get_records(month, year):
+        return PayrollRecord.objects.filter(month=month, year=year).select_related('employee').order_by(
+            'employee__first_name', 'employee__last_name', 'id'
+        )
+
+    @staticmethod
+    def get_entry_name(payroll_record):
+        employee = payroll_record.employee
+        name = "".join(c for c in f"{employee.first_name}_{employee.last_name}" if c.isalnum() or c in ('-', '_'))
+        return f"{employee.id}_{name}_payslip_{payroll_record.month}_{payroll_record.year}.pdf"
+
+    @staticmethod
+    def stream(month, year, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield the ZIP archive of the period's payslips, one entry at a time"""
+        buffer = StreamBuffer()
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for payroll_record in PayslipArchiveService.get_records(month, year).iterator(chunk_size=chunk_size):
+                archive.writestr(PayslipArchiveService.get_entry_name(payroll_record), get_payslip_pdf(payroll_record))
+                yield buffer.pop()
+        yield buffer.pop()  # central directory
+
+
+class EchoBuffer:
+    """File-like object for csv.writer that returns each written line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+class PayrollRegisterService:
+    """
+    Service class for the payroll register export of a year, or one month of it.
+    Rows are read as plain tuples through a server-side cursor and written out chunk by chunk,
+    so a full-year export for every employee runs in constant memory.
+    """
+
+    @staticmethod
+    def get_headers():
+        return [header for header, _ in PAYROLL_REGISTER_COLUMNS]
+
+    @staticmethod
+    def get_rows(year, month=None, department=None):
+        records = PayrollRecord.objects.filter(year=year)
+        if month is not None:
+            records = records.filter(month=month)
+        if department:
+            records = records.filter(employee__department=department)
+        return records.annotate(
+            employee_name=Concat('employee__first_name', Value(' '), 'employee__last_name')
+        ).order_by('month', 'employee__first_name', 'employee__last_name', 'id').values_list(
+            *[lookup for _, lookup in PAYROLL_REGISTER_COLUMNS]
+        )
+
+    @staticmethod
+    def stream_csv(year, month=None, department=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield the register as CSV text, one chunk of rows at a time"""
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(PayrollRegisterService.get_headers())
+        lines = []
+        for row in PayrollRegisterService.get_rows(year, month, department).iterator(chunk_size=chunk_size):
+            lines.append(writer.writerow(row))
+            if len(lines) >= chunk_size:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    @staticmethod
+    def xlsx_available():
+        return importlib.util.find_spec('openpyxl') is not None
+
+    @staticmethod
+    def write_xlsx(output, year, month=None, department=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Write the register as an XLSX workbook to ``output``, in openpyxl's write-only mode"""
+        from openpyxl import Workbook  # optional dependency, only needed for XLSX exports
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Payroll Register')
+        sheet.append(PayrollRegisterService.get_headers())
+        for row in PayrollRegisterService.get_rows(year, month, department).iterator(chunk_size=chunk_size):
+            sheet.append(row)
+        workbook.save(output)
+
+
+class WPSFileService:
+    """
+    Service class for the UAE Wage Protection System salary information file (SIF) of a pay period:
+    one EDR line per employee followed by the SCR control record with the totals.
+    All rows come from one joined query and are validated together before anything is written,
+    so employees with missing or malformed bank details are reported up front.
+    """
+
+    ROW_FIELDS = (
+        'employee_id', 'employee__first_name', 'employee__last_name', 'employee__salary_details__iban',
+        'employee__salary_details__routing_code', 'employee__salary_details__wps_person_id',
+        'total_salary_for_month', 'overtime_amount', 'normal_overtime_amount', 'unpaid_days',
+    )
+
+    @staticmethod
+    def get_employer():
+        """Employer ID and bank routing code from the WPS_EMPLOYER_ID / WPS_EMPLOYER_ROUTING_CODE settings"""
+        employer_id = str(getattr(settings, 'WPS_EMPLOYER_ID', '') or '')
+        routing_code = str(getattr(settings, 'WPS_EMPLOYER_ROUTING_CODE', '') or '')
+        errors = []
+        if not (employer_id.isdigit() and len(employer_id) == WPS_EMPLOYER_ID_LENGTH):
+            errors.append(f"WPS_EMPLOYER_ID must be {WPS_EMPLOYER_ID_LENGTH} digits.")
+        if not (routing_code.isdigit() and len(routing_code) == WPS_ROUTING_CODE_LENGTH):
+            errors.append(f"WPS_EMPLOYER_ROUTING_CODE must be {WPS_ROUTING_CODE_LENGTH} digits.")
+        if errors:
+            raise ValidationError(errors)
+        return employer_id, routing_code
+
+    @staticmethod
+    def get_rows(month, year):
+        return list(
+            PayrollRecord.objects.filter(month=month, year=year)
+            .order_by('employee_id', 'id')
+            .values_list(*WPSFileService.ROW_FIELDS)
+        )
+
+    @staticmethod
+    def normalize_iban(iban):
+        return (iban or '').replace(' ', '').upper()
+
+    @staticmethod
+    def is_valid_iban(iban):
+        """UAE IBAN: AE, 2 check digits, 3 digit bank code and 16 digit account number, passing the mod-97 check"""
+        if len(iban) != WPS_IBAN_LENGTH or not iban.startswith(WPS_IBAN_COUNTRY) or not iban[2:].isdigit():
+            return False
+        rearranged = iban[4:] + iban[:4]
+        return int(''.join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+
+    @staticmethod
+    def validate(rows):
+        """Problems of every employee in the file, as [{employee, employee_full_name, errors}]"""
+        invalid = []
+        for employee_id, first_name, last_name, iban, routing_code, person_id, *_ in rows:
+            errors = []
+            if not iban:
+                errors.append("IBAN is missing.")
+            elif not WPSFileService.is_valid_iban(WPSFileService.normalize_iban(iban)):
+                errors.append("IBAN is not a valid UAE IBAN.")
+            if not routing_code:
+                errors.append("Bank routing code is missing.")
+            elif not (routing_code.isdigit() and len(routing_code) == WPS_ROUTING_CODE_LENGTH):
+                errors.append(f"Bank routing code must be {WPS_ROUTING_CODE_LENGTH} digits.")
+            if not person_id:
+                errors.append("WPS person ID is missing.")
+            elif not (person_id.isdigit() and len(person_id) == WPS_PERSON_ID_LENGTH):
+                errors.append(f"WPS person ID must be {WPS_PERSON_ID_LENGTH} digits.")
+            if errors:
+                invalid.append({
+                    'employee': employee_id, 'employee_full_name': f"{first_name} {last_name}", 'errors': errors
+                })
+        return invalid
+
+    @staticmethod
+    def get_filename(employer_id, created_at):
+        return f"{employer_id}{created_at.strftime('%y%m%d%H%M%S')}.SIF"
+
+    @staticmethod
+    def stream(rows, month, year, employer_id, employer_routing_code, created_at):
+        """Yield the EDR lines of validated rows, then the SCR line"""
+        days_in_period = calendar.monthrange(year, month)[1]
+        start_date = f"{year:04d}-{month:02d}-01"
+        end_date = f"{year:04d}-{month:02d}-{days_in_period:02d}"
+        total = Decimal('0')
+        for _, _, _, iban, routing_code, person_id, net_pay, overtime, normal_overtime, unpaid_days in rows:
+            net_pay = net_pay or Decimal('0')
+            variable = (overtime or Decimal('0')) + (normal_overtime or Decimal('0'))
+            total += net_pay
+            yield (f"EDR,{person_id},{routing_code},{WPSFileService.normalize_iban(iban)},{start_date},{end_date},"
+                   f"{days_in_period},{net_pay - variable:.2f},{variable:.2f},{unpaid_days or 0}\r\n")
+        yield (f"SCR,{employer_id},{employer_routing_code},{created_at:%Y-%m-%d},{created_at:%H%M},"
+               f"{month:02d}{year:04d},{len(rows)},{total:.2f},{WPS_CURRENCY},{employer_id}\r\n")
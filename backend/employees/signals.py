@@ -0,0 +1,46 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Employee, SalaryDetails, PayrollRecord
+from .services import PayrollSummaryService
+from .caching import invalidate_aggregates
+from .pdf_cache import payslip_pdf_cache
+
+
+@receiver(pre_save, sender=PayrollRecord)
+def remember_payroll_rollup_values(sender, instance, **kwargs):
+    """A record saved without being loaded first: read what it currently adds to the rollup"""
+    if instance.pk and not hasattr(instance, '_rollup_values'):
+        values = PayrollRecord.objects.filter(pk=instance.pk).values_list(
+            'year', 'month', 'total_salary_for_month', 'overtime_days'
+        ).first()
+        instance._rollup_values = values and (values[0], values[1], values[2] or Decimal(0), values[3] or 0)
+
+
+@receiver(post_save, sender=PayrollRecord)
+def update_payroll_summary_on_save(sender, instance, created, **kwargs):
+    current = PayrollSummaryService.get_rollup_values(instance)
+    PayrollSummaryService.record_changed(None if created else instance._rollup_values, current)
+    instance._rollup_values = current
+
+
+@receiver(post_delete, sender=PayrollRecord)
+def update_payroll_summary_on_delete(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_values', None) or PayrollSummaryService.get_rollup_values(instance)
+    PayrollSummaryService.record_changed(previous, None)
+
+
+@receiver([post_save, post_delete], sender=PayrollRecord)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=SalaryDetails)
+def invalidate_aggregates_on_write(sender, **kwargs):
+    """Drop cached admin aggregates once the write is committed"""
+    transaction.on_commit(invalidate_aggregates)
+
+
+@receiver(post_delete, sender=PayrollRecord)
+def purge_cached_payslips(sender, instance, **kwargs):
+    """Cached renders of a changed record are replaced on the next download, a deleted one has none"""
+    payroll_id = instance.pk
+    transaction.on_commit(lambda: payslip_pdf_cache.purge(payroll_id))
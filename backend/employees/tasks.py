@@ -0,0 +1,22 @@
+from celery import shared_task
+from .constants import PAYSLIP_EMAIL_MAX_RETRIES
+from .services import PayslipDeliveryService, PayslipDispatchService
+
+
+@shared_task(bind=True, max_retries=PAYSLIP_EMAIL_MAX_RETRIES)
+def send_salary_slip_email(self, payroll_id):
+    """Renders a payroll record's salary slip in memory and emails it, retrying transient SMTP failures."""
+    try:
+        PayslipDeliveryService.deliver(payroll_id)
+    except Exception as exc:
+        if not PayslipDeliveryService.is_transient_error(exc) or self.request.retries >= self.max_retries:
+            PayslipDeliveryService.mark(payroll_id, 'Failed', exc)
+            raise
+        PayslipDeliveryService.mark(payroll_id, 'Retrying', exc)
+        raise self.retry(exc=exc, countdown=PayslipDeliveryService.retry_countdown(self.request.retries))
+
+
+@shared_task
+def send_period_salary_slips(month, year):
+    """Emails every salary slip of a month/year that has not been sent yet."""
+    return PayslipDispatchService.send_period(month, year)
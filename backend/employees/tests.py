@@ -3,3 +3,10 @@ Tests for the employees application - Main test runner
 This file imports and runs all tests from the organized test files
 """
 from employees.tests.test_models import *
+from employees.tests.test_services import *
+from employees.tests.test_caching import *
+from employees.tests.test_views import *
+from employees.tests.test_query_budgets import *
+from employees.tests.test_tasks import *
+from employees.tests.test_pdf_cache import *
+from employees.tests.test_payslip import *
@@ -0,0 +1,87 @@
+"""
+Tests for the admin aggregates cache
+"""
+from django.test import TestCase
+from django.core.cache import cache
+from unittest.mock import patch
+from decimal import Decimal
+import threading
+import time
+from employees.models import PayrollRecord
+from employees.caching import get_or_compute, get_aggregates_version, invalidate_aggregates
+from employees.services import PayrollSummaryService
+from employees.tests.test_services import create_employee
+
+
+class AggregateCacheTestCase(TestCase):
+    """Test cases for the versioned aggregates cache"""
+
+    def setUp(self):
+        """Start every test with an empty cache"""
+        cache.clear()
+
+    def test_get_or_compute_caches_value(self):
+        """Test that a value is computed once per version"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'total': Decimal('10.00')}
+
+        self.assertEqual(get_or_compute('totals', compute), {'total': Decimal('10.00')})
+        self.assertEqual(get_or_compute('totals', compute), {'total': Decimal('10.00')})
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidate_moves_to_new_version(self):
+        """Test that invalidation makes cached values unreachable"""
+        version = get_aggregates_version()
+        get_or_compute('totals', lambda: 1)
+
+        invalidate_aggregates()
+
+        self.assertEqual(get_aggregates_version(), version + 1)
+        self.assertEqual(get_or_compute('totals', lambda: 2), 2)
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Test that only one of several concurrent callers computes the value"""
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        def worker():
+            results.append(get_or_compute('slow', compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_payroll_and_employee_writes_invalidate_dashboard(self):
+        """Test that the signals invalidate the cached dashboard on commit"""
+        employee = create_employee(
+            'john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        summary = PayrollSummaryService.cached_dashboard_summary()
+        self.assertEqual(summary['total_employees'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_employee('jane')
+        self.assertEqual(PayrollSummaryService.cached_dashboard_summary()['total_employees'], 2)
+
+        with patch.object(PayrollSummaryService, 'dashboard_summary', wraps=PayrollSummaryService.dashboard_summary) as dashboard:
+            PayrollSummaryService.cached_dashboard_summary()
+            dashboard.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                PayrollRecord.objects.create(employee=employee, month=1, year=2025)
+            PayrollSummaryService.cached_dashboard_summary()
+            dashboard.assert_called_once()
@@ -0,0 +1,96 @@
+"""
+Tests for the payslip renderer
+"""
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from PIL import Image as PILImage
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from employees import payslip
+from employees.models import PayrollRecord
+from employees.payslip import get_payslip_assets, get_payslip_amounts, render_payslip_pdf
+from employees.tasks import send_salary_slip_email
+from employees.tests.test_services import create_employee
+
+
+class PayslipRendererTestCase(TestCase):
+    """Test cases for the shared payslip renderer"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.logo_path = os.path.join(self.directory, 'logo.png')
+        PILImage.new('RGB', (50, 20), 'navy').save(self.logo_path)
+        settings_override = override_settings(PAYSLIP_PDF_CACHE_DIR=self.directory, COMPANY_LOGO_PATH=self.logo_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_payslip_assets.cache_clear()
+        self.addCleanup(get_payslip_assets.cache_clear)
+
+        self.employee = create_employee('john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+                                        transport_allowance=Decimal('500.00'))
+        self.record = PayrollRecord.objects.create(employee=self.employee, month=1, year=2025, overtime_days=2,
+                                                   unpaid_days=1, current_basic_salary=Decimal('3000.00'),
+                                                   current_gross_salary=Decimal('4500.00'))
+
+    def test_renders_pdf_with_logo(self):
+        """Test that the payslip is a PDF embedding the company logo"""
+        pdf_content = render_payslip_pdf(self.employee, self.record)
+
+        self.assertTrue(pdf_content.startswith(b'%PDF'))
+        self.assertIn(b'/Subtype /Image', pdf_content)
+
+    def test_missing_logo_is_skipped(self):
+        """Test that a missing logo does not stop the payslip"""
+        get_payslip_assets.cache_clear()
+        with override_settings(COMPANY_LOGO_PATH=os.path.join(self.directory, 'missing.png')), \
+                self.assertLogs('employees.payslip', 'WARNING') as logs:
+            pdf_content = render_payslip_pdf(self.employee, self.record)
+
+        self.assertTrue(pdf_content.startswith(b'%PDF'))
+        self.assertNotIn(b'/Subtype /Image', pdf_content)
+        self.assertIn('Logo not found', logs.output[0])
+
+    def test_assets_are_built_once(self):
+        """Test that styles and the decoded logo are reused across renders"""
+        with patch.object(payslip, 'getSampleStyleSheet', wraps=payslip.getSampleStyleSheet) as stylesheet, \
+                patch.object(payslip, 'ImageReader', wraps=payslip.ImageReader) as image_reader:
+            for _ in range(3):
+                render_payslip_pdf(self.employee, self.record)
+
+        stylesheet.assert_called_once()
+        image_reader.assert_called_once()
+
+    def test_amounts(self):
+        """Test the figures printed on the payslip"""
+        amounts = get_payslip_amounts(self.record)
+
+        self.assertEqual(amounts['worked_days'], 29)
+        self.assertEqual(amounts['unpaid_leaves_amount'], 100.0)
+        self.assertEqual(amounts['holiday_overtime_amount'], 300.0)
+        self.assertEqual(amounts['net_pay'], round(float(self.record.total_salary_for_month), 2))
+
+    def test_download_and_email_share_the_payslip(self):
+        """Test that the downloaded and the emailed payslip are the same rendered document"""
+        client = APIClient()
+        client.force_authenticate(self.employee.user)
+        with patch.object(payslip, 'render_payslip_pdf', wraps=render_payslip_pdf) as render:
+            response = client.get(f'/api/employees/employee/payroll/download/{self.record.id}/')
+            send_salary_slip_email.apply((self.record.id,))
+
+        render.assert_called_once()
+        self.assertEqual(mail.outbox[0].attachments[0][1], b''.join(response.streaming_content))
+
+    def test_benchmark_command(self):
+        """Test that the benchmark reports the per-slip render time"""
+        out = StringIO()
+        call_command('benchmark_payslips', count=3, stdout=out)
+
+        self.assertIn('Rendered 3 payslips', out.getvalue())
@@ -0,0 +1,155 @@
+"""
+Tests for the payslip PDF cache
+"""
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import Mock, patch
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from employees.models import PayrollRecord
+from employees.constants import PAYSLIP_TEMPLATE_VERSION
+from employees.pdf_cache import payslip_pdf_cache
+from employees.tests.test_services import create_employee
+
+
+class PayslipPDFCacheTestCase(TestCase):
+    """Test cases for PayslipPDFCache"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(PAYSLIP_PDF_CACHE_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.employee = create_employee('john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+                                        transport_allowance=Decimal('500.00'))
+        self.records = [PayrollRecord.objects.create(employee=self.employee, month=month, year=2025)
+                        for month in (1, 2, 3)]
+        self.record = self.records[0]
+
+    def cached_files(self):
+        return sorted(os.path.join(os.path.basename(root), name)
+                      for root, _, names in os.walk(self.directory) for name in names)
+
+    def test_hit_skips_render(self):
+        """Test that a cached payslip is served without rendering again"""
+        render = Mock(return_value=b'%PDF-1.4 slip')
+
+        self.assertEqual(payslip_pdf_cache.get_or_render(self.record, 'download', render), b'%PDF-1.4 slip')
+        self.assertEqual(payslip_pdf_cache.get_or_render(self.record, 'download', render), b'%PDF-1.4 slip')
+
+        render.assert_called_once_with(self.employee, self.record)
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_variants_are_cached_separately(self):
+        """Test that the download and email payslips do not share a file"""
+        payslip_pdf_cache.put(self.record, 'download', b'download')
+        payslip_pdf_cache.put(self.record, 'email', b'email')
+
+        self.assertEqual(payslip_pdf_cache.get(self.record, 'download'), b'download')
+        self.assertEqual(payslip_pdf_cache.get(self.record, 'email'), b'email')
+
+    def test_changed_record_is_rendered_again(self):
+        """Test that editing the record misses the cache and replaces the stale file"""
+        payslip_pdf_cache.put(self.record, 'download', b'old')
+        stale = self.cached_files()
+
+        self.record.overtime_days = 2
+        self.record.save()
+        self.assertIsNone(payslip_pdf_cache.get(self.record, 'download'))
+
+        payslip_pdf_cache.put(self.record, 'download', b'new')
+        self.assertEqual(payslip_pdf_cache.get(self.record, 'download'), b'new')
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertNotEqual(self.cached_files(), stale)
+
+    def test_changed_employee_is_rendered_again(self):
+        """Test that a printed employee field is part of the key"""
+        payslip_pdf_cache.put(self.record, 'download', b'old')
+
+        self.employee.designation = 'Lead'
+        self.assertIsNone(payslip_pdf_cache.get(self.record, 'download'))
+
+    def test_template_version_is_part_of_the_key(self):
+        """Test that bumping the template version retires cached payslips"""
+        payslip_pdf_cache.put(self.record, 'download', b'old')
+
+        with patch('employees.pdf_cache.PAYSLIP_TEMPLATE_VERSION', PAYSLIP_TEMPLATE_VERSION + 1):
+            self.assertIsNone(payslip_pdf_cache.get(self.record, 'download'))
+
+    def test_least_recently_served_is_evicted(self):
+        """Test that the cap evicts the file served longest ago"""
+        with override_settings(PAYSLIP_PDF_CACHE_MAX_BYTES=250):
+            for age, record in enumerate(self.records[:2]):
+                payslip_pdf_cache.put(record, 'download', b'x' * 100)
+                path = payslip_pdf_cache.get_path(record, 'download')
+                os.utime(path, (1000 + age, 1000 + age))
+            payslip_pdf_cache.get(self.records[0], 'download')  # now the most recently served
+
+            payslip_pdf_cache.put(self.records[2], 'download', b'x' * 100)
+
+        self.assertIsNotNone(payslip_pdf_cache.get(self.records[0], 'download'))
+        self.assertIsNone(payslip_pdf_cache.get(self.records[1], 'download'))
+        self.assertIsNotNone(payslip_pdf_cache.get(self.records[2], 'download'))
+
+    def test_writes_under_the_cap_do_not_evict(self):
+        """Test that the tracked size spares a directory scan until a write takes it over the cap"""
+        with override_settings(PAYSLIP_PDF_CACHE_MAX_BYTES=250), \
+                patch.object(payslip_pdf_cache, 'evict', wraps=payslip_pdf_cache.evict) as evict:
+            payslip_pdf_cache.put(self.records[0], 'download', b'x' * 100)
+            payslip_pdf_cache.put(self.records[0], 'download', b'y' * 100)  # replaces, so still 100 bytes
+            payslip_pdf_cache.put(self.records[1], 'download', b'x' * 100)
+            evict.assert_not_called()
+
+            payslip_pdf_cache.put(self.records[2], 'download', b'x' * 100)
+            evict.assert_called_once()
+        self.assertEqual(len(self.cached_files()), 2)
+
+    def test_failed_write_is_logged(self):
+        """Test that a payslip that cannot be cached is still served and the failure logged"""
+        with patch.object(payslip_pdf_cache, 'put', side_effect=OSError('disk full')), \
+                self.assertLogs('employees.pdf_cache', 'WARNING') as logs:
+            content = payslip_pdf_cache.get_or_render(self.record, 'download', Mock(return_value=b'%PDF-1.4 slip'))
+
+        self.assertEqual(content, b'%PDF-1.4 slip')
+        self.assertIn(f'Could not cache payslip {self.record.pk}', logs.output[0])
+
+    def test_deleted_record_is_purged(self):
+        """Test that deleting a payroll record removes its cached payslips"""
+        payslip_pdf_cache.put(self.record, 'download', b'download')
+        payslip_pdf_cache.put(self.records[1], 'download', b'other')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.delete()
+
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertFalse(os.path.exists(payslip_pdf_cache.get_record_directory(self.record.pk)))
+
+    def test_purge_only_lists_the_record_directory(self):
+        """Test that dropping a record's renders does not scan the other records' files"""
+        for record in self.records:
+            payslip_pdf_cache.put(record, 'download', b'slip')
+
+        with patch('employees.pdf_cache.os.scandir', wraps=os.scandir) as scandir:
+            payslip_pdf_cache.purge(self.record.pk)
+
+        scandir.assert_called_once_with(payslip_pdf_cache.get_record_directory(self.record.pk))
+        self.assertEqual(len(self.cached_files()), 2)
+
+    def test_download_is_served_from_cache(self):
+        """Test that the payslip download renders once for repeated clicks"""
+        client = APIClient()
+        client.force_authenticate(self.employee.user)
+        url = f'/api/employees/employee/payroll/download/{self.record.id}/'
+
+        with patch('employees.payslip.render_payslip_pdf', return_value=b'%PDF-1.4 slip') as render:
+            first = client.get(url)
+            second = client.get(url)
+
+        render.assert_called_once()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(b''.join(second.streaming_content), b'%PDF-1.4 slip')
@@ -0,0 +1,273 @@
+"""
+Query budget tests for the employee endpoints.
+Each endpoint must stay within a fixed number of queries, whatever the number of rows.
+"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from decimal import Decimal
+from unittest.mock import patch
+import datetime
+import tempfile
+from employees.models import PayrollRecord, PayslipDelivery, SalaryDetails, SalaryRevision
+from employees.tests.test_services import create_employee, make_iban
+from leaves.models import Leave
+
+CustomUser = get_user_model()
+
+
+class QueryBudgetMixin:
+    """Seeds realistic data and checks endpoint query counts against a budget"""
+    seeded = 0
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.employee = self.seed_employee('owner')
+        self.client = APIClient()
+        self.seed(3)
+
+    def seed_employee(self, username):
+        """One employee with salary details, three payroll records, a salary revision and two leaves"""
+        employee = create_employee(
+            username, basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        for month in (1, 2, 3):
+            PayrollRecord.objects.create(employee=employee, month=month, year=2025, overtime_days=1)
+        SalaryRevision.objects.create(
+            employee=employee, revised_basic_salary=Decimal('3300.00'), revised_housing_allowance=Decimal('1000.00'),
+            revised_transport_allowance=Decimal('500.00'), revised_gross_salary=Decimal('0'),
+            previous_basic_salary=Decimal('3000.00'), previous_housing_allowance=Decimal('1000.00'),
+            previous_transport_allowance=Decimal('500.00'), previous_gross_salary=Decimal('4500.00'),
+            revised_salary_effective_from=datetime.date(2025, 4, 1), revision_reason='Annual review'
+        )
+        for day, status in ((3, 'Pending'), (10, 'Approved')):
+            leave = Leave.objects.create(
+                employee=employee, leave_type='Annual',
+                start_date=datetime.date(2025, 3, day), end_date=datetime.date(2025, 3, day)
+            )
+            Leave.objects.filter(pk=leave.pk).update(
+                status=status, approved_by=self.admin if status == 'Approved' else None
+            )
+        return employee
+
+    def seed(self, count):
+        """Add ``count`` more employees with their related rows"""
+        for _ in range(count):
+            QueryBudgetMixin.seeded += 1
+            self.seed_employee(f'employee{QueryBudgetMixin.seeded}')
+
+    def count_queries(self, method, url, data=None, status_code=200):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+            if response.streaming:
+                # Streamed exports query while the body is read, so read it inside the capture
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+        return len(queries), queries
+
+    def assertQueryBudget(self, budget, method, url, data=None, status_code=200):
+        """Assert the request runs at most ``budget`` queries"""
+        count, queries = self.count_queries(method, url, data, status_code)
+        self.assertLessEqual(count, budget, '\n'.join(query['sql'] for query in queries))
+        return count
+
+    def assertConstantQueries(self, budget, url, data=None):
+        """Assert a read endpoint stays within ``budget`` and does not grow with the row count"""
+        before = self.assertQueryBudget(budget, 'get', url, data)
+        self.seed(3)
+        after = self.assertQueryBudget(budget, 'get', url, data)
+        self.assertEqual(before, after, f'{url} issues more queries as rows are added')
+
+
+class EmployeeAdminQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets of the admin employee, salary and payroll endpoints"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def test_view_all_employees(self):
+        self.assertConstantQueries(1, '/api/employees/view_all_employees/')
+
+    def test_view_all_employees_paginated(self):
+        self.assertConstantQueries(1, '/api/employees/view_all_employees/', {'page_size': 2})
+
+    def test_view_all_employees_with_salary(self):
+        self.assertConstantQueries(1, '/api/employees/employees/salaries/')
+
+    def test_view_all_employees_salaries(self):
+        self.assertConstantQueries(1, '/api/employees/salaries/')
+
+    def test_admin_view_single_employee_salary(self):
+        self.assertQueryBudget(2, 'get', f'/api/employees/salary-details/{self.employee.id}/')
+
+    def test_view_all_payroll(self):
+        self.assertConstantQueries(1, '/api/employees/view_all_payroll/')
+
+    def test_view_all_payroll_paginated(self):
+        self.assertConstantQueries(1, '/api/employees/view_all_payroll/', {'page_size': 4})
+
+    def test_get_salary_revisions(self):
+        self.assertQueryBudget(2, 'get', f'/api/employees/get-salary-revisions/{self.employee.id}/')
+
+    def test_get_all_salary_revisions(self):
+        self.assertConstantQueries(1, '/api/employees/salary-revision/')
+
+    def test_dashboard_summary(self):
+        self.assertQueryBudget(2, 'get', '/api/employees/dashboard-summary/')
+
+    def test_view_new_employees(self):
+        self.assertConstantQueries(1, '/api/employees/new_employees/')
+
+    def test_create_employee(self):
+        user = CustomUser.objects.create_user(username='newhire', email='newhire@example.com', password='x')
+        self.assertQueryBudget(12, 'post', '/api/employees/create_employee/', {
+            'user': user.id, 'first_name': 'New', 'last_name': 'Hire', 'date_of_birth': '1990-01-01',
+            'place_of_birth': 'City', 'nationality': 'Nationality', 'gender': 'Male',
+            'marital_status': 'Unmarried', 'phone_number': '1234567890', 'email': 'newhire@company.com',
+            'personal_email': 'newhire@example.com', 'joining_date': '2025-01-01', 'address': 'Address',
+            'designation': 'Developer', 'department': 'IT', 'qualification': 'Bachelor',
+        }, status_code=201)
+
+    def test_update_employee(self):
+        self.assertQueryBudget(4, 'patch', f'/api/employees/employee/{self.employee.id}/',
+                               {'designation': 'Lead'})
+
+    def test_create_salary_details(self):
+        employee = create_employee('nosalary')
+        self.assertQueryBudget(6, 'post', '/api/employees/create-salary-details/', {
+            'employee': employee.id, 'basic_salary': '3000.00', 'housing_allowance': '1000.00',
+            'transport_allowance': '500.00', 'updated_at': '2025-01-01T00:00:00Z',
+        }, status_code=201)
+
+    def test_update_salary_record(self):
+        salary_id = self.employee.salary_details.id
+        self.assertQueryBudget(6, 'patch', f'/api/employees/update-salary-details/{salary_id}/',
+                               {'bank_name': 'Bank'})
+
+    def test_create_payroll_record(self):
+        self.assertQueryBudget(12, 'post', '/api/employees/create_payroll/', {
+            'employee': self.employee.id, 'month': 4, 'year': 2025, 'overtime_days': 0,
+        }, status_code=201)
+
+    def test_update_payroll_record(self):
+        record = PayrollRecord.objects.filter(employee=self.employee).first()
+        self.assertQueryBudget(12, 'patch', f'/api/employees/update-payroll-record/{record.id}/',
+                               {'overtime_days': 2})
+
+    def test_run_payroll(self):
+        self.assertQueryBudget(14, 'post', '/api/employees/run_payroll/', {'month': 5, 'year': 2025},
+                               status_code=201)
+
+    def test_simulate_payroll_cost(self):
+        self.assertQueryBudget(2, 'post', '/api/employees/simulate_payroll_cost/',
+                               {'rules': [{'percent': 5}]})
+
+    def test_export_payroll_register(self):
+        self.assertConstantQueries(1, '/api/employees/payroll_register/', {'year': 2025})
+
+    def test_export_payroll_register_for_department(self):
+        self.assertConstantQueries(1, '/api/employees/payroll_register/', {'year': 2025, 'month': 1, 'department': 'IT'})
+
+    def add_bank_details(self):
+        """Valid bank details for every employee seeded without them"""
+        for pk in SalaryDetails.objects.filter(iban__isnull=True).values_list('pk', flat=True):
+            SalaryDetails.objects.filter(pk=pk).update(
+                iban=make_iban(f'{pk:019d}'), routing_code='303320101', wps_person_id=f'{pk:014d}'
+            )
+
+    @override_settings(WPS_EMPLOYER_ID='1000000000001', WPS_EMPLOYER_ROUTING_CODE='302620122')
+    def test_export_wps_sif(self):
+        self.add_bank_details()
+        before = self.assertQueryBudget(1, 'get', '/api/employees/wps_sif/', {'month': 1, 'year': 2025})
+        self.seed(3)
+        self.add_bank_details()
+        after = self.assertQueryBudget(1, 'get', '/api/employees/wps_sif/', {'month': 1, 'year': 2025})
+        self.assertEqual(before, after)
+
+    @patch('employees.payslip.render_payslip_pdf', return_value=b'%PDF-1.4 slip')
+    def test_download_payslips_archive(self, render):
+        with tempfile.TemporaryDirectory() as directory, override_settings(PAYSLIP_PDF_CACHE_DIR=directory):
+            self.assertConstantQueries(2, '/api/employees/payslips_archive/', {'month': 1, 'year': 2025})
+
+    def test_send_salary_slip(self):
+        record = PayrollRecord.objects.filter(employee=self.employee).first()
+        with patch('employees.tasks.send_salary_slip_email.apply_async'):
+            self.assertQueryBudget(7, 'post', f'/api/employees/send_salary_slip/{record.id}/', status_code=202)
+
+    def test_send_salary_slips(self):
+        with patch('employees.views.send_period_salary_slips.delay') as delay:
+            delay.return_value.id = 'job'
+            self.assertQueryBudget(1, 'post', '/api/employees/send_salary_slips/', {'month': 1, 'year': 2025},
+                                   status_code=202)
+
+    def test_salary_slip_status(self):
+        record = PayrollRecord.objects.filter(employee=self.employee).first()
+        PayslipDelivery.objects.create(payroll_record=record, status='Sent')
+        self.assertQueryBudget(1, 'get', f'/api/employees/salary_slip_status/{record.id}/')
+
+    def test_create_salary_revision(self):
+        self.assertQueryBudget(21, 'post', f'/api/employees/create-salary-revision/{self.employee.id}/', {
+            'revised_basic_salary': '3500.00', 'revised_housing_allowance': '1000.00',
+            'revised_transport_allowance': '500.00', 'revised_gross_salary': '0', 'revised_other_allowance': '0',
+            'previous_basic_salary': '3300.00', 'previous_housing_allowance': '1000.00',
+            'previous_transport_allowance': '500.00', 'previous_gross_salary': '4800.00',
+            'previous_other_allowance': '0', 'revision_date': '2025-05-01', 'employee': self.employee.id,
+            'revised_salary_effective_from': '2025-02-01', 'revision_reason': 'Promotion',
+        }, status_code=201)
+
+    def test_edit_salary_revision(self):
+        revision = SalaryRevision.objects.filter(employee=self.employee).first()
+        self.assertQueryBudget(21, 'put', f'/api/employees/salary-revision/edit/{revision.id}/', {
+            'revised_basic_salary': '3400.00', 'revised_housing_allowance': '1000.00',
+            'revised_transport_allowance': '500.00', 'revised_gross_salary': '0', 'revised_other_allowance': '0',
+            'previous_basic_salary': '3000.00', 'previous_housing_allowance': '1000.00',
+            'previous_transport_allowance': '500.00', 'previous_gross_salary': '4500.00',
+            'previous_other_allowance': '0', 'revision_date': '2025-05-01',
+            'revised_salary_effective_from': '2025-02-01', 'revision_reason': 'Correction',
+        })
+
+
+class EmployeeSelfServiceQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets of the endpoints employees use for their own records"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.client.force_authenticate(self.employee.user)
+
+    def test_view_employee(self):
+        self.assertQueryBudget(1, 'get', '/api/employees/employee/profile/')
+
+    def test_update_own_details(self):
+        self.assertQueryBudget(4, 'patch', '/api/employees/employee/update/', {'address': 'New Address'})
+
+    def test_view_own_salary_details(self):
+        self.assertQueryBudget(2, 'get', '/api/employees/employee/salary-details/')
+
+    def test_view_own_payroll(self):
+        before = self.assertQueryBudget(2, 'get', '/api/employees/employee/payroll/')
+        PayrollRecord.objects.create(employee=self.employee, month=6, year=2025)
+        self.assertEqual(self.assertQueryBudget(2, 'get', '/api/employees/employee/payroll/'), before)
+
+    def test_download_payroll_pdf(self):
+        record = PayrollRecord.objects.filter(employee=self.employee).first()
+        self.assertQueryBudget(2, 'get', f'/api/employees/employee/payroll/download/{record.id}/')
+
+    def test_view_colleagues(self):
+        self.assertConstantQueries(1, '/api/employees/employee/colleagues/')
+
+    def test_view_colleagues_paginated(self):
+        self.assertConstantQueries(1, '/api/employees/employee/colleagues/', {'page_size': 2, 'fields': 'id,full_name'})
+
+    def test_get_own_salary_revisions(self):
+        self.employee.user.user_type = 'Employee'
+        self.assertQueryBudget(4, 'get', '/api/employees/salary-revisions/', {'user': self.employee.user.id})
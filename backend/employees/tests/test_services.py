@@ -0,0 +1,680 @@
+"""
+Tests for Employee services
+"""
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.query import QuerySet
+from django.test.utils import CaptureQueriesContext
+from decimal import Decimal
+import datetime
+from employees.models import Employee, SalaryDetails, PayrollRecord, SalaryRevision, PayrollMonthSummary, PayslipDelivery
+from leaves.models import Leave
+from employees.services import PayrollRunService, PayrollRecomputeService, PayrollSummaryService, PayrollSimulationService, SalaryRevisionService, PayslipDispatchService, PayrollRegisterService, WPSFileService
+from django.utils import timezone
+from employees.constants import PAYROLL_REGISTER_COLUMNS
+
+CustomUser = get_user_model()
+
+
+def create_employee(username, department='IT', **salary):
+    """Create an employee, with salary details when salary components are given"""
+    user = CustomUser.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='testpass123'
+    )
+    employee = Employee.objects.create(
+        user=user,
+        first_name=username.title(),
+        last_name='Doe',
+        date_of_birth=datetime.date(1990, 1, 1),
+        place_of_birth='Test City',
+        nationality='Test Nationality',
+        gender='Male',
+        marital_status='Unmarried',
+        phone_number='1234567890',
+        email=f'{username}@company.com',
+        personal_email=f'{username}@example.com',
+        joining_date=datetime.date(2023, 1, 1),
+        address='Test Address',
+        designation='Developer',
+        department=department,
+        qualification='Bachelor'
+    )
+    if salary:
+        SalaryDetails.objects.create(employee=employee, **salary)
+    return employee
+
+
+class PayrollRunServiceTestCase(TestCase):
+    """Test cases for PayrollRunService"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.john = create_employee(
+            'john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00'), other_allowance=Decimal('200.00')
+        )
+        self.jane = create_employee(
+            'jane', basic_salary=Decimal('6000.00'), housing_allowance=Decimal('2000.00'),
+            transport_allowance=Decimal('800.00')
+        )
+
+    def test_run_payroll_creates_records_for_all_employees(self):
+        """Test that one run creates a record per employee"""
+        result = PayrollRunService.run_payroll(5, 2025)
+
+        self.assertTrue(result['completed'])
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(PayrollRecord.objects.filter(month=5, year=2025).count(), 2)
+        self.assertEqual(result['total_salary'], Decimal('4700.00') + Decimal('8800.00'))
+
+    def test_run_payroll_matches_model_calculation(self):
+        """Test that bulk totals match PayrollRecord.save()"""
+        adjustment = {'overtime_days': 2, 'normal_overtime_days': 1, 'unpaid_days': 1,
+                      'total_workable_days': 25, 'other_deductions': '50.00'}
+        PayrollRunService.run_payroll(5, 2025, {self.john.id: adjustment})
+
+        bulk_record = PayrollRecord.objects.get(employee=self.john, month=5, year=2025)
+        saved_record = PayrollRecord.objects.create(
+            employee=self.john, month=6, year=2025, overtime_days=2, normal_overtime_days=1,
+            unpaid_days=1, total_workable_days=25, other_deductions=Decimal('50.00')
+        )
+        saved_record.refresh_from_db()
+        self.assertEqual(bulk_record.total_salary_for_month, saved_record.total_salary_for_month)
+        self.assertEqual(bulk_record.current_basic_salary, Decimal('3000.00'))
+        self.assertEqual(bulk_record.overtime_amount, Decimal('300.00'))
+
+    def test_run_payroll_skips_existing_records(self):
+        """Test that the (employee, month, year) uniqueness is honoured"""
+        PayrollRecord.objects.create(employee=self.john, month=5, year=2025)
+
+        result = PayrollRunService.run_payroll(5, 2025)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['already_processed'], [self.john.id])
+        self.assertEqual(PayrollRecord.objects.filter(month=5, year=2025).count(), 2)
+
+    def test_run_payroll_aborts_on_missing_salary_details(self):
+        """Test the pre-flight check for employees without salary details"""
+        unpaid = create_employee('unpaid')
+
+        result = PayrollRunService.run_payroll(5, 2025)
+
+        self.assertFalse(result['completed'])
+        self.assertEqual([item['employee'] for item in result['missing_salary_details']], [unpaid.id])
+        self.assertFalse(PayrollRecord.objects.exists())
+
+        result = PayrollRunService.run_payroll(5, 2025, allow_missing=True)
+        self.assertTrue(result['completed'])
+        self.assertEqual(result['created'], 2)
+
+    def test_run_payroll_query_count(self):
+        """Test that the run does not issue queries per employee"""
+        for index in range(10):
+            create_employee(f'bulk{index}', basic_salary=Decimal('1000.00'),
+                            housing_allowance=Decimal('0'), transport_allowance=Decimal('0'))
+
+        # One of them reads the month's approved unpaid leave
+        with self.assertNumQueries(11):
+            result = PayrollRunService.run_payroll(5, 2025)
+        self.assertEqual(result['created'], 12)
+
+    def test_unpaid_days_come_from_approved_unpaid_leave(self):
+        """Test that approved unpaid leave in the month is deducted in calendar days, unless adjusted"""
+        for status, start_date, end_date in (('Approved', datetime.date(2025, 4, 28), datetime.date(2025, 5, 6)),
+                                             ('Pending', datetime.date(2025, 5, 19), datetime.date(2025, 5, 20))):
+            leave = Leave.objects.create(employee=self.john, leave_type='Unpaid', start_date=start_date,
+                                         end_date=end_date)
+            Leave.objects.filter(pk=leave.pk).update(status=status)
+
+        PayrollRunService.run_payroll(5, 2025, adjustments={self.jane.id: {'unpaid_days': 2}})
+
+        # May 1-6 of the approved leave, weekend included; the pending one does not count
+        john = PayrollRecord.objects.get(employee=self.john, month=5)
+        self.assertEqual(john.unpaid_days, 6)
+        self.assertEqual(john.total_salary_for_month,
+                         round(Decimal('4700.00') - 6 * Decimal('3000.00') / 30, 2))
+        self.assertEqual(PayrollRecord.objects.get(employee=self.jane, month=5).unpaid_days, 2)
+
+    def test_unpaid_month_deducts_the_basic_salary(self):
+        """Test that unpaid leave over a whole 31-day month is capped at the 30 days a month is priced on"""
+        leave = Leave.objects.create(employee=self.john, leave_type='Unpaid', start_date=datetime.date(2025, 5, 1),
+                                     end_date=datetime.date(2025, 5, 31))
+        Leave.objects.filter(pk=leave.pk).update(status='Approved')
+
+        PayrollRunService.run_payroll(5, 2025)
+
+        record = PayrollRecord.objects.get(employee=self.john, month=5)
+        self.assertEqual(record.unpaid_days, 30)
+        self.assertEqual(record.total_salary_for_month, Decimal('4700.00') - Decimal('3000.00'))
+
+    def test_dry_run_does_not_write(self):
+        """Test that a dry run computes totals without creating records"""
+        result = PayrollRunService.run_payroll(5, 2025, dry_run=True)
+
+        self.assertEqual(result['created'], 2)
+        self.assertFalse(PayrollRecord.objects.exists())
+
+
+class PayrollRecomputeServiceTestCase(TestCase):
+    """Test cases for PayrollRecomputeService"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee(
+            'john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        self.other = create_employee(
+            'jane', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        for year, month in [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]:
+            PayrollRecord.objects.create(employee=self.employee, month=month, year=year, overtime_days=1)
+        PayrollRecord.objects.create(employee=self.other, month=2, year=2025)
+
+    def create_revision(self):
+        """Create a revision effective from mid-December 2024"""
+        return SalaryRevision.objects.create(
+            employee=self.employee,
+            revised_basic_salary=Decimal('3600.00'),
+            revised_housing_allowance=Decimal('1000.00'),
+            revised_transport_allowance=Decimal('500.00'),
+            revised_other_allowance=Decimal('0.00'),
+            previous_basic_salary=Decimal('3000.00'),
+            previous_housing_allowance=Decimal('1000.00'),
+            previous_transport_allowance=Decimal('500.00'),
+            previous_other_allowance=Decimal('0.00'),
+            previous_gross_salary=Decimal('4500.00'),
+            revised_salary_effective_from=datetime.date(2024, 12, 15),
+            revision_reason='Promotion'
+        )
+
+    def test_revision_recomputes_periods_from_effective_month(self):
+        """Test that saving a revision updates only the affected payroll periods"""
+        revision = self.create_revision()
+
+        changed = {(item['year'], item['month']) for item in revision.recomputed_payroll['changed']}
+        self.assertEqual(changed, {(2024, 12), (2025, 1), (2025, 2)})
+        self.assertEqual(revision.recomputed_payroll['recomputed'], 3)
+
+        november = PayrollRecord.objects.get(employee=self.employee, month=11, year=2024)
+        january = PayrollRecord.objects.get(employee=self.employee, month=1, year=2025)
+        # gross 5100 + one holiday overtime day at 120 * 1.5
+        self.assertEqual(january.total_salary_for_month, Decimal('5280.00'))
+        self.assertEqual(january.current_basic_salary, Decimal('3600.00'))
+        self.assertEqual(november.total_salary_for_month, Decimal('4650.00'))
+        self.assertEqual(
+            PayrollRecord.objects.get(employee=self.other).total_salary_for_month, Decimal('4500.00')
+        )
+
+    def test_recompute_reports_only_changed_records(self):
+        """Test that running the recompute twice reports no further changes"""
+        revision = self.create_revision()
+
+        result = PayrollRecomputeService.recompute_for_revision(revision)
+
+        self.assertEqual(result['recomputed'], 3)
+        self.assertEqual(result['changed'], [])
+
+    def test_recompute_query_count(self):
+        """Test that the recompute does not issue queries per payroll record"""
+        revision = self.create_revision()
+        for month in range(3, 13):
+            PayrollRecord.objects.create(employee=self.employee, month=month, year=2025)
+
+        with self.assertNumQueries(5):
+            result = PayrollRecomputeService.recompute_for_revision(revision)
+        self.assertEqual(result['recomputed'], 13)
+
+
+class PayrollSummaryServiceTestCase(TestCase):
+    """Test cases for PayrollSummaryService and the rollup signals"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.john = create_employee(
+            'john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        self.jane = create_employee(
+            'jane', basic_salary=Decimal('6000.00'), housing_allowance=Decimal('2000.00'),
+            transport_allowance=Decimal('800.00')
+        )
+
+    def test_rollup_follows_create_update_and_delete(self):
+        """Test that the rollup is refreshed on every payroll write"""
+        john_record = PayrollRecord.objects.create(employee=self.john, month=3, year=2025, overtime_days=2)
+        PayrollRecord.objects.create(employee=self.jane, month=3, year=2025)
+
+        summary = PayrollMonthSummary.objects.get(year=2025, month=3)
+        self.assertEqual(summary.headcount, 2)
+        self.assertEqual(summary.total_salary, Decimal('4800.00') + Decimal('8800.00'))
+        self.assertEqual(summary.total_overtime_days, 2)
+        self.assertEqual(summary.average_salary, Decimal('6800.00'))
+
+        john_record.month = 4
+        john_record.save()
+        self.assertEqual(PayrollMonthSummary.objects.get(year=2025, month=3).headcount, 1)
+        self.assertEqual(PayrollMonthSummary.objects.get(year=2025, month=4).total_salary, Decimal('4800.00'))
+
+        john_record.delete()
+        self.assertFalse(PayrollMonthSummary.objects.filter(year=2025, month=4).exists())
+
+    def test_bulk_payroll_run_refreshes_rollup(self):
+        """Test that bulk-created payroll records are reflected in the rollup"""
+        PayrollRunService.run_payroll(5, 2025)
+
+        summary = PayrollMonthSummary.objects.get(year=2025, month=5)
+        self.assertEqual(summary.headcount, 2)
+        self.assertEqual(summary.total_salary, Decimal('13300.00'))
+
+    def assertRollupMatchesRecords(self):
+        for year, month in PayrollRecord.objects.values_list('year', 'month').distinct():
+            summary = PayrollMonthSummary.objects.get(year=year, month=month)
+            expected = PayrollSummaryService.refresh_period(year, month)
+            self.assertEqual(
+                (summary.total_salary, summary.total_overtime_days, summary.headcount, summary.average_salary,
+                 summary.average_overtime_days),
+                (expected.total_salary, expected.total_overtime_days, expected.headcount, expected.average_salary,
+                 expected.average_overtime_days),
+                (year, month)
+            )
+
+    def test_incremental_rollup_matches_a_recount(self):
+        """Test that the applied differences add up to what counting the records gives"""
+        alex = create_employee('alex', basic_salary=Decimal('3333.33'), housing_allowance=Decimal('0'),
+                               transport_allowance=Decimal('0'))
+        john_record = PayrollRecord.objects.create(employee=self.john, month=3, year=2025, overtime_days=2)
+        PayrollRecord.objects.create(employee=self.jane, month=3, year=2025, overtime_days=1)
+        alex_record = PayrollRecord.objects.create(employee=alex, month=3, year=2025, unpaid_days=1)
+        PayrollRunService.run_payroll(4, 2025)
+        john_record.overtime_days = 5
+        john_record.save()
+        alex_record = PayrollRecord.objects.get(pk=alex_record.pk)
+        alex_record.month = 4
+        PayrollRecord.objects.filter(month=4, employee=alex).delete()
+        alex_record.save()
+        PayrollRecord.objects.get(month=4, employee=self.jane).delete()
+
+        self.assertRollupMatchesRecords()
+
+    def test_run_adds_the_stored_totals(self):
+        """Test that a run with non-terminating daily rates adds the rounded totals, so a later delete leaves no drift"""
+        for index in range(3):
+            create_employee(f'odd{index}', basic_salary=Decimal('1000.00'), housing_allowance=Decimal('0'),
+                            transport_allowance=Decimal('0'))
+        adjustments = {employee.id: {'unpaid_days': 1, 'overtime_days': 1}
+                       for employee in Employee.objects.filter(first_name__startswith='Odd')}
+
+        result = PayrollRunService.run_payroll(5, 2025, adjustments)
+        stored = PayrollRecord.objects.filter(year=2025, month=5).aggregate(total=Sum('total_salary_for_month'))
+        self.assertEqual(result['total_salary'], stored['total'])
+        PayrollRecord.objects.filter(year=2025, month=5, employee__first_name='Odd0').get().delete()
+
+        summary = PayrollMonthSummary.objects.get(year=2025, month=5)
+        remaining = PayrollRecord.objects.filter(year=2025, month=5).aggregate(total=Sum('total_salary_for_month'))
+        self.assertEqual(summary.total_salary, remaining['total'])
+
+    def test_save_applies_only_the_difference(self):
+        """Test that a save is one rollup UPDATE, without recounting the month or re-reading the record"""
+        record = PayrollRecord.objects.create(employee=self.john, month=3, year=2025)
+        record = PayrollRecord.objects.select_related('employee__salary_details').get(pk=record.pk)
+
+        record.overtime_days = 3
+        with CaptureQueriesContext(connection) as queries:
+            record.save()
+        statements = [query['sql'] for query in queries]
+
+        self.assertEqual(len(statements), 2, statements)
+        self.assertIn('employees_payrollmonthsummary', statements[1])
+        self.assertNotIn('COUNT', statements[1])
+        with self.assertNumQueries(1):
+            record.save()  # unchanged: the rollup is left alone
+        self.assertRollupMatchesRecords()
+
+    def test_concurrent_first_write_of_a_period(self):
+        """Test that losing the race to create the period's row adds to the row the other writer created"""
+        PayrollMonthSummary.objects.create(year=2025, month=6, total_salary=Decimal('100.00'), headcount=1,
+                                           average_salary=Decimal('100.00'))
+        update = QuerySet.update
+        calls = []
+
+        def update_before_the_other_writer(queryset, **kwargs):
+            # The first UPDATE ran before the other writer's row was committed
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with patch.object(QuerySet, 'update', autospec=True, side_effect=update_before_the_other_writer):
+            PayrollSummaryService.apply_delta(2025, 6, total_salary=Decimal('100.00'), overtime_days=1, headcount=1)
+
+        summary = PayrollMonthSummary.objects.get(year=2025, month=6)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((summary.total_salary, summary.headcount, summary.average_salary),
+                         (Decimal('200.00'), 2, Decimal('100.00')))
+
+    def test_dashboard_average_is_over_all_employees(self):
+        """Test that the month's average salary divides by every employee, as the dashboard always has"""
+        today = timezone.now()
+        record = PayrollRecord.objects.create(employee=self.john, month=today.month, year=today.year)
+        create_employee('alex')
+
+        summary = PayrollSummaryService.dashboard_summary()
+
+        self.assertEqual(summary['total_employees'], 3)
+        self.assertEqual(summary['average_salary_for_month'], round(record.total_salary_for_month / 3, 2))
+        self.assertEqual(summary['monthly_data'][0]['average_salary'], round(record.total_salary_for_month, 2))
+
+    def test_dashboard_summary_reads_rollup(self):
+        """Test the dashboard figures and that they cost a constant number of queries"""
+        today = timezone.now()
+        PayrollRecord.objects.create(employee=self.john, month=today.month, year=today.year, overtime_days=1)
+        PayrollRecord.objects.create(employee=self.jane, month=today.month, year=today.year)
+        PayrollRecord.objects.create(employee=self.john, month=today.month, year=today.year - 1)
+
+        with self.assertNumQueries(2):
+            summary = PayrollSummaryService.dashboard_summary()
+
+        self.assertEqual(summary['total_salary_for_month'], Decimal('4650.00') + Decimal('8800.00'))
+        self.assertEqual(summary['total_overtime_for_month'], 1)
+        self.assertEqual(summary['total_employees'], 2)
+        self.assertEqual(len(summary['monthly_data']), 2)
+        self.assertEqual(summary['monthly_data'][0]['year'], today.year)
+
+
+class PayrollSimulationServiceTestCase(TestCase):
+    """Test cases for PayrollSimulationService"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.developer = create_employee(
+            'developer', department='IT', basic_salary=Decimal('3000.00'),
+            housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('333.33')
+        )
+        self.accountant = create_employee(
+            'accountant', department='Accounts', basic_salary=Decimal('5000.00'),
+            housing_allowance=Decimal('1500.00'), transport_allowance=Decimal('500.00'),
+            other_allowance=Decimal('100.00')
+        )
+
+    def test_simulate_without_rules_returns_current_cost(self):
+        """Test that an empty scenario projects the current cost"""
+        result = PayrollSimulationService.simulate([])
+
+        self.assertEqual(result['total']['headcount'], 2)
+        self.assertEqual(result['total']['current_monthly_cost'], Decimal('11433.33'))
+        self.assertEqual(result['total']['projected_annual_cost'], Decimal('11433.33') * 12)
+        self.assertEqual(result['total']['difference_annual_cost'], Decimal('0'))
+
+    def test_simulate_department_and_default_rules(self):
+        """Test a 5% raise in IT and 3% elsewhere"""
+        result = PayrollSimulationService.simulate([{'department': 'IT', 'percent': 5}, {'percent': 3}])
+        departments = {row['department']: row for row in result['departments']}
+
+        # 3000 * 1.05 + 1000 * 1.05 + 333.33 * 1.05 (= 349.9965 -> 350.00)
+        self.assertEqual(departments['IT']['projected_monthly_cost'], Decimal('4550.00'))
+        self.assertEqual(departments['Accounts']['projected_monthly_cost'], Decimal('7313.00'))
+        self.assertEqual(result['total']['projected_monthly_cost'], Decimal('11863.00'))
+
+    def test_simulate_last_duplicate_rule_wins(self):
+        """Test that department rules and default rules both resolve duplicates to the last one"""
+        result = PayrollSimulationService.simulate([
+            {'department': 'IT', 'percent': 50}, {'percent': 50},
+            {'department': 'IT', 'percent': 10}, {'percent': 10},
+            {'department': 'IT', 'percent': 20, 'components': ['housing_allowance']},
+        ])
+        departments = {row['department']: row for row in result['departments']}
+
+        # IT: basic and transport +10%, housing +20% (3300.00 + 1200.00 + 366.66); Accounts: +10% on everything
+        self.assertEqual(departments['IT']['projected_monthly_cost'], Decimal('4866.66'))
+        self.assertEqual(departments['Accounts']['projected_monthly_cost'], Decimal('7810.00'))
+
+    def test_simulate_matches_saved_salary_revision(self):
+        """Test that projected gross matches SalaryDetails after an equivalent revision"""
+        result = PayrollSimulationService.simulate([{'percent': 7.5, 'components': ['basic_salary']}])
+
+        salary_details = self.developer.salary_details
+        salary_details.basic_salary = (salary_details.basic_salary * Decimal('1.075')).quantize(Decimal('0.01'))
+        salary_details.save()
+        salary_details.refresh_from_db()
+        payroll = PayrollRecord.objects.create(employee=self.developer, month=1, year=2026)
+        payroll.refresh_from_db()
+
+        departments = {row['department']: row for row in result['departments']}
+        self.assertEqual(departments['IT']['projected_monthly_cost'], salary_details.gross_salary)
+        self.assertEqual(departments['IT']['projected_monthly_cost'], payroll.total_salary_for_month)
+
+    def test_simulate_never_writes(self):
+        """Test that the simulation is a single read query"""
+        with self.assertNumQueries(1):
+            PayrollSimulationService.simulate([{'percent': 10}])
+        self.assertEqual(self.developer.salary_details.basic_salary, Decimal('3000.00'))
+
+    def test_simulate_rejects_invalid_rules(self):
+        """Test scenario rule validation"""
+        with self.assertRaises(ValidationError):
+            PayrollSimulationService.simulate([{'department': 'Marketing', 'percent': 5}])
+        with self.assertRaises(ValidationError):
+            PayrollSimulationService.simulate([{'percent': 'five'}])
+        with self.assertRaises(ValidationError):
+            PayrollSimulationService.simulate([{'percent': 5, 'components': ['bonus']}])
+
+
+class SalaryRevisionServiceTestCase(TestCase):
+    """Test cases for SalaryRevisionService"""
+
+    def setUp(self):
+        """Set up test data"""
+        salary = dict(basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+                      transport_allowance=Decimal('500.00'))
+        self.john = create_employee('john', **salary)
+        self.jane = create_employee('jane', **salary)
+        create_employee('jack', **salary)
+
+    def create_revision(self, employee, basic_salary, revision_date):
+        """Create a revision and backdate it, revision_date being auto_now_add"""
+        revision = SalaryRevision.objects.create(
+            employee=employee, revised_basic_salary=basic_salary, revised_housing_allowance=Decimal('1000.00'),
+            revised_transport_allowance=Decimal('500.00'), previous_basic_salary=Decimal('3000.00'),
+            previous_housing_allowance=Decimal('1000.00'), previous_transport_allowance=Decimal('500.00'),
+            previous_gross_salary=Decimal('4500.00'), revised_salary_effective_from=datetime.date(2025, 1, 1),
+            revision_reason='Review'
+        )
+        SalaryRevision.objects.filter(pk=revision.pk).update(revision_date=revision_date)
+        return revision
+
+    def test_get_latest_revisions(self):
+        """Test that only the latest revision of each employee with revisions is returned"""
+        self.create_revision(self.john, Decimal('3500.00'), timezone.make_aware(datetime.datetime(2025, 3, 1)))
+        self.create_revision(self.john, Decimal('3200.00'), timezone.make_aware(datetime.datetime(2024, 3, 1)))
+        latest_jane = self.create_revision(self.jane, Decimal('4000.00'), timezone.make_aware(datetime.datetime(2024, 6, 1)))
+
+        with self.assertNumQueries(1):
+            revisions = list(SalaryRevisionService.get_latest_revisions())
+            gross = [revision.employee.salary_details.gross_salary for revision in revisions]
+
+        self.assertEqual([(r.employee_id, r.revised_basic_salary) for r in revisions],
+                         [(self.john.id, Decimal('3500.00')), (self.jane.id, Decimal('4000.00'))])
+        self.assertEqual(revisions[1].id, latest_jane.id)
+        self.assertEqual(len(gross), 2)
+
+    def test_get_latest_revisions_same_date(self):
+        """Test that revisions saved at the same time resolve to the newest one"""
+        revision_date = timezone.make_aware(datetime.datetime(2025, 3, 1))
+        self.create_revision(self.john, Decimal('3500.00'), revision_date)
+        newest = self.create_revision(self.john, Decimal('3600.00'), revision_date)
+
+        self.assertEqual([r.id for r in SalaryRevisionService.get_latest_revisions()], [newest.id])
+
+
+@patch('employees.payslip.render_payslip_pdf', return_value=b'%PDF-1.4 slip')
+class PayslipDispatchServiceTestCase(TestCase):
+    """Test cases for PayslipDispatchService"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.records = []
+        for username in ('john', 'jane', 'jack'):
+            employee = create_employee(username, basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+                                       transport_allowance=Decimal('500.00'))
+            self.records.append(PayrollRecord.objects.create(employee=employee, month=1, year=2025))
+        PayrollRecord.objects.create(employee=employee, month=2, year=2025)
+
+    def send(self, **kwargs):
+        return PayslipDispatchService.send_period(1, 2025, workers=1, batch_size=2, send_interval=0, **kwargs)
+
+    def test_send_period_uses_one_connection(self, render):
+        """Test that every slip of the period goes out through a single SMTP connection"""
+        with patch('employees.services.get_connection', wraps=mail.get_connection) as get_connection:
+            result = self.send()
+
+        get_connection.assert_called_once()
+        self.assertEqual(result, {'sent': 3, 'failed': [], 'already_sent': 0})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['jack@example.com', 'jane@example.com', 'john@example.com'])
+        self.assertEqual(PayslipDelivery.objects.filter(status='Sent').count(), 3)
+
+    def test_send_period_resumes(self, render):
+        """Test that slips already sent are not emailed again"""
+        PayslipDelivery.objects.create(payroll_record=self.records[0], status='Sent')
+
+        self.assertEqual(self.send()['sent'], 2)
+        self.assertEqual(self.send(), {'sent': 0, 'failed': [], 'already_sent': 3})
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failure_does_not_stop_the_run(self, render):
+        """Test that a failing slip is recorded and the others are still sent"""
+        failing = self.records[1]
+        send_one = PayslipDispatchService._send_one
+
+        def fail_for_one(connection, record, pdf_content):
+            if record.id == failing.id:
+                raise ValueError('bad address')
+            return send_one(connection, record, pdf_content)
+
+        with patch.object(PayslipDispatchService, '_send_one', side_effect=fail_for_one):
+            result = self.send()
+
+        self.assertEqual(result['sent'], 2)
+        self.assertEqual(result['failed'], [{'payroll_record': failing.id, 'error': 'bad address'}])
+        self.assertEqual(PayslipDelivery.objects.get(payroll_record=failing).status, 'Failed')
+
+    def test_render_failure_only_fails_its_slip(self, render):
+        """Test that a slip whose PDF cannot be rendered is marked failed and the rest of its batch is sent"""
+        failing = self.records[0]
+
+        def fail_for_one(payroll_record):
+            if payroll_record.id == failing.id:
+                raise ValueError('cannot render')
+            return b'%PDF-1.4 slip'
+
+        with patch.object(PayslipDispatchService, 'render', side_effect=fail_for_one):
+            result = self.send()
+
+        self.assertEqual(result['sent'], 2)
+        self.assertEqual(result['failed'], [{'payroll_record': failing.id, 'error': 'cannot render'}])
+        self.assertEqual(PayslipDelivery.objects.get(payroll_record=failing).status, 'Failed')
+        self.assertEqual(PayslipDelivery.objects.filter(status='Sent').count(), 2)
+
+    def test_renders_in_process_pool(self, render):
+        """Test that PDFs rendered by pool workers are attached"""
+        result = PayslipDispatchService.send_period(1, 2025, workers=2, send_interval=0)
+
+        self.assertEqual(result['sent'], 3)
+        self.assertTrue(all(message.attachments[0][1] == b'%PDF-1.4 slip' for message in mail.outbox))
+
+    def test_concurrent_run_is_refused(self, render):
+        """Test that a second run of the same period does nothing while the first holds the lock"""
+        cache.add('payslip-dispatch:2025:1', True)
+        try:
+            self.assertIsNone(self.send())
+        finally:
+            cache.delete('payslip-dispatch:2025:1')
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class PayrollRegisterServiceTestCase(TestCase):
+    """Test cases for PayrollRegisterService"""
+
+    def setUp(self):
+        """Set up test data"""
+        for username in ('john', 'jane', 'jack'):
+            employee = create_employee(username, basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+                                       transport_allowance=Decimal('500.00'))
+            PayrollRecord.objects.create(employee=employee, month=1, year=2025)
+
+    def test_stream_csv_in_chunks(self):
+        """Test that rows are written out a chunk at a time after the header"""
+        chunks = list(PayrollRegisterService.stream_csv(2025, chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].startswith('Employee ID,Employee Name,'))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [1, 2, 1])
+
+    def test_stream_csv_query_count(self):
+        """Test that the export reads all rows in a single query"""
+        with self.assertNumQueries(1):
+            list(PayrollRegisterService.stream_csv(2025, chunk_size=2))
+
+    def test_revision_leaves_earlier_months_unchanged(self):
+        """Test that a past month exports the salary it was paid on after a later revision"""
+        employee = Employee.objects.get(first_name='John')
+        PayrollRunService.run_payroll(2, 2025, allow_missing=True)
+        before = list(PayrollRegisterService.get_rows(2025, month=1))
+
+        SalaryRevision.objects.create(
+            employee=employee, revised_basic_salary=Decimal('3600.00'), revised_housing_allowance=Decimal('1400.00'),
+            revised_transport_allowance=Decimal('600.00'), revised_other_allowance=Decimal('100.00'),
+            previous_basic_salary=Decimal('3000.00'), previous_housing_allowance=Decimal('1000.00'),
+            previous_transport_allowance=Decimal('500.00'), previous_gross_salary=Decimal('4500.00'),
+            revised_salary_effective_from=datetime.date(2025, 2, 1), revision_reason='Promotion'
+        )
+
+        self.assertEqual(list(PayrollRegisterService.get_rows(2025, month=1)), before)
+        columns = [header for header, _ in PAYROLL_REGISTER_COLUMNS]
+        components = [columns.index(header) for header in
+                      ('Basic Salary', 'Housing Allowance', 'Transport Allowance', 'Other Allowance')]
+        for row in PayrollRegisterService.get_rows(2025):
+            self.assertEqual(sum(row[index] for index in components), row[columns.index('Gross Salary')])
+        february = PayrollRegisterService.get_rows(2025, month=2).get(employee=employee)
+        self.assertEqual(february[columns.index('Housing Allowance')], Decimal('1400.00'))
+
+
+def make_iban(bban):
+    """A UAE IBAN with valid check digits for a 19 digit bank code and account number"""
+    check = 98 - int(''.join(str(int(char, 36)) for char in bban + 'AE00')) % 97
+    return f'AE{check:02d}{bban}'
+
+
+class WPSFileServiceTestCase(TestCase):
+    """Test cases for WPSFileService"""
+
+    def test_is_valid_iban(self):
+        """Test the UAE IBAN length, country and mod-97 checks"""
+        self.assertTrue(WPSFileService.is_valid_iban('AE070331234567890123456'))
+        self.assertTrue(WPSFileService.is_valid_iban(make_iban('0260001015555555501')))
+        self.assertFalse(WPSFileService.is_valid_iban('AE080331234567890123456'))
+        self.assertFalse(WPSFileService.is_valid_iban('AE07033123456789012345'))
+        self.assertFalse(WPSFileService.is_valid_iban('GB070331234567890123456'))
+
+    def test_validate_reports_every_problem(self):
+        """Test that all invalid rows are reported together"""
+        rows = [
+            (1, 'John', 'Doe', 'AE07 0331 2345 6789 0123 456', '302620122', '12345678901234', Decimal('10'), 0, 0, 0),
+            (2, 'Jane', 'Doe', None, '30262', '12345678901234', Decimal('10'), 0, 0, 0),
+            (3, 'Jack', 'Doe', 'AE080331234567890123456', '302620122', None, Decimal('10'), 0, 0, 0),
+        ]
+
+        self.assertEqual(WPSFileService.validate(rows), [
+            {'employee': 2, 'employee_full_name': 'Jane Doe',
+             'errors': ['IBAN is missing.', 'Bank routing code must be 9 digits.']},
+            {'employee': 3, 'employee_full_name': 'Jack Doe',
+             'errors': ['IBAN is not a valid UAE IBAN.', 'WPS person ID is missing.']},
+        ])
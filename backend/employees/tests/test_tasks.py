@@ -0,0 +1,63 @@
+"""
+Tests for Employee Celery tasks
+"""
+from django.core import mail
+from django.test import TestCase
+from decimal import Decimal
+from smtplib import SMTPServerDisconnected, SMTPRecipientsRefused
+from unittest.mock import patch
+from employees.models import PayrollRecord, PayslipDelivery
+from employees.tasks import send_salary_slip_email
+from employees.tests.test_services import create_employee
+
+
+@patch('employees.payslip.render_payslip_pdf', return_value=b'%PDF-1.4 slip')
+class SendSalarySlipEmailTaskTestCase(TestCase):
+    """Test cases for the salary slip email task"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee(
+            'john', basic_salary=Decimal('3000.00'), housing_allowance=Decimal('1000.00'),
+            transport_allowance=Decimal('500.00')
+        )
+        self.record = PayrollRecord.objects.create(employee=self.employee, month=1, year=2025)
+
+    def test_sends_pdf_from_memory(self, render):
+        """Test that the slip is emailed with the rendered bytes attached"""
+        send_salary_slip_email.apply((self.record.id,))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.employee.user.email])
+        self.assertEqual(mail.outbox[0].attachments[0][1], b'%PDF-1.4 slip')
+        delivery = PayslipDelivery.objects.get(payroll_record=self.record)
+        self.assertEqual((delivery.status, delivery.attempts), ('Sent', 1))
+        self.assertIsNotNone(delivery.sent_at)
+
+    def test_retries_transient_smtp_errors(self, render):
+        """Test that a dropped connection is retried until the email goes out"""
+        with patch('django.core.mail.EmailMessage.send', side_effect=[SMTPServerDisconnected('gone'), 1]):
+            send_salary_slip_email.apply((self.record.id,))
+
+        delivery = PayslipDelivery.objects.get(payroll_record=self.record)
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_error), ('Sent', 2, ''))
+
+    def test_permanent_error_is_not_retried(self, render):
+        """Test that a refused recipient fails the delivery straight away"""
+        error = SMTPRecipientsRefused({'john@example.com': (550, b'No such user')})
+        with patch('django.core.mail.EmailMessage.send', side_effect=error):
+            result = send_salary_slip_email.apply((self.record.id,))
+
+        self.assertTrue(result.failed())
+        delivery = PayslipDelivery.objects.get(payroll_record=self.record)
+        self.assertEqual((delivery.status, delivery.attempts), ('Failed', 1))
+
+    def test_gives_up_after_max_retries(self, render):
+        """Test that the delivery is marked failed once the retries are used up"""
+        with patch('django.core.mail.EmailMessage.send', side_effect=SMTPServerDisconnected('gone')):
+            send_salary_slip_email.apply((self.record.id,))
+
+        delivery = PayslipDelivery.objects.get(payroll_record=self.record)
+        self.assertEqual(delivery.status, 'Failed')
+        self.assertEqual(delivery.attempts, send_salary_slip_email.max_retries + 1)
+        self.assertIn('gone', delivery.last_error)
@@ -0,0 +1,488 @@
+"""
+Tests for Employee views
+"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+import csv
+import shutil
+import tempfile
+import zipfile
+from django.http import QueryDict
+from employees.models import Employee, PayrollRecord, PayslipDelivery, SalaryDetails
+from employees.serializers import ColleagueSerializer
+from payroll.pagination import KeysetPagination
+from employees.tests.test_services import create_employee, make_iban
+
+CustomUser = get_user_model()
+
+
+class KeysetPaginationViewTestCase(TestCase):
+    """Test cases for keyset pagination on the admin list endpoints"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employees = [
+            create_employee(f'employee{index}', basic_salary=Decimal('3000.00'),
+                            housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+            for index in range(3)
+        ]
+        for employee in self.employees:
+            for month in (1, 2):
+                PayrollRecord.objects.create(employee=employee, month=month, year=2025)
+
+    def collect_pages(self, url, page_size):
+        """Follow next cursors and return every page's results"""
+        pages = []
+        response = self.client.get(url, {'page_size': page_size})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data['results'])
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_payroll_list_without_page_size_returns_full_list(self):
+        """Test that clients not asking for pages keep the plain list"""
+        response = self.client.get('/api/employees/view_all_payroll/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 6)
+
+    def test_payroll_list_pages_in_stable_order(self):
+        """Test that pages follow (-year, -month, -id) without gaps or duplicates"""
+        pages = self.collect_pages('/api/employees/view_all_payroll/', 4)
+
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        ids = [row['id'] for page in pages for row in page]
+        expected = list(PayrollRecord.objects.order_by('-year', '-month', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_employee_list_pages(self):
+        """Test that every employee is returned exactly once across pages"""
+        pages = self.collect_pages('/api/employees/view_all_employees/', 2)
+
+        ids = [row['id'] for page in pages for row in page]
+        self.assertEqual(sorted(ids), sorted(employee.id for employee in self.employees))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/employees/view_all_payroll/', {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_value_types(self):
+        """Test that a well-formed cursor holding values of the wrong type is rejected, not a server error"""
+        paginator = KeysetPagination()
+        for url, values in (('/api/employees/view_all_payroll/', ['2025', 'May', 1]),
+                            ('/api/employees/view_all_payroll/', [[2025], {}, 1]),
+                            ('/api/leaves/leaves/', [0, 'yesterday', 1])):
+            response = self.client.get(url, {'cursor': paginator.encode_cursor(values)})
+
+            self.assertEqual(response.status_code, 404, values)
+
+
+class SparseFieldsetViewTestCase(TestCase):
+    """Test cases for ?fields= / ?omit= on the employee endpoints"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        for index in range(2):
+            create_employee(f'employee{index}', basic_salary=Decimal('3000.00'),
+                            housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+
+    def test_fields_limits_output(self):
+        """Test that only the requested fields are serialized"""
+        response = self.client.get('/api/employees/view_all_employees/', {'fields': 'id,first_name,unknown'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(row) for row in response.data], [{'id', 'first_name'}] * 2)
+
+    def test_omit_removes_fields(self):
+        """Test that omitted fields are left out"""
+        response = self.client.get('/api/employees/view_all_employees/', {'omit': 'photo,address'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('photo', response.data[0])
+        self.assertNotIn('address', response.data[0])
+        self.assertIn('email', response.data[0])
+
+    def test_fields_projects_columns(self):
+        """Test that the query only selects the columns behind the kept fields"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/employees/view_all_employees/', {'fields': 'id,email'})
+
+        self.assertEqual(response.status_code, 200)
+        employee_query = next(query['sql'] for query in queries if 'FROM "employees_employee"' in query['sql'])
+        self.assertIn('"email"', employee_query)
+        self.assertNotIn('"address"', employee_query)
+
+    def test_fields_with_pagination(self):
+        """Test that projection keeps the ordering columns needed by the cursor"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/employees/view_all_employees/', {'fields': 'id', 'page_size': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'id': response.data['results'][0]['id']}])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_computed_field_loads_source_columns(self):
+        """Test that computed fields keep their source columns in the projection"""
+        query_params = QueryDict('fields=full_name')
+        colleagues = ColleagueSerializer.restrict_queryset(Employee.objects.order_by('id'), query_params)
+
+        with self.assertNumQueries(1):
+            data = ColleagueSerializer(colleagues, many=True, context={'query_params': query_params}).data
+        self.assertEqual([dict(row) for row in data], [{'full_name': 'Employee0 Doe'}, {'full_name': 'Employee1 Doe'}])
+
+
+class RunPayrollViewTestCase(TestCase):
+    """Test cases for validating the payroll run request"""
+
+    url = '/api/employees/run_payroll/'
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john', basic_salary=Decimal('3000.00'),
+                                        housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+
+    def test_false_strings_are_false(self):
+        """Test that a form-encoded dry_run of "false" or "0" really runs the payroll"""
+        for value in ('false', '0'):
+            PayrollRecord.objects.all().delete()
+            response = self.client.post(self.url, {'month': 5, 'year': 2025, 'dry_run': value})
+
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertTrue(PayrollRecord.objects.filter(employee=self.employee, month=5, year=2025).exists())
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a true dry_run leaves the records unwritten"""
+        response = self.client.post(self.url, {'month': 5, 'year': 2025, 'dry_run': 'true'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(PayrollRecord.objects.exists())
+
+    def test_adjustments_are_applied(self):
+        """Test that an adjustment overrides the employee's record"""
+        response = self.client.post(self.url, {'month': 5, 'year': 2025, 'adjustments': [
+            {'employee': str(self.employee.id), 'overtime_days': 2, 'remarks': 'Eid shifts'}
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        record = PayrollRecord.objects.get(employee=self.employee)
+        self.assertEqual((record.overtime_days, record.remarks), (2, 'Eid shifts'))
+
+    def test_invalid_request_is_rejected(self):
+        """Test that bad adjustments and periods are a 400, not a server error"""
+        for data in (
+            {'month': 5, 'year': 2025, 'adjustments': [{'employee': 'john'}]},
+            {'month': 5, 'year': 2025, 'adjustments': [{'overtime_days': 2}]},
+            {'month': 5, 'year': 2025, 'adjustments': [{'employee': self.employee.id, 'unpaid_days': -1}]},
+            {'month': 5, 'year': 2025, 'adjustments': {'employee': self.employee.id}},
+            {'month': 13, 'year': 2025},
+            {'year': 2025},
+            {'month': 5, 'year': 2025, 'dry_run': 'maybe'},
+        ):
+            self.assertEqual(self.client.post(self.url, data, format='json').status_code, 400, data)
+        self.assertFalse(PayrollRecord.objects.exists())
+
+
+class SalarySlipViewTestCase(TestCase):
+    """Test cases for queueing salary slips and reading their delivery status"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        employee = create_employee('john', basic_salary=Decimal('3000.00'),
+                                   housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+        self.record = PayrollRecord.objects.create(employee=employee, month=1, year=2025)
+
+    def test_send_salary_slip_returns_job_id(self):
+        """Test that the slip is queued after commit and the job id returned immediately"""
+        with patch('employees.tasks.send_salary_slip_email.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/api/employees/send_salary_slip/{self.record.id}/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'Queued')
+        apply_async.assert_called_once_with((self.record.id,), task_id=response.data['job_id'])
+
+    def test_send_salary_slips_for_period(self):
+        """Test that one job is queued for the slips of the period not sent yet"""
+        with patch('employees.views.send_period_salary_slips.delay') as delay:
+            delay.return_value.id = 'job-2'
+            response = self.client.post('/api/employees/send_salary_slips/', {'month': 1, 'year': 2025})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['job_id'], response.data['pending']), ('job-2', 1))
+        delay.assert_called_once_with(1, 2025)
+
+    def test_send_salary_slips_nothing_pending(self):
+        """Test that no job is queued when every slip was already sent"""
+        PayslipDelivery.objects.create(payroll_record=self.record, status='Sent')
+        with patch('employees.views.send_period_salary_slips.delay') as delay:
+            response = self.client.post('/api/employees/send_salary_slips/', {'month': 1, 'year': 2025})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(response.data['job_id'])
+        delay.assert_not_called()
+
+    def test_salary_slip_status(self):
+        """Test that the delivery status of a payroll record is exposed"""
+        PayslipDelivery.objects.create(payroll_record=self.record, status='Retrying', task_id='job-1',
+                                       attempts=2, last_error='Connection unexpectedly closed')
+
+        response = self.client.get(f'/api/employees/salary_slip_status/{self.record.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'Retrying')
+        self.assertEqual(response.data['job_id'], 'job-1')
+        self.assertEqual(response.data['attempts'], 2)
+
+    def test_salary_slip_status_not_sent(self):
+        """Test that records never sent return 404"""
+        response = self.client.get(f'/api/employees/salary_slip_status/{self.record.id}/')
+
+        self.assertEqual(response.status_code, 404)
+
+
+@patch('employees.payslip.render_payslip_pdf', return_value=b'%PDF-1.4 slip')
+class PayslipArchiveViewTestCase(TestCase):
+    """Test cases for the streamed payslip archive of a pay period"""
+
+    def setUp(self):
+        """Set up test data"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(PAYSLIP_PDF_CACHE_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employees = []
+        for username in ('john', 'jane', 'jack'):
+            employee = create_employee(username, basic_salary=Decimal('3000.00'),
+                                       housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+            PayrollRecord.objects.create(employee=employee, month=1, year=2025)
+            self.employees.append(employee)
+        PayrollRecord.objects.create(employee=employee, month=2, year=2025)
+        self.url = '/api/employees/payslips_archive/'
+
+    def test_archive_holds_the_period_payslips(self, render):
+        """Test that the archive has one payslip per payroll record of the period"""
+        response = self.client.get(self.url, {'month': 1, 'year': 2025})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('payslips_2025_01.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        jack, jane, john = sorted(self.employees, key=lambda employee: employee.first_name)
+        self.assertEqual(archive.namelist(), [
+            f'{jack.id}_Jack_Doe_payslip_1_2025.pdf',
+            f'{jane.id}_Jane_Doe_payslip_1_2025.pdf',
+            f'{john.id}_John_Doe_payslip_1_2025.pdf',
+        ])
+        self.assertTrue(all(archive.read(name) == b'%PDF-1.4 slip' for name in archive.namelist()))
+
+    def test_entries_are_rendered_while_streaming(self, render):
+        """Test that each payslip is rendered only when the archive reaches it"""
+        response = self.client.get(self.url, {'month': 1, 'year': 2025})
+        render.assert_not_called()
+
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(len(list(chunks)), 3)
+        self.assertEqual(render.call_count, 3)
+
+    def test_archive_requires_admin(self, render):
+        """Test that employees cannot download the archive"""
+        self.client.force_authenticate(self.employees[0].user)
+        response = self.client.get(self.url, {'month': 1, 'year': 2025})
+        self.assertEqual(response.status_code, 403)
+
+    def test_archive_validates_period(self, render):
+        """Test that a missing or empty period is refused"""
+        self.assertEqual(self.client.get(self.url, {'month': 13, 'year': 2025}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'year': 2025}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'month': 3, 'year': 2025}).status_code, 404)
+
+
+class PayrollRegisterViewTestCase(TestCase):
+    """Test cases for the payroll register export"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.john = create_employee('john', basic_salary=Decimal('3000.00'),
+                                    housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+        self.jane = create_employee('jane', department='Accounts', basic_salary=Decimal('4000.00'),
+                                    housing_allowance=Decimal('1500.00'), transport_allowance=Decimal('500.00'))
+        for month in (1, 2):
+            PayrollRecord.objects.create(employee=self.john, month=month, year=2025, overtime_days=1)
+            PayrollRecord.objects.create(employee=self.jane, month=month, year=2025)
+        PayrollRecord.objects.create(employee=self.john, month=1, year=2024)
+        self.url = '/api/employees/payroll_register/'
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_export_year(self):
+        """Test that a year export has one row per record of the year, month by month"""
+        rows = self.export(year=2025)
+
+        self.assertEqual([(row['Month'], row['Employee Name']) for row in rows],
+                         [('1', 'Jane Doe'), ('1', 'John Doe'), ('2', 'Jane Doe'), ('2', 'John Doe')])
+        self.assertEqual(rows[1]['Housing Allowance'], '1000.00')
+        self.assertEqual(rows[1]['Holiday Overtime Days'], '1')
+        record = PayrollRecord.objects.get(employee=self.john, month=1, year=2025)
+        self.assertEqual(Decimal(rows[1]['Net Pay']), record.total_salary_for_month)
+
+    def test_export_month_and_department(self):
+        """Test the month and department filters"""
+        rows = self.export(year=2025, month=2, department='Accounts')
+
+        self.assertEqual([(row['Month'], row['Employee ID']) for row in rows], [('2', str(self.jane.id))])
+
+    def test_export_is_streamed(self):
+        """Test that the CSV is a streamed attachment"""
+        response = self.client.get(self.url, {'year': 2025, 'month': 1})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('payroll_register_2025_01.csv', response['Content-Disposition'])
+
+    def test_export_validation(self):
+        """Test that invalid filters are refused"""
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'year': 2025, 'month': 13}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'year': 2025, 'department': 'Nowhere'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'year': 2025, 'export_format': 'pdf'}).status_code, 400)
+
+    def test_xlsx_without_openpyxl(self):
+        """Test that XLSX is refused when openpyxl is not installed"""
+        with patch('employees.views.PayrollRegisterService.xlsx_available', return_value=False):
+            response = self.client.get(self.url, {'year': 2025, 'export_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_admin(self):
+        """Test that employees cannot export the register"""
+        self.client.force_authenticate(self.john.user)
+        self.assertEqual(self.client.get(self.url, {'year': 2025}).status_code, 403)
+
+
+@override_settings(WPS_EMPLOYER_ID='1000000000001', WPS_EMPLOYER_ROUTING_CODE='302620122')
+class WPSFileViewTestCase(TestCase):
+    """Test cases for the WPS salary information file export"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employees = []
+        for index, username in enumerate(('john', 'jane')):
+            employee = create_employee(username, basic_salary=Decimal('3000.00'),
+                                       housing_allowance=Decimal('1000.00'), transport_allowance=Decimal('500.00'))
+            SalaryDetails.objects.filter(employee=employee).update(
+                iban=make_iban(f'03300010155555555{index:02d}'), routing_code='303320101',
+                wps_person_id=f'1000000000000{index}'
+            )
+            self.employees.append(employee)
+        john, jane = self.employees
+        PayrollRecord.objects.create(employee=john, month=2, year=2025)
+        record = PayrollRecord.objects.create(employee=jane, month=2, year=2025, unpaid_days=1)
+        PayrollRecord.objects.filter(pk=record.pk).update(overtime_amount=Decimal('150.00'))
+        self.url = '/api/employees/wps_sif/'
+
+    def test_sif_lines_and_totals(self):
+        """Test one EDR line per employee and the SCR control record with the totals"""
+        response = self.client.get(self.url, {'month': 2, 'year': 2025})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Content-Disposition'], r'filename="1000000000001\d{12}\.SIF"')
+        lines = b''.join(response.streaming_content).decode().split('\r\n')
+        self.assertEqual(lines[-1], '')
+        edr, scr = lines[:2], lines[2].split(',')
+        john, jane = (PayrollRecord.objects.get(employee=employee) for employee in self.employees)
+        self.assertEqual(edr[0], f'EDR,10000000000000,303320101,{make_iban("0330001015555555500")},'
+                                 f'2025-02-01,2025-02-28,28,{john.total_salary_for_month:.2f},0.00,0')
+        self.assertEqual(edr[1].split(',')[7:], [f'{jane.total_salary_for_month - 150:.2f}', '150.00', '1'])
+        self.assertEqual(scr[:3], ['SCR', '1000000000001', '302620122'])
+        self.assertEqual(scr[5:9], ['022025', '2', f'{john.total_salary_for_month + jane.total_salary_for_month:.2f}',
+                                    'AED'])
+
+    def test_sif_is_one_query(self):
+        """Test that the whole file is built from a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'month': 2, 'year': 2025})
+            b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 1)
+
+    def test_missing_bank_details_are_reported(self):
+        """Test that no file is produced while any employee has missing bank details"""
+        SalaryDetails.objects.filter(employee=self.employees[1]).update(iban=None)
+
+        response = self.client.get(self.url, {'month': 2, 'year': 2025})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['invalid_employees'], [{
+            'employee': self.employees[1].id, 'employee_full_name': 'Jane Doe', 'errors': ['IBAN is missing.']
+        }])
+
+    def test_employer_must_be_configured(self):
+        """Test that the export is refused without the employer WPS settings"""
+        with override_settings(WPS_EMPLOYER_ID=None):
+            response = self.client.get(self.url, {'month': 2, 'year': 2025})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sif_validation(self):
+        """Test the period validation and admin check"""
+        self.assertEqual(self.client.get(self.url, {'month': 0, 'year': 2025}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'month': 3, 'year': 2025}).status_code, 404)
+        self.client.force_authenticate(self.employees[0].user)
+        self.assertEqual(self.client.get(self.url, {'month': 2, 'year': 2025}).status_code, 403)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import view_employee, update_employee, create_payroll_record, view_all_payroll, view_own_payroll, send_salary_slip, update_own_details, create_employee, view_all_employees, view_all_employees_salaries, create_salary_details, update_salary_record, admin_view_single_employee_salary, update_payroll_record, view_new_employees, dashboard_summary, view_own_salary_details, download_payroll_pdf, create_salary_revision, edit_salary_revision, get_all_salary_revisions, view_all_employees_with_salary, get_all_salary_revisions, get_salary_revisions, get_own_salary_revisions
+from .views import view_employee, update_employee, create_payroll_record, view_all_payroll, view_own_payroll, send_salary_slip, update_own_details, create_employee, view_all_employees, view_all_employees_salaries, create_salary_details, update_salary_record, admin_view_single_employee_salary, update_payroll_record, view_new_employees, dashboard_summary, view_own_salary_details, download_payroll_pdf, create_salary_revision, edit_salary_revision, get_all_salary_revisions, view_all_employees_with_salary, get_all_salary_revisions, get_salary_revisions, get_own_salary_revisions, run_payroll, simulate_payroll_cost, salary_slip_status, send_salary_slips, download_payslips_archive, export_payroll_register, export_wps_sif, view_colleagues
 
 urlpatterns = [
     # For Admin ------------- employee endpoints
@@ -14,9 +14,16 @@ urlpatterns = [
     path('salary-details/<int:employee_id>/', admin_view_single_employee_salary, name='admin_single_employee_salary_view'),
     # For Admin -------------  Payroll endpoints
     path('create_payroll/', create_payroll_record, name='create_payroll'),
+    path('run_payroll/', run_payroll, name='run_payroll'),
+    path('simulate_payroll_cost/', simulate_payroll_cost, name='simulate_payroll_cost'),
     path('view_all_payroll/', view_all_payroll, name='view_all_payroll'),
+    path('payroll_register/', export_payroll_register, name='export_payroll_register'),
+    path('wps_sif/', export_wps_sif, name='export_wps_sif'),
     path('update-payroll-record/<int:payroll_id>/', update_payroll_record, name='update_payroll_record'),
     path('send_salary_slip/<int:payroll_id>/', send_salary_slip, name='send_salary_slip_to_employeees'),
+    path('send_salary_slips/', send_salary_slips, name='send_salary_slips'),
+    path('salary_slip_status/<int:payroll_id>/', salary_slip_status, name='salary_slip_status'),
+    path('payslips_archive/', download_payslips_archive, name='download_payslips_archive'),
     # For Admin  -------------- Dashbaord endpoints
     path('dashboard-summary/', dashboard_summary, name="dashboard-summary" ),
     # For Admin  -------------- Employee Salary Revision Endpoints
@@ -33,5 +40,5 @@ urlpatterns = [
     path('employee/payroll/', view_own_payroll, name='view_own_payroll'),
     path('employee/payroll/download/<int:payroll_id>/', download_payroll_pdf, name='download-payroll-pdf'),
     path('salary-revisions/', get_own_salary_revisions, name='get_own_salary_revisions'),
-    #path('employee/colleagues/', ColleaguesView.as_view(), name='colleagues'),  # View colleagues' list
+    path('employee/colleagues/', view_colleagues, name='colleagues'),  # View colleagues' list
 ]
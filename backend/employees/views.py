@@ -2,24 +2,23 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Employee, PayrollRecord, SalaryDetails, SalaryRevision
-from .serializers import EmployeeSerializer, ColleagueSerializer, PayrollRecordSerializer, EmployeeUpdateSerializer, SalaryDetailsSerializer, DashboardSerializer, SalaryRevisionSerializer, EmployeeDetailsWithSalarySerializer, SalaryRevisionSerializerCreate
+from .models import Employee, PayrollRecord, SalaryDetails, SalaryRevision, PayslipDelivery
+from .serializers import EmployeeSerializer, ColleagueSerializer, PayrollRecordSerializer, EmployeeUpdateSerializer, SalaryDetailsSerializer, DashboardSerializer, SalaryRevisionSerializer, EmployeeDetailsWithSalarySerializer, SalaryRevisionSerializerCreate, PayslipDeliverySerializer, PayrollRunSerializer
 from django.conf import settings
-from .utils import generate_salary_pdf
-from django.core.mail import EmailMessage
+from payroll.pagination import KeysetPagination
+from .constants import EMPLOYEE_LIST_ORDERING, SALARY_DETAILS_LIST_ORDERING, PAYROLL_LIST_ORDERING, DEPARTMENT_CHOICES, PAYROLL_REGISTER_FORMATS
+from .services import PayrollRunService, PayrollSimulationService, PayrollSummaryService, SalaryRevisionService, PayslipDeliveryService, PayslipDispatchService, PayslipArchiveService, PayrollRegisterService, WPSFileService
+from .tasks import send_period_salary_slips
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.db.models import Sum
 from django.utils import timezone
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from django.http import FileResponse
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib import colors
-from django.db.models import Max
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+import tempfile
+from django.http import FileResponse, StreamingHttpResponse
+from .payslip import get_payslip_pdf
 
 
 """
@@ -38,8 +37,15 @@ def view_all_employees(request):
         return Response({"detail": "Only admins can view all employees."}, status=status.HTTP_403_FORBIDDEN)
 
     
-    employees = Employee.objects.all()
-    serializer = EmployeeSerializer(employees, many=True)
+    employees = EmployeeSerializer.restrict_queryset(
+        Employee.objects.order_by(*EMPLOYEE_LIST_ORDERING), request.query_params, EMPLOYEE_LIST_ORDERING
+    )
+    context = {'query_params': request.query_params}
+    paginator = KeysetPagination(EMPLOYEE_LIST_ORDERING)
+    page = paginator.paginate_queryset(employees, request)
+    if page is not None:
+        return paginator.get_paginated_response(EmployeeSerializer(page, many=True, context=context).data)
+    serializer = EmployeeSerializer(employees, many=True, context=context)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 # Admin can view all employees with salary details
@@ -49,8 +55,16 @@ def view_all_employees_with_salary(request):
     if request.user.user_type not in ['Admin', 'Both']:
         return Response({"detail": "Only admins can view all employees."}, status=status.HTTP_403_FORBIDDEN)
     
-    employees = Employee.objects.all()
-    serializer = EmployeeDetailsWithSalarySerializer(employees, many=True)
+    employees = EmployeeDetailsWithSalarySerializer.restrict_queryset(
+        Employee.objects.select_related('salary_details').order_by(*EMPLOYEE_LIST_ORDERING),
+        request.query_params, EMPLOYEE_LIST_ORDERING
+    )
+    context = {'query_params': request.query_params}
+    paginator = KeysetPagination(EMPLOYEE_LIST_ORDERING)
+    page = paginator.paginate_queryset(employees, request)
+    if page is not None:
+        return paginator.get_paginated_response(EmployeeDetailsWithSalarySerializer(page, many=True, context=context).data)
+    serializer = EmployeeDetailsWithSalarySerializer(employees, many=True, context=context)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -150,7 +164,11 @@ def view_all_employees_salaries(request):
     if request.user.user_type not in ['Admin', 'Both']:
         return Response({"detail": "Only admins can view all employees."}, status=status.HTTP_403_FORBIDDEN)
     
-    employees = SalaryDetails.objects.all()
+    employees = SalaryDetails.objects.select_related('employee').order_by(*SALARY_DETAILS_LIST_ORDERING)
+    paginator = KeysetPagination(SALARY_DETAILS_LIST_ORDERING)
+    page = paginator.paginate_queryset(employees, request)
+    if page is not None:
+        return paginator.get_paginated_response(SalaryDetailsSerializer(page, many=True).data)
     serializer = SalaryDetailsSerializer(employees, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -162,9 +180,8 @@ def admin_view_single_employee_salary(request, employee_id):
         return Response({"detail": "Only admins can view employee salary details."}, status=status.HTTP_403_FORBIDDEN)
 
     try:
-        employee = Employee.objects.get(id=employee_id)
-        salary = SalaryDetails.objects.get(employee=employee)
-        serializer = SalaryDetailsSerializer(salary)
+        employee = Employee.objects.select_related('salary_details').get(id=employee_id)
+        serializer = SalaryDetailsSerializer(employee.salary_details)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Employee.DoesNotExist:
         return Response({"detail": "Employee not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -208,6 +225,71 @@ def create_payroll_record(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Admin can run the payroll of all employees for a month in one request
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def run_payroll(request):
+    """
+    API to create the payroll records of all employees for a month/year.
+    Optional per-employee adjustments (overtime, unpaid days, deductions...) can be passed
+    as a list under "adjustments". Only admins are allowed to perform this operation.
+    """
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can run the payroll."}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = PayrollRunSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    month, year = serializer.validated_data['month'], serializer.validated_data['year']
+    adjustments = {
+        adjustment.pop('employee'): adjustment for adjustment in serializer.validated_data.get('adjustments', [])
+    }
+
+    try:
+        result = PayrollRunService.run_payroll(
+            month, year, adjustments,
+            allow_missing=serializer.validated_data['allow_missing'],
+            dry_run=serializer.validated_data['dry_run'],
+        )
+    except (ValidationError, ValueError) as e:
+        return Response({"detail": f"Invalid payroll adjustment: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+    except IntegrityError:
+        return Response(
+            {"detail": f"The payroll for {month}/{year} is being run by another request. Please try again."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    if not result['completed']:
+        return Response(
+            {"detail": "Some employees have no salary details. Add them or set allow_missing to skip them.", **result},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(result, status=status.HTTP_201_CREATED)
+
+
+# Admin can project the payroll cost of a salary raise scenario without saving anything
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def simulate_payroll_cost(request):
+    """
+    API to project monthly and annual payroll cost for a what-if scenario, e.g.
+    {"rules": [{"department": "IT", "percent": 5}, {"percent": 3}]}.
+    Nothing is written to the database. Only admins are allowed to perform this operation.
+    """
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can simulate payroll costs."}, status=status.HTTP_403_FORBIDDEN)
+
+    rules = request.data.get('rules', [])
+    if not isinstance(rules, list):
+        return Response({"rules": "Rules must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = PayrollSimulationService.cached_simulate(rules)
+    except ValidationError as e:
+        return Response({"detail": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_200_OK)
+
+
 # Admin can Edit a Payroll Record
 @api_view(['PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
@@ -250,45 +332,189 @@ def update_payroll_record(request, payroll_id):
 def view_all_payroll(request):
     if request.user.user_type not in ['Admin', 'Both']:
         return Response({"detail": "Only admins can view all payroll records."}, status=status.HTTP_403_FORBIDDEN)
-    payroll_records = PayrollRecord.objects.all().order_by('-year', '-month')
+    payroll_records = PayrollRecord.objects.select_related('employee__salary_details').order_by(*PAYROLL_LIST_ORDERING)
+    paginator = KeysetPagination(PAYROLL_LIST_ORDERING)
+    page = paginator.paginate_queryset(payroll_records, request)
+    if page is not None:
+        return paginator.get_paginated_response(PayrollRecordSerializer(page, many=True).data)
     serializer = PayrollRecordSerializer(payroll_records, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-# Helper Function to Send the Email
-def send_salary_slip_email(employee, payroll_record):
-    pdf_path = generate_salary_pdf(employee, payroll_record)
-    subject = f"Salary Slip for {payroll_record.month}/{payroll_record.year}"
-    message = f"Dear {employee.first_name},\n\nPlease find your salary slip for the month {payroll_record.month}/{payroll_record.year} attached."
-    
-    email = EmailMessage(
-        subject=subject,
-        body=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[employee.user.email]
+# Admin-only view to export the payroll register of a year or month as CSV or XLSX
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_payroll_register(request):
+    """
+    Streams one row per payroll record of the year (or month), optionally for one department.
+    CSV is streamed as it is read; XLSX is written to a temporary file first and needs openpyxl.
+    """
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can export the payroll register."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        year = int(request.query_params.get('year'))
+        month = int(request.query_params['month']) if request.query_params.get('month') else None
+    except (TypeError, ValueError):
+        return Response({"detail": "Year is required, month is optional."}, status=status.HTTP_400_BAD_REQUEST)
+    if month is not None and (month < 1 or month > 12):
+        return Response({"month": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+    department = request.query_params.get('department') or None
+    if department and department not in dict(DEPARTMENT_CHOICES):
+        return Response({"department": f"Unknown department '{department}'."}, status=status.HTTP_400_BAD_REQUEST)
+    export_format = request.query_params.get('export_format', 'csv').lower()
+    if export_format not in PAYROLL_REGISTER_FORMATS:
+        return Response({"export_format": "Export format must be csv or xlsx."}, status=status.HTTP_400_BAD_REQUEST)
+
+    filename = '_'.join(str(part) for part in ('payroll_register', year, month and f'{month:02d}', department) if part)
+    if export_format == 'xlsx':
+        if not PayrollRegisterService.xlsx_available():
+            return Response({"export_format": "XLSX export is not available on this server, use CSV."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        output = tempfile.TemporaryFile()
+        PayrollRegisterService.write_xlsx(output, year, month, department)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx',
+                            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    response = StreamingHttpResponse(PayrollRegisterService.stream_csv(year, month, department),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+# Admin-only view to export the WPS salary information file of a month/year for the bank
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_wps_sif(request):
+    """
+    Streams the SIF for the period. Nothing is written while any employee in it has missing or
+    invalid bank details; those are all returned together so they can be fixed in one go.
+    """
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can export the WPS salary file."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        month = int(request.query_params.get('month'))
+        year = int(request.query_params.get('year'))
+    except (TypeError, ValueError):
+        return Response({"detail": "Month and year are required fields."}, status=status.HTTP_400_BAD_REQUEST)
+    if month < 1 or month > 12:
+        return Response({"month": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        employer_id, employer_routing_code = WPSFileService.get_employer()
+    except ValidationError as e:
+        return Response({"detail": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = WPSFileService.get_rows(month, year)
+    if not rows:
+        return Response({"detail": f"No payroll records found for {month}/{year}."}, status=status.HTTP_404_NOT_FOUND)
+    invalid_employees = WPSFileService.validate(rows)
+    if invalid_employees:
+        return Response({
+            "detail": f"{len(invalid_employees)} employees have missing or invalid bank details.",
+            "invalid_employees": invalid_employees,
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    created_at = timezone.localtime()
+    response = StreamingHttpResponse(
+        WPSFileService.stream(rows, month, year, employer_id, employer_routing_code, created_at),
+        content_type='text/plain'
     )
+    response['Content-Disposition'] = f'attachment; filename="{WPSFileService.get_filename(employer_id, created_at)}"'
+    return response
 
-    with open(pdf_path, 'rb') as pdf_file:
-        email.attach(f"salary_slip_{payroll_record.month}_{payroll_record.year}.pdf", pdf_file.read(), 'application/pdf')
-    
-    email.send(fail_silently=False)
 
-# Admin-only view to send the salary slip email to the respective employee
-@api_view(['GET'])
+# Admin-only view to queue the salary slip email to the respective employee
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def send_salary_slip(request, payroll_id):
+    """
+    Queues the salary slip to be rendered and emailed by a background task and returns
+    the job id straight away. Progress is available from salary_slip_status.
+    """
     if request.user.user_type not in ['Admin', 'Both']:
         return Response({"detail": "Only admins can generate and send salary slips."}, status=status.HTTP_403_FORBIDDEN)
-    
+
     try:
         payroll_record = PayrollRecord.objects.get(id=payroll_id)
     except PayrollRecord.DoesNotExist:
         return Response({"detail": "Payroll record not found."}, status=status.HTTP_404_NOT_FOUND)
-    
-    employee = payroll_record.employee
-    send_salary_slip_email(employee, payroll_record)
-    
-    return Response({"detail": "Salary slip sent successfully."}, status=status.HTTP_200_OK)
+
+    delivery = PayslipDeliveryService.queue(payroll_record)
+    return Response({
+        "detail": "Salary slip queued for sending.",
+        "job_id": delivery.task_id,
+        "status": delivery.status,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+# Admin-only view to email all salary slips of a month/year in the background
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def send_salary_slips(request):
+    """
+    Queues one job that emails every salary slip of the given month/year.
+    Slips already sent are skipped, so the request can be repeated after a failed run.
+    """
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can send salary slips."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        month = int(request.data.get('month'))
+        year = int(request.data.get('year'))
+    except (TypeError, ValueError):
+        return Response({"detail": "Month and year are required fields."}, status=status.HTTP_400_BAD_REQUEST)
+    if month < 1 or month > 12:
+        return Response({"month": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+
+    pending = PayslipDispatchService.get_pending_records(month, year).count()
+    job = send_period_salary_slips.delay(month, year) if pending else None
+    return Response({
+        "detail": f"{pending} salary slips queued for sending.",
+        "job_id": job.id if job else None,
+        "pending": pending,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+# Admin-only view to check the delivery status of a payroll record's salary slip
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def salary_slip_status(request, payroll_id):
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can view salary slip delivery status."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        delivery = PayslipDelivery.objects.get(payroll_record_id=payroll_id)
+    except PayslipDelivery.DoesNotExist:
+        return Response({"detail": "No salary slip has been sent for this payroll record."}, status=status.HTTP_404_NOT_FOUND)
+    serializer = PayslipDeliverySerializer(delivery)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# Admin-only view to download every payslip of a month/year as one ZIP archive
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_payslips_archive(request):
+    """Streams the archive, so memory stays at about one payslip whatever the headcount"""
+    if request.user.user_type not in ['Admin', 'Both']:
+        return Response({"detail": "Only admins can download payslip archives."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        month = int(request.query_params.get('month'))
+        year = int(request.query_params.get('year'))
+    except (TypeError, ValueError):
+        return Response({"detail": "Month and year are required fields."}, status=status.HTTP_400_BAD_REQUEST)
+    if month < 1 or month > 12:
+        return Response({"month": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+    if not PayrollRecord.objects.filter(month=month, year=year).exists():
+        return Response({"detail": f"No payroll records found for {month}/{year}."}, status=status.HTTP_404_NOT_FOUND)
+
+    response = StreamingHttpResponse(PayslipArchiveService.stream(month, year), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="payslips_{year}_{month:02d}.zip"'
+    return response
+
+
 
 """
 SALARY REVISION
@@ -322,7 +548,8 @@ def create_salary_revision(request, employee_id):
 
                 return Response({
                     "message": "Salary revision created successfully!",
-                    "data": serializer.data
+                    "data": serializer.data,
+                    "recomputed_payroll": salary_revision.recomputed_payroll,
                 }, status=status.HTTP_201_CREATED)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -383,14 +610,7 @@ def get_all_salary_revisions(request):
     try:
         if request.user.user_type not in ['Admin', 'Both']:
             return Response({"detail": "Only admins can see salary revisions records for all employees."}, status=status.HTTP_403_FORBIDDEN)
-        latest_salary_revisions = SalaryRevision.objects.values('employee').annotate(latest_revision_date=Max('revision_date'))
-        revisions = []
-        for revision in latest_salary_revisions:
-            salary_revision = SalaryRevision.objects.filter(
-                employee=revision['employee'],
-                revision_date=revision['latest_revision_date']
-            ).first()
-            revisions.append(salary_revision)
+        revisions = SalaryRevisionService.get_latest_revisions()
         serializer = SalaryRevisionSerializer(revisions, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -427,7 +647,8 @@ def edit_salary_revision(request, revision_id):
 
                 return Response({
                     "message": "Salary revision updated successfully!",
-                    "data": serializer.data
+                    "data": serializer.data,
+                    "recomputed_payroll": updated_revision.recomputed_payroll,
                 }, status=status.HTTP_200_OK)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -444,8 +665,10 @@ def edit_salary_revision(request, revision_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def view_new_employees(request):
-    employees = Employee.objects.exclude(user=request.user.id).order_by('-created_at')[:3]
-    serializer = EmployeeSerializer(employees, many=True)
+    employees = EmployeeSerializer.restrict_queryset(
+        Employee.objects.exclude(user=request.user.id).order_by('-created_at'), request.query_params
+    )[:3]
+    serializer = EmployeeSerializer(employees, many=True, context={'query_params': request.query_params})
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
@@ -454,71 +677,8 @@ def dashboard_summary(request):
     if request.user.user_type not in ['Admin', 'Both']:
         return Response({"detail": "Only admins can view the dashboard summary."}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get the current year and month
-    today = timezone.now()
-    current_month = today.month
-    current_year = today.year
-    previous_month = current_month - 1 if current_month > 1 else 12
-    previous_month_year = current_year if current_month > 1 else current_year - 1
-
-    # Get total salary for the current month
-    total_salary_for_month = PayrollRecord.objects.filter(
-        month=current_month, year=current_year
-    ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-    # Get total overtime for the current month
-    total_overtime_for_month = PayrollRecord.objects.filter(
-        month=current_month, year=current_year
-    ).aggregate(total_overtime=Sum('overtime_days'))['total_overtime'] or Decimal(0)
-
-    # Get previous month's total salary
-    previous_month_salary = PayrollRecord.objects.filter(
-        month=previous_month, year=previous_month_year
-    ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-    # Get previous month's total overtime
-    previous_month_overtime = PayrollRecord.objects.filter(
-        month=previous_month, year=previous_month_year
-    ).aggregate(total_overtime=Sum('overtime_days'))['total_overtime'] or Decimal(0)
-
-    # Gather monthly totals for all months available in the PayrollRecord database
-    monthly_data = PayrollRecord.objects.values('year', 'month').annotate(
-        total_salary=Sum('total_salary_for_month'),
-        total_overtime=Sum('overtime_days')
-    ).order_by('-year', '-month')
-
-    # Prepare monthly data in a list of dicts format for serialization
-    monthly_data_list = [
-        {
-            'month': data['month'],
-            'year': data['year'],
-            'total_salary': data['total_salary'] or Decimal(0),
-            'total_overtime': data['total_overtime'] or Decimal(0),
-        }
-        for data in monthly_data
-    ]
-
-    # Get the total number of employees
-    total_employees = Employee.objects.count()
-
-    # Calculate the total salary of all employees for the current month
-    total_salary_current_month = PayrollRecord.objects.filter(
-        month=current_month, year=current_year
-    ).aggregate(total_salary=Sum('total_salary_for_month'))['total_salary'] or Decimal(0)
-
-    # Calculate the average salary for the current month
-    average_salary_for_month = total_salary_current_month / total_employees if total_employees > 0 else Decimal(0)
-
-    # Return the aggregated data
-    return Response({
-        'total_salary_for_month': total_salary_for_month,
-        'total_overtime_for_month': total_overtime_for_month,
-        'previous_month_salary': previous_month_salary,
-        'previous_month_overtime': previous_month_overtime,
-        'monthly_data': monthly_data_list,
-        'total_employees': total_employees,
-        'average_salary_for_month': average_salary_for_month,
-    }, status=status.HTTP_200_OK)
+    # Monthly totals are read from the PayrollMonthSummary rollup, one row per pay period
+    return Response(PayrollSummaryService.cached_dashboard_summary(), status=status.HTTP_200_OK)
 
 """
 ===================== Employee Views =====================
@@ -530,8 +690,10 @@ def dashboard_summary(request):
 @permission_classes([IsAuthenticated])
 def view_employee(request):
     try:
-        employee_details = Employee.objects.get(user=request.user)
-        serializer = EmployeeSerializer(employee_details)
+        employee_details = EmployeeSerializer.restrict_queryset(
+            Employee.objects.all(), request.query_params
+        ).get(user=request.user)
+        serializer = EmployeeSerializer(employee_details, context={'query_params': request.query_params})
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Employee.DoesNotExist:
         return Response({"detail": "Employee details not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -556,8 +718,16 @@ def update_own_details(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def view_colleagues(request):
-    colleagues = Employee.objects.exclude(user=request.user)
-    serializer = ColleagueSerializer(colleagues, many=True)
+    colleagues = ColleagueSerializer.restrict_queryset(
+        Employee.objects.exclude(user=request.user).order_by(*EMPLOYEE_LIST_ORDERING),
+        request.query_params, EMPLOYEE_LIST_ORDERING
+    )
+    context = {'query_params': request.query_params}
+    paginator = KeysetPagination(EMPLOYEE_LIST_ORDERING)
+    page = paginator.paginate_queryset(colleagues, request)
+    if page is not None:
+        return paginator.get_paginated_response(ColleagueSerializer(page, many=True, context=context).data)
+    serializer = ColleagueSerializer(colleagues, many=True, context=context)
     return Response(serializer.data)
 
 
@@ -568,7 +738,9 @@ def view_colleagues(request):
 def view_own_payroll(request):
     try:
         employee_details = Employee.objects.get(user=request.user)
-        payroll_records = PayrollRecord.objects.filter(employee=employee_details).order_by('-year', '-month')
+        payroll_records = PayrollRecord.objects.filter(employee=employee_details).select_related(
+            'employee__salary_details'
+        ).order_by('-year', '-month')
         serializer = PayrollRecordSerializer(payroll_records, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Employee.DoesNotExist:
@@ -580,9 +752,8 @@ def view_own_payroll(request):
 @permission_classes([IsAuthenticated])
 def view_own_salary_details(request):
     try:
-        employee_details = Employee.objects.get(user=request.user)
-        salary_details = SalaryDetails.objects.get(employee=employee_details)
-        serializer = SalaryDetailsSerializer(salary_details)
+        employee_details = Employee.objects.select_related('salary_details').get(user=request.user)
+        serializer = SalaryDetailsSerializer(employee_details.salary_details)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Employee.DoesNotExist:
         return Response({"detail": "Employee details not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -595,109 +766,13 @@ def download_payroll_pdf(request, payroll_id):
     try:
         employee = Employee.objects.get(user=request.user)
         try:
-            payroll_record = PayrollRecord.objects.get(id=payroll_id, employee=employee)
+            payroll_record = employee.payrollrecord_set.get(id=payroll_id)
         except PayrollRecord.DoesNotExist:
             return Response({"detail": "Payroll record not found or doesn't belong to this employee."}, 
                             status=status.HTTP_404_NOT_FOUND)
 
-        buffer = io.BytesIO()
-        pdf = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=20, leftMargin=20, topMargin=40, bottomMargin=20)
-        pdf.title = f"Payslip - {employee.first_name} {employee.last_name} - {payroll_record.month}/{payroll_record.year}"
-        elements = []
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle("title", parent=styles["Heading1"], fontSize=16, textColor=colors.black, alignment=1)
-        normal_style = styles["BodyText"]
-
-        # Use configurable logo path with fallback
-        logo_path = getattr(settings, 'COMPANY_LOGO_PATH', 'media/company-images/logo.png')
-        try:
-            logo = Image(logo_path, width=100, height=40)
-            logo.hAlign = "LEFT"
-            elements.append(logo)
-        except Exception as e:
-            # Log error but don't crash the PDF generation
-            print(f"Logo not found at {logo_path}: {str(e)}")
-            # Continue without logo
-        elements.append(Spacer(1, 10)) 
-        elements.append(Paragraph("<b>Payslip</b>", title_style))
-        elements.append(Spacer(1, 20))
-
-        basic_salary = round(float(getattr(payroll_record, 'current_basic_salary', 0) or 0), 2)
-        gross_salary = round(float(getattr(payroll_record, 'current_gross_salary', 0) or 0), 2)
-        total_salary_for_month = round(float(getattr(payroll_record, 'total_salary_for_month', 0) or 0), 2)
-
-        unpaid_days = getattr(payroll_record, 'unpaid_days', 0) or 0
-        overtime_days = getattr(payroll_record, 'overtime_days', 0) or 0
-        normal_overtime_days = getattr(payroll_record, 'normal_overtime_days', 0) or 0
-        other_deductions = round(float(getattr(payroll_record, 'other_deductions', 0) or 0), 2)
-
-        daily_salary_gross = round(gross_salary / 30 if gross_salary else 0, 2)
-        non_working_days = 30 - payroll_record.total_workable_days or 0
-        non_working_days_amount = round(daily_salary_gross * non_working_days, 2)
-        daily_salary = round(basic_salary / 30 if basic_salary else 0, 2)
-        unpaid_leaves_amount = round(daily_salary * unpaid_days, 2)
-        holiday_overtime_amount = round(overtime_days * 1.5 * daily_salary, 2)
-        normal_overtime_amount = round(normal_overtime_days * 1.25 * daily_salary, 2)
-
-        total_earnings = gross_salary + holiday_overtime_amount + normal_overtime_amount
-        total_deductions = round(unpaid_leaves_amount + other_deductions + non_working_days_amount, 2)
-
-
-        details_data = [
-            ["Date of Joining:", str(employee.joining_date), "Employee Name:", f"{employee.first_name} {employee.last_name}"],
-            ["Pay Period:", f"{payroll_record.month}/{payroll_record.year}", "Designation:", employee.designation],
-            ["Worked Days:", f"{payroll_record.total_workable_days - unpaid_days}", "Department:", employee.department],
-            ["Basic Salary:", basic_salary, "Per day Salary:", daily_salary_gross],
-        ]
-        details_table = Table(details_data, colWidths=[150, 100, 150, 100])
-        details_table.setStyle(TableStyle([
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
-        ]))
-        elements.append(details_table)
-        elements.append(Spacer(1, 20))
-
-        # Earnings and Deductions table
-        earnings_deductions_data = [
-            ["Earnings", "Amount (AED)", "Deductions", "Amount (AED)"],
-            ["Monthly Gross Salary", f"AED {gross_salary:.2f}", "Unpaid Leaves", f"AED {unpaid_leaves_amount:.2f}"],
-            ["Holiday Overtime", f"AED {holiday_overtime_amount:.2f}", "Other Deductions", f"AED {other_deductions:.2f}"],
-            ["Normal Overtime", f"AED {normal_overtime_amount:.2f}", "Non Working Days Amount", f" AED {non_working_days_amount:.2f}"],
-            ["Total Earnings", f"AED {total_earnings:.2f}", "Total Deductions", f"AED {total_deductions:.2f}"],
-        ]
-        earnings_deductions_table = Table(earnings_deductions_data, colWidths=[150, 100, 150, 100])
-        earnings_deductions_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-            ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(earnings_deductions_table)
-        elements.append(Spacer(1, 20))
-
-        # Net Pay
-        net_pay = total_salary_for_month or 0
-        net_pay_data = [["Net Pay:", f"AED {net_pay:.2f}"]]
-        net_pay_table = Table(net_pay_data, colWidths=[150, 300])
-        net_pay_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), colors.beige),
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-        ]))
-        elements.append(net_pay_table)
-
-        # Footer
-        elements.append(Spacer(1, 30))
-        footer = Paragraph("<font size=10><i>This is a system-generated payslip. No signature required.</i></font>", normal_style)
-        elements.append(footer)
-
-        # Generate PDF
-        pdf.build(elements)
-        buffer.seek(0)
-        return FileResponse(buffer, as_attachment=True, filename=f"{employee.first_name}_{employee.last_name}_payslip_{payroll_record.month}_{payroll_record.year}.pdf")
+        pdf_content = get_payslip_pdf(payroll_record)
+        return FileResponse(io.BytesIO(pdf_content), as_attachment=True, filename=f"{employee.first_name}_{employee.last_name}_payslip_{payroll_record.month}_{payroll_record.year}.pdf", content_type='application/pdf')
 
     except Employee.DoesNotExist:
         return Response({"detail": "Employee details not found."}, status=status.HTTP_404_NOT_FOUND)
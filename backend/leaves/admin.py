@@ -1,7 +1,43 @@
 from django.contrib import admin
-from .models import Leave, LeaveAccrual,LeaveBalance
+from .models import Leave, LeaveAccrual,LeaveBalance, LeaveAccrualRun, LeaveLedgerEntry, LeaveBalanceSnapshot, PublicHoliday
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Viewable only: these rows are written by the leave services, which keep the ledger in step"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Leave)
 admin.site.register(LeaveAccrual)
-admin.site.register(LeaveBalance)
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(ReadOnlyAdmin):
+    # Balances are edited through the leave-balances API so each change gets its ledger entry
+    list_display = ('employee', 'annual_leave_balance', 'sick_leave_balance')
+
+@admin.register(LeaveAccrualRun)
+class LeaveAccrualRunAdmin(admin.ModelAdmin):
+    list_display = ('year', 'month', 'days', 'employees_accrued', 'created_at')
+    readonly_fields = ('year', 'month', 'days', 'employees_accrued', 'created_at')
+
+@admin.register(LeaveLedgerEntry)
+class LeaveLedgerEntryAdmin(ReadOnlyAdmin):
+    list_display = ('employee', 'balance_field', 'delta', 'kind', 'leave', 'created_by', 'created_at')
+    list_filter = ('kind', 'balance_field')
+
+@admin.register(LeaveBalanceSnapshot)
+class LeaveBalanceSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ('employee', 'as_of', 'annual_leave_balance', 'sick_leave_balance')
+    list_filter = ('as_of',)
+
+@admin.register(PublicHoliday)
+class PublicHolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name')
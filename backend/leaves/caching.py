@@ -0,0 +1,60 @@
+"""
+Versioned cache for the team availability heatmap.
+
+A heatmap is cached per (department, window) under the versions of the calendar months the
+window touches. A leave change bumps the versions of the months that leave covers, so only the
+windows containing it are recomputed. The employees aggregates version is part of the key too,
+which covers an employee moving to another department.
+"""
+import time
+from django.core.cache import cache
+from employees.caching import get_aggregates_version
+from .constants import AVAILABILITY_CACHE_TIMEOUT
+
+AVAILABILITY_MONTH_VERSION_KEY = 'leaves:availability:month:{year}-{month:02d}'
+_MISSING = object()
+
+
+def get_month_version_keys(start_date, end_date):
+    """Version keys of every calendar month from ``start_date`` to ``end_date``"""
+    year, month = start_date.year, start_date.month
+    keys = []
+    while (year, month) <= (end_date.year, end_date.month):
+        keys.append(AVAILABILITY_MONTH_VERSION_KEY.format(year=year, month=month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
+def get_window_versions(start_date, end_date):
+    """Current versions of the window's months, started from the clock so an evicted counter never reuses old keys"""
+    keys = get_month_version_keys(start_date, end_date)
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        seed = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, seed, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def invalidate_availability(start_date, end_date):
+    """Make every cached heatmap whose window overlaps ``start_date``..``end_date`` stale"""
+    for key in get_month_version_keys(start_date, end_date):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never read, so no heatmap was cached under it; the next read seeds a fresh version
+            pass
+
+
+def get_or_compute_availability(department, start_date, end_date, compute):
+    """Return the cached heatmap of the window or compute and cache it"""
+    versions = '.'.join(str(version) for version in get_window_versions(start_date, end_date))
+    key = (f'leaves:availability:{department or "*"}:{start_date}:{end_date}:'
+           f'{get_aggregates_version()}:{versions}')
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout=AVAILABILITY_CACHE_TIMEOUT)
+    return value
@@ -4,6 +4,7 @@ Constants for the leaves application
 
 # Leave accrual constants
 MONTHLY_LEAVE_ACCRUAL_DAYS = 2.5
+LEAVE_ACCRUAL_LOCK_TIMEOUT = 10 * 60  # seconds
 
 # Leave type choices
 LEAVE_TYPE_CHOICES = [
@@ -38,8 +39,62 @@ LEAVE_TYPE_TO_BALANCE_FIELD = {
     'Other': 'other_leave_balance',
 }
 
+LEAVE_BALANCE_FIELDS = tuple(LEAVE_TYPE_TO_BALANCE_FIELD.values())
+
+# Leave ledger: why a balance moved
+LEDGER_OPENING = 'opening'
+LEDGER_ACCRUAL = 'accrual'
+LEDGER_LEAVE = 'leave'
+LEDGER_SICK_RESET = 'sick_reset'
+LEDGER_ADJUSTMENT = 'adjustment'
+LEDGER_ENTRY_KIND_CHOICES = [
+    (LEDGER_OPENING, 'Opening balance'),
+    (LEDGER_ACCRUAL, 'Monthly accrual'),
+    (LEDGER_LEAVE, 'Approved leave'),
+    (LEDGER_SICK_RESET, 'Sick leave reset'),
+    (LEDGER_ADJUSTMENT, 'Manual adjustment'),
+]
+LEDGER_BALANCE_FIELD_CHOICES = [(field, field) for field in LEAVE_BALANCE_FIELDS]
+ANNUAL_SICK_LEAVE_DAYS = 14
+
+# Longest single leave. Leaves overlapping a date range must start at most this many days before it,
+# which bounds the index range scanned however many years of leaves there are.
+LEAVE_MAX_DAYS = 366
+
+# Working-day calendar: weekday numbers of the weekend (Monday is 0), overridable with the
+# WORKING_CALENDAR_WEEKEND setting, and how long a process keeps a precomputed year
+WEEKEND_DAYS = (5, 6)
+WORKING_CALENDAR_CACHE_SECONDS = 5 * 60
+# Leave types charged in calendar days rather than working days
+CALENDAR_DAY_LEAVE_TYPES = ('Maternity',)
+
+# Team availability heatmap: longest window (a quarter) and how long a heatmap is cached. Leave
+# changes invalidate the affected windows, the timeout only bounds what an idle cache holds.
+AVAILABILITY_MAX_DAYS = 92
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
 # Default remarks
 DEFAULT_PENDING_REMARKS = "Awaiting approval"
 DEFAULT_APPROVED_REMARKS = "Auto-approved by staff"
 DEFAULT_REJECTED_REMARKS = "System rejection"
 DEFAULT_UNAPPROVED_REMARKS = "Awaiting approval"
+
+# Bulk leave decisions: most leaves per request and the outcome reported for each leave
+BULK_DECISION_MAX_LEAVES = 200
+BULK_DECISION_CHOICES = [('approve', 'Approve'), ('reject', 'Reject')]
+DECISION_APPROVED = 'approved'
+DECISION_REJECTED = 'rejected'
+DECISION_NOT_FOUND = 'not_found'
+DECISION_NOT_PENDING = 'not_pending'
+DECISION_INVALID_LEAVE_TYPE = 'invalid_leave_type'
+DECISION_NO_BALANCE = 'no_balance'
+DECISION_INSUFFICIENT_BALANCE = 'insufficient_balance'
+DECISION_OVERLAPS_APPROVED_LEAVE = 'overlaps_approved_leave'
+
+# Position of each status in the leave lists, stored on the leave as status_rank; unknown statuses go last
+LEAVE_STATUS_RANKS = {'Pending': 0, 'Approved': 1, 'Rejected': 2}
+LEAVE_STATUS_RANK_DEFAULT = 3
+
+# List ordering used for keyset pagination: pending first, newest first (last field must be unique).
+# It matches the leave_queue_idx index, so a page is an index range scan rather than a sort.
+LEAVE_LIST_ORDERING = ('status_rank', '-applied_on', '-id')
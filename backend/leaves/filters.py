@@ -0,0 +1,16 @@
+from django_filters import rest_framework as filters
+from .constants import LEAVE_STATUS_CHOICES, LEAVE_TYPE_CHOICES
+from .models import Leave
+
+
+class LeaveFilter(filters.FilterSet):
+    """?status=&leave_type=&employee=&start=&end=; start and end keep the leaves overlapping those dates"""
+    status = filters.ChoiceFilter(choices=LEAVE_STATUS_CHOICES)
+    leave_type = filters.ChoiceFilter(choices=LEAVE_TYPE_CHOICES)
+    employee = filters.NumberFilter(field_name='employee_id')
+    start = filters.DateFilter(field_name='end_date', lookup_expr='gte')
+    end = filters.DateFilter(field_name='start_date', lookup_expr='lte')
+
+    class Meta:
+        model = Leave
+        fields = ['status', 'leave_type', 'employee', 'start', 'end']
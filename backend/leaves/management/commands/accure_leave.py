@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from leaves.models import LeaveBalance, LeaveAccrual
-from employees.models import Employee
+from leaves.services import LeaveAccrualService
 
 class Command(BaseCommand):
     help = 'Add 2.5 leave days to each employee on the 1st of every month.'
@@ -10,10 +9,10 @@ class Command(BaseCommand):
         today = timezone.now().date()
 
         if today.day == 1:
-            for employee in Employee.objects.all():
-                accrual, _ = LeaveAccrual.objects.get_or_create(employee=employee)
-                accrual.accrue_leave()
-            self.stdout.write(self.style.SUCCESS("Leave accrued for all employees."))
+            run = LeaveAccrualService.accrue_month(today)
+            if run is None:
+                self.stdout.write(f"Leave for {today.month}/{today.year} is already accrued or being accrued.")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Leave accrued for {run.employees_accrued} employees."))
         else:
             self.stdout.write("Today is not the 1st of the month. No action taken.")
-
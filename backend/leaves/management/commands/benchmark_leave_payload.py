@@ -0,0 +1,66 @@
+import datetime
+import time
+from decimal import Decimal
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from employees.models import Employee
+from leaves.models import Leave
+from leaves.serializers import LeaveSerializer
+from users.models import CustomUser
+
+
+class FullUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = '__all__'
+
+
+class FullApproverLeaveSerializer(LeaveSerializer):
+    """The leave list as it was, nesting the approver's whole user record"""
+    approved_by = FullUserSerializer(read_only=True)
+
+
+class Command(BaseCommand):
+    help = 'Compare the size and render time of a leave list with the compact and the full approver, without the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000, help='Number of leaves in the list.')
+
+    def handle(self, *args, **options):
+        count = max(options['count'], 1)
+        employee = Employee(id=1, first_name='Bench', last_name='Mark', department='IT')
+        approver = CustomUser(
+            id=2, username='approver', email='approver@example.com', first_name='Ada', last_name='Admin',
+            password='pbkdf2_sha256$870000$benchmark$' + 'x' * 44, user_type='Admin', is_staff=True,
+            last_login=timezone.now()
+        )
+        # What prefetch_related used to load for every list, so the full record renders without queries
+        approver._prefetched_objects_cache = {
+            'groups': Group.objects.none(), 'user_permissions': Permission.objects.none()
+        }
+        applied_on = timezone.now()
+        leaves = [
+            Leave(
+                id=index, employee=employee, leave_type='Annual', status='Approved', reason='Family trip',
+                start_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=index % 300),
+                end_date=datetime.date(2025, 1, 2) + datetime.timedelta(days=index % 300),
+                days_taken=Decimal('2.00'), applied_on=applied_on, approved_on=applied_on, approved_by=approver
+            )
+            for index in range(1, count + 1)
+        ]
+
+        sizes = {}
+        for name, serializer_class in (('full', FullApproverLeaveSerializer), ('compact', LeaveSerializer)):
+            start = time.perf_counter()
+            payload = JSONRenderer().render(serializer_class(leaves, many=True).data)
+            elapsed = time.perf_counter() - start
+            sizes[name] = len(payload)
+            self.stdout.write(f"{name.title()} approver: {len(payload) / 1024:.1f} KiB, "
+                              f"{len(payload) / count:.0f} bytes per leave, rendered in {elapsed * 1000:.0f} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compact list of {count} leaves is {100 * (1 - sizes['compact'] / sizes['full']):.0f}% smaller"
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0008_leave_remarks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveAccrualRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('days', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('employees_accrued', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('year', 'month'), name='leave_accrual_run_period_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+BALANCE_FIELDS = (
+    'annual_leave_balance', 'sick_leave_balance', 'unpaid_leave_balance', 'maternity_leave_balance',
+    'paternity_leave_balance', 'compassionate_leave_balance', 'personal_leave_balance',
+    'emergency_leave_balance', 'other_leave_balance',
+)
+BALANCE_FIELD_CHOICES = [(field, field) for field in BALANCE_FIELDS]
+
+
+def record_opening_balances(apps, schema_editor):
+    """Existing balances have no history, so each one starts the ledger as an opening entry"""
+    LeaveBalance = apps.get_model('leaves', 'LeaveBalance')
+    LeaveLedgerEntry = apps.get_model('leaves', 'LeaveLedgerEntry')
+    LeaveLedgerEntry.objects.bulk_create([
+        LeaveLedgerEntry(employee_id=leave_balance.employee_id, balance_field=field,
+                         delta=getattr(leave_balance, field), kind='opening')
+        for leave_balance in LeaveBalance.objects.iterator()
+        for field in BALANCE_FIELDS
+        if getattr(leave_balance, field)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_salarydetails_wps_fields'),
+        ('leaves', '0009_leaveaccrualrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance_field', models.CharField(choices=BALANCE_FIELD_CHOICES, max_length=50)),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('accrual', 'Monthly accrual'), ('leave', 'Approved leave'), ('sick_reset', 'Sick leave reset'), ('adjustment', 'Manual adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('accrual_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='leaves.leaveaccrualrun')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leave_ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_ledger_entries', to='employees.employee')),
+                ('leave', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='leaves.leave')),
+            ],
+            options={
+                'ordering': ('created_at', 'id'),
+                'indexes': [models.Index(fields=['employee', 'created_at'], name='leave_ledger_employee_time'), models.Index(fields=['created_at'], name='leave_ledger_time')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('annual_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('sick_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('maternity_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('paternity_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('compassionate_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('personal_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('emergency_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('unpaid_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('other_leave_balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balance_snapshots', to='employees.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['as_of'], name='leave_snapshot_as_of')],
+                'constraints': [models.UniqueConstraint(fields=('employee', 'as_of'), name='leave_balance_snapshot_unique')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0010_leave_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['employee', 'start_date', 'end_date'], name='leave_employee_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['start_date', 'end_date'], name='leave_period_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0012_publicholiday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leave',
+            name='status_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='Pending', then=models.Value(0)), models.When(status='Approved', then=models.Value(1)), models.When(status='Rejected', then=models.Value(2)), default=models.Value(3)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['status_rank', '-applied_on', '-id'], name='leave_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:55
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0013_leave_status_rank'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='leave',
+            constraint=models.CheckConstraint(condition=models.Q(('end_date__gte', models.F('start_date')), ('end_date__lt', models.F('start_date') + datetime.timedelta(days=366))), name='leave_period_max_days'),
+        ),
+    ]
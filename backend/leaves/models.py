@@ -1,7 +1,12 @@
+import datetime
+from django.core.exceptions import ValidationError
 from django.db import models
 from employees.models import Employee
 from django.utils import timezone
-from .constants import LEAVE_TYPE_CHOICES, LEAVE_STATUS_CHOICES
+from .constants import (
+    LEAVE_TYPE_CHOICES, LEAVE_STATUS_CHOICES, LEDGER_ENTRY_KIND_CHOICES, LEDGER_BALANCE_FIELD_CHOICES,
+    LEAVE_BALANCE_FIELDS, LEAVE_STATUS_RANKS, LEAVE_STATUS_RANK_DEFAULT, LEAVE_MAX_DAYS
+)
 
 
 class Leave(models.Model):
@@ -17,7 +22,49 @@ class Leave(models.Model):
     approved_on = models.DateTimeField(null=True, blank=True)
     approved_by = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_leaves')
     remarks = models.TextField(default="Awaiting approval", blank=True)
-
+    # Computed by the database from status, so queryset updates of the status keep it right too
+    status_rank = models.GeneratedField(
+        expression=models.Case(
+            *[models.When(status=status, then=models.Value(rank)) for status, rank in LEAVE_STATUS_RANKS.items()],
+            default=models.Value(LEAVE_STATUS_RANK_DEFAULT),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Overlap checks for one employee, and "who is off between two dates" across everyone
+            models.Index(fields=['employee', 'start_date', 'end_date'], name='leave_employee_period_idx'),
+            models.Index(fields=['start_date', 'end_date'], name='leave_period_idx'),
+            # The pending-first list ordering (LEAVE_LIST_ORDERING)
+            models.Index(fields=['status_rank', '-applied_on', '-id'], name='leave_queue_idx'),
+        ]
+        constraints = [
+            # LeaveService.get_leaves_between derives its lower start_date bound from LEAVE_MAX_DAYS
+            models.CheckConstraint(
+                condition=models.Q(end_date__gte=models.F('start_date')) & models.Q(
+                    end_date__lt=models.F('start_date') + datetime.timedelta(days=LEAVE_MAX_DAYS)
+                ),
+                name='leave_period_max_days',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded dates, so moving a leave also refreshes what it covered before"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_period = (instance.__dict__.get('start_date'), instance.__dict__.get('end_date'))
+        return instance
+
+    def clean(self):
+        """The leave_period_max_days constraint, reported as a validation error"""
+        super().clean()
+        if self.start_date and self.end_date:
+            if self.start_date > self.end_date:
+                raise ValidationError({'end_date': 'End date must be after start date.'})
+            if (self.end_date - self.start_date).days + 1 > LEAVE_MAX_DAYS:
+                raise ValidationError({'end_date': f'A leave cannot be longer than {LEAVE_MAX_DAYS} days.'})
 
     def save(self, *args, **kwargs):
         """Save method with business logic moved to service layer"""
@@ -25,15 +72,20 @@ class Leave(models.Model):
         is_new = self.pk is None
 
         if is_new:
-            # Calculate days taken
-            self.days_taken = (self.end_date - self.start_date).days + 1
+            # Calculate days taken, skipping weekends and public holidays
+            from .services import LeaveService
+            self.days_taken = LeaveService.calculate_leave_days(self.start_date, self.end_date, self.leave_type)
             
             # Process leave approval using service
-            from .services import LeaveService
             LeaveService.process_leave_approval(self, requested_by)
 
         super().save(*args, **kwargs)
 
+        if is_new and self.status == 'Approved' and self.leave_type != 'Unpaid':
+            # Auto-approved on creation: the balance was deducted before the leave had an id
+            from .services import LeaveLedgerService
+            LeaveLedgerService.record_leave(self)
+
     def approve_leave(self, approver):
         """Approve leave using service layer"""
         from .services import LeaveService
@@ -54,6 +106,18 @@ class Leave(models.Model):
         return f"{self.employee.first_name} {self.employee.last_name} - Leave: {self.leave_type} ({self.start_date} to {self.end_date})"
 
 
+class PublicHoliday(models.Model):
+    """A day off for everyone, skipped when counting working days"""
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ('date',)
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+
 class LeaveBalance(models.Model):
     employee = models.OneToOneField(Employee, on_delete=models.CASCADE)
     annual_leave_balance = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
@@ -82,3 +146,84 @@ class LeaveAccrual(models.Model):
 
     def __str__(self):
         return f"{self.employee.first_name} {self.employee.last_name} - Leave Accrual"
+
+
+class LeaveAccrualRun(models.Model):
+    """One row per accrued month; its unique period is what keeps a month from being accrued twice"""
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    days = models.DecimalField(max_digits=5, decimal_places=2)
+    employees_accrued = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='leave_accrual_run_period_unique'),
+        ]
+
+    def __str__(self):
+        return f"Leave accrual for {self.month}/{self.year}: {self.employees_accrued} employees"
+
+
+class LeaveLedgerEntry(models.Model):
+    """
+    One movement of one leave balance. Entries are only ever added, so the entries of an employee
+    sum to their current LeaveBalance and explain how it got there.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_ledger_entries')
+    balance_field = models.CharField(max_length=50, choices=LEDGER_BALANCE_FIELD_CHOICES)
+    delta = models.DecimalField(max_digits=7, decimal_places=2)
+    kind = models.CharField(max_length=20, choices=LEDGER_ENTRY_KIND_CHOICES)
+    # Deleting a leave must not rewrite the history it left, so the reference is kept as it was
+    leave = models.ForeignKey(Leave, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+                              related_name='ledger_entries')
+    accrual_run = models.ForeignKey(LeaveAccrualRun, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='ledger_entries')
+    created_by = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='leave_ledger_entries')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('created_at', 'id')
+        indexes = [
+            models.Index(fields=['employee', 'created_at'], name='leave_ledger_employee_time'),
+            models.Index(fields=['created_at'], name='leave_ledger_time'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Leave ledger entries are append-only; record a correcting entry instead")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.employee_id} {self.balance_field} {self.delta:+} ({self.kind})"
+
+
+class LeaveBalanceSnapshot(models.Model):
+    """An employee's balances at the start of a month, so a past balance only needs that month's entries"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_balance_snapshots')
+    as_of = models.DateTimeField()
+    annual_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    sick_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    maternity_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    paternity_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    compassionate_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    personal_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    emergency_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    unpaid_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    other_leave_balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'as_of'], name='leave_balance_snapshot_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['as_of'], name='leave_snapshot_as_of'),
+        ]
+
+    def get_balances(self):
+        return {field: getattr(self, field) for field in LEAVE_BALANCE_FIELDS}
+
+    def __str__(self):
+        return f"{self.employee_id} leave balances as of {self.as_of:%Y-%m-%d}"
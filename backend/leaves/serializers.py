@@ -1,22 +1,47 @@
 from rest_framework import serializers
-from .models import Leave, LeaveBalance, LeaveAccrual
+from .models import Leave, LeaveBalance, LeaveAccrual, LeaveLedgerEntry
 from employees.models import Employee
 from users.models import CustomUser
+from .constants import LEAVE_MAX_DAYS, BULK_DECISION_MAX_LEAVES, BULK_DECISION_CHOICES
+from .services import LeaveService
+
+
+def validate_leave_period(data, employee_id, instance=None):
+    """Check the dates of a new or edited leave, and that they do not overlap the employee's other leaves"""
+    start_date = data.get('start_date', getattr(instance, 'start_date', None))
+    end_date = data.get('end_date', getattr(instance, 'end_date', None))
+    if start_date > end_date:
+        raise serializers.ValidationError("End date must be after start date.")
+    if (end_date - start_date).days + 1 > LEAVE_MAX_DAYS:
+        raise serializers.ValidationError(f"A leave cannot be longer than {LEAVE_MAX_DAYS} days.")
+    leave_type = data.get('leave_type', getattr(instance, 'leave_type', None))
+    if not LeaveService.calculate_leave_days(start_date, end_date, leave_type):
+        raise serializers.ValidationError("The leave only covers weekends or public holidays.")
+    if employee_id is None:
+        return
+    overlapping = LeaveService.get_overlapping_leaves(
+        employee_id, start_date, end_date, exclude_pk=getattr(instance, 'pk', None)
+    ).order_by('start_date').first()
+    if overlapping:
+        raise serializers.ValidationError(
+            f"Overlaps the {overlapping.status.lower()} {overlapping.leave_type} leave "
+            f"from {overlapping.start_date} to {overlapping.end_date}."
+        )
 
 class EmployeeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
         fields = ['id', 'first_name', 'last_name']
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class LeaveApproverSerializer(serializers.ModelSerializer):
+    """Just who approved a leave, rather than the approver's whole user record"""
     class Meta:
         model = CustomUser
-        fields = '__all__' 
+        fields = ['id', 'first_name', 'last_name']
 
 class LeaveSerializer(serializers.ModelSerializer):
     employee = EmployeeSerializer(read_only=True)
-    user = CustomUserSerializer(read_only=True)
-    approved_by = CustomUserSerializer(read_only=True)
+    approved_by = LeaveApproverSerializer(read_only=True)
     applied_on = serializers.DateTimeField(format="%b %d, %Y, %I:%M %p", read_only=True)
     approved_on = serializers.DateTimeField(format="%b %d, %Y, %I:%M %p", read_only=True)
 
@@ -25,16 +50,22 @@ class LeaveSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'employee', 'leave_type', 'start_date', 'end_date',
             'reason', 'days_taken', 'status', 'applied_on',
-            'approved_on', 'approved_by', 'user'
+            'approved_on', 'approved_by'
         ]
         read_only_fields = [
             'status', 'applied_on', 'approved_on', 'approved_by',
-            'employee', 'user'
+            'employee'
         ]
 
     def validate(self, data):
-        if data['start_date'] > data['end_date']:
-            raise serializers.ValidationError("End date must be after start date.")
+        if self.instance is not None:
+            employee_id = self.instance.employee_id
+        else:
+            # A new leave is the requesting user's own; the view saves it with this employee
+            request = self.context.get('request')
+            data['employee'] = Employee.objects.filter(user=request.user).first() if request else None
+            employee_id = data['employee'].id if data['employee'] else None
+        validate_leave_period(data, employee_id, self.instance)
         return data
     def create(self, validated_data):
         requested_by = self.context.get('requested_by')
@@ -43,7 +74,6 @@ class LeaveSerializer(serializers.ModelSerializer):
         return instance
     
 class AdminCreateLeaveSerializer(serializers.ModelSerializer):
-    user = CustomUserSerializer(read_only=True)
     employee = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all())
 
     class Meta:
@@ -51,12 +81,11 @@ class AdminCreateLeaveSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'employee', 'leave_type', 'start_date', 'end_date',
             'reason', 'days_taken', 'status', 'applied_on',
-            'approved_on', 'approved_by', 'user'
+            'approved_on', 'approved_by'
         ]
 
     def validate(self, data):
-        if data['start_date'] > data['end_date']:
-            raise serializers.ValidationError("End date must be after start date.")
+        validate_leave_period(data, data['employee'].id)
         return data
     def create(self, validated_data):
         requested_by = self.context.get('requested_by', None)  # get from context, not from validated_data
@@ -65,6 +94,13 @@ class AdminCreateLeaveSerializer(serializers.ModelSerializer):
         return leave
 
 
+class LeaveBulkDecisionSerializer(serializers.Serializer):
+    """The leaves to approve or reject in one request"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=BULK_DECISION_MAX_LEAVES)
+    decision = serializers.ChoiceField(choices=BULK_DECISION_CHOICES)
+
+
 class LeaveBalanceSerializer(serializers.ModelSerializer):
     employee = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all())
     employee_details = EmployeeSerializer(source='employee', read_only=True)
@@ -80,4 +116,7 @@ class LeaveAccrualSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-
+class LeaveLedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = ['id', 'balance_field', 'delta', 'kind', 'leave', 'accrual_run', 'created_by', 'created_at']
@@ -1,23 +1,62 @@
+import datetime
+from collections import defaultdict
+from itertools import accumulate
+from django.core.cache import cache
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from django.db.models import Case, F, Max, Sum, Value, When
 from decimal import Decimal
-from .models import Leave, LeaveBalance, LeaveAccrual
-from .constants import LEAVE_TYPE_TO_BALANCE_FIELD, MONTHLY_LEAVE_ACCRUAL_DAYS, DEFAULT_PENDING_REMARKS, DEFAULT_APPROVED_REMARKS
+from employees.models import Employee
+from .models import Leave, LeaveBalance, LeaveAccrual, LeaveAccrualRun, LeaveLedgerEntry, LeaveBalanceSnapshot
+from .constants import (
+    LEAVE_TYPE_TO_BALANCE_FIELD, MONTHLY_LEAVE_ACCRUAL_DAYS, DEFAULT_PENDING_REMARKS, DEFAULT_APPROVED_REMARKS,
+    LEAVE_ACCRUAL_LOCK_TIMEOUT, LEAVE_BALANCE_FIELDS, ANNUAL_SICK_LEAVE_DAYS, LEDGER_OPENING, LEDGER_ACCRUAL,
+    LEDGER_LEAVE, LEDGER_SICK_RESET, LEAVE_MAX_DAYS, CALENDAR_DAY_LEAVE_TYPES, DECISION_APPROVED, DECISION_REJECTED,
+    DECISION_NOT_FOUND, DECISION_NOT_PENDING, DECISION_INVALID_LEAVE_TYPE, DECISION_NO_BALANCE,
+    DECISION_INSUFFICIENT_BALANCE, DECISION_OVERLAPS_APPROVED_LEAVE
+)
+from .working_days import working_calendar
+from .caching import get_or_compute_availability, invalidate_availability
 
 
 class LeaveService:
     """Service class for leave-related business logic"""
     
     @staticmethod
-    def calculate_leave_days(start_date, end_date):
-        """Calculate the number of days between start and end dates"""
-        return (end_date - start_date).days + 1
+    def calculate_leave_days(start_date, end_date, leave_type=None):
+        """Days charged for a leave: working days, or calendar days for CALENDAR_DAY_LEAVE_TYPES"""
+        if leave_type in CALENDAR_DAY_LEAVE_TYPES:
+            return (end_date - start_date).days + 1
+        return working_calendar.working_days_between(start_date, end_date)
     
     @staticmethod
     def get_balance_field_for_leave_type(leave_type):
         """Get the corresponding balance field for a leave type"""
         return LEAVE_TYPE_TO_BALANCE_FIELD.get(leave_type)
     
+    @staticmethod
+    def get_leaves_between(start_date, end_date, leaves=None):
+        """
+        Leaves overlapping ``start_date``..``end_date`` (inclusive), from ``leaves`` or all of them. The lower
+        bound on start_date is implied by LEAVE_MAX_DAYS and keeps the scan on the (start_date, end_date) index
+        to the recent part.
+        """
+        return (Leave.objects.all() if leaves is None else leaves).filter(
+            start_date__lte=end_date,
+            start_date__gte=start_date - datetime.timedelta(days=LEAVE_MAX_DAYS - 1),
+            end_date__gte=start_date,
+        )
+
+    @staticmethod
+    def get_overlapping_leaves(employee_id, start_date, end_date, exclude_pk=None):
+        """An employee's pending or approved leaves overlapping the dates, optionally leaving one leave out"""
+        leaves = LeaveService.get_leaves_between(start_date, end_date).filter(
+            employee_id=employee_id
+        ).exclude(status='Rejected')
+        if exclude_pk is not None:
+            leaves = leaves.exclude(pk=exclude_pk)
+        return leaves
+
     @staticmethod
     def process_leave_approval(leave, requested_by):
         """Process leave approval logic"""
@@ -58,8 +97,8 @@ class LeaveService:
     def _approve_leave(leave, requested_by, leave_balance, balance_field, current_balance):
         """Approve leave and update balance"""
         if requested_by and requested_by.is_staff:
-            setattr(leave_balance, balance_field, current_balance - leave.days_taken)
-            leave_balance.save()
+            if not LeaveService.deduct_balance(leave.employee_id, balance_field, leave.days_taken):
+                return LeaveService._reject_leave(leave, requested_by, "Not enough leave balance")
             leave.status = 'Approved'
             leave.approved_by = requested_by
             leave.approved_on = timezone.now()
@@ -70,6 +109,26 @@ class LeaveService:
             leave.remarks = DEFAULT_PENDING_REMARKS
             return False
     
+    @staticmethod
+    def deduct_balance(employee_id, balance_field, days):
+        """
+        Take ``days`` off a balance in one conditional UPDATE, only if the balance still covers them.
+        Concurrent approvals cannot lose an update or overdraw, whatever was read before.
+        """
+        return LeaveBalance.objects.filter(
+            employee_id=employee_id, **{f'{balance_field}__gte': days}
+        ).update(**{balance_field: F(balance_field) - days}) == 1
+
+    @staticmethod
+    def create_missing_balances():
+        """Give employees without a LeaveBalance one with the default balances, recorded as opening entries"""
+        missing = [
+            LeaveBalance(employee_id=employee_id)
+            for employee_id in Employee.objects.filter(leavebalance__isnull=True).values_list('id', flat=True)
+        ]
+        LeaveBalance.objects.bulk_create(missing, ignore_conflicts=True)
+        LeaveLedgerService.record_opening(missing)
+
     @staticmethod
     def _reject_leave(leave, requested_by, reason):
         """Reject leave with reason"""
@@ -81,33 +140,55 @@ class LeaveService:
 
     @staticmethod
     def approve_leave(leave, approver):
-        """Approve leave and update balance"""
-        from .models import LeaveBalance
-        
+        """
+        Approve leave and update balance. The leave is claimed with a conditional UPDATE first, so
+        approving the same leave twice at once deducts once. A failed deduction, or an overlap with
+        another approved leave of the employee, undoes the claim.
+        """
         balance_field = LeaveService.get_balance_field_for_leave_type(leave.leave_type)
         
         if not balance_field:
             return LeaveService._reject_leave(leave, approver, "Invalid leave type")
-        
-        try:
-            leave_balance = LeaveBalance.objects.get(employee=leave.employee)
-            current_balance = getattr(leave_balance, balance_field, 0)
-            
-            if leave.leave_type == 'Unpaid' or current_balance >= leave.days_taken:
-                if leave.leave_type != 'Unpaid':
-                    setattr(leave_balance, balance_field, current_balance - leave.days_taken)
-                    leave_balance.save()
-                
-                leave.status = 'Approved'
-                leave.approved_on = timezone.now()
-                leave.approved_by = approver
-                leave.save()
-                return True
+
+        approved_on = timezone.now()
+        with transaction.atomic():
+            claimed = Leave.objects.filter(pk=leave.pk).exclude(status='Approved').update(
+                status='Approved', approved_on=approved_on, approved_by=approver
+            )
+            if not claimed:
+                leave.refresh_from_db(fields=['status', 'approved_on', 'approved_by'])
+                return False
+
+            if leave.leave_type == 'Unpaid':
+                # Nothing to deduct, but lock the balance row as a deduction would so the overlap check
+                # below is serialised with the employee's other approvals
+                deducted = LeaveBalance.objects.select_for_update().filter(
+                    employee_id=leave.employee_id
+                ).values_list('pk', flat=True).first() is not None
             else:
-                return LeaveService._reject_leave(leave, approver, "Not enough leave balance")
-                
-        except LeaveBalance.DoesNotExist:
-            return LeaveService._reject_leave(leave, approver, "Leave balance not found")
+                deducted = LeaveService.deduct_balance(leave.employee_id, balance_field, leave.days_taken)
+            # Checked after the deduction, whose row lock serialises approvals of the same employee
+            overlaps = deducted and LeaveService.get_overlapping_leaves(
+                leave.employee_id, leave.start_date, leave.end_date, exclude_pk=leave.pk
+            ).filter(status='Approved').exists()
+            if not deducted or overlaps:
+                transaction.set_rollback(True)
+            elif leave.leave_type != 'Unpaid':
+                LeaveLedgerService.record_leave(leave, approver)
+
+        if overlaps:
+            return LeaveService._reject_leave(leave, approver, "Overlaps an approved leave")
+        if not deducted:
+            if not LeaveBalance.objects.filter(employee_id=leave.employee_id).exists():
+                return LeaveService._reject_leave(leave, approver, "Leave balance not found")
+            return LeaveService._reject_leave(leave, approver, "Not enough leave balance")
+
+        leave.status = 'Approved'
+        leave.approved_on = approved_on
+        leave.approved_by = approver
+        # The claim is a queryset update, which sends no post_save
+        transaction.on_commit(lambda: invalidate_availability(leave.start_date, leave.end_date))
+        return True
     
     @staticmethod
     def reject_leave(leave, approver=None):
@@ -118,6 +199,115 @@ class LeaveService:
         leave.save()
         return False
 
+    @staticmethod
+    def decide_leaves(leave_ids, decision, approver):
+        """
+        Approve or reject many pending leaves in one transaction, with a fixed number of queries.
+        The leaves and their employees' balances are locked up front. Approvals are checked in date
+        order against what is left of each balance, and the accepted deductions are applied in one
+        UPDATE. A leave that cannot be approved stays pending. Returns ``[{'id': .., 'outcome': ..}]``
+        in the order of ``leave_ids``.
+        """
+        leave_ids = list(dict.fromkeys(leave_ids))
+        decided_on = timezone.now()
+        with transaction.atomic():
+            leaves = Leave.objects.select_for_update().in_bulk(leave_ids)
+            outcomes = {}
+            pending = []
+            for leave_id in leave_ids:
+                leave = leaves.get(leave_id)
+                if leave is None:
+                    outcomes[leave_id] = DECISION_NOT_FOUND
+                elif leave.status != 'Pending':
+                    outcomes[leave_id] = DECISION_NOT_PENDING
+                else:
+                    pending.append(leave)
+
+            if decision == 'reject':
+                Leave.objects.filter(pk__in=[leave.pk for leave in pending]).update(
+                    status='Rejected', approved_on=decided_on, approved_by=approver
+                )
+                outcomes.update((leave.pk, DECISION_REJECTED) for leave in pending)
+            else:
+                approved = LeaveService._approve_pending(pending, outcomes)
+                Leave.objects.filter(pk__in=[leave.pk for leave in approved]).update(
+                    status='Approved', approved_on=decided_on, approved_by=approver
+                )
+                for leave in approved:
+                    leave.status, leave.approved_on, leave.approved_by = 'Approved', decided_on, approver
+                LeaveLedgerEntry.objects.bulk_create([
+                    LeaveLedgerEntry(
+                        employee_id=leave.employee_id,
+                        balance_field=LeaveService.get_balance_field_for_leave_type(leave.leave_type),
+                        delta=-Decimal(str(leave.days_taken)), kind=LEDGER_LEAVE, leave=leave, created_by=approver
+                    )
+                    for leave in approved if leave.leave_type != 'Unpaid'
+                ])
+
+                def invalidate():
+                    for leave in approved:
+                        invalidate_availability(leave.start_date, leave.end_date)
+
+                transaction.on_commit(invalidate)
+
+        return [{'id': leave_id, 'outcome': outcomes[leave_id]} for leave_id in leave_ids]
+
+    @staticmethod
+    def _approve_pending(leaves, outcomes):
+        """
+        Pick the leaves the locked balances can cover, recording an outcome for each, and take the
+        grouped deductions off the balances in one UPDATE. Must run inside decide_leaves' transaction.
+        """
+        employee_ids = {leave.employee_id for leave in leaves}
+        balances = {
+            balance.employee_id: balance
+            for balance in LeaveBalance.objects.select_for_update().filter(employee_id__in=employee_ids)
+        }
+        taken = defaultdict(list)
+        if leaves:
+            for employee_id, start_date, end_date in LeaveService.get_leaves_between(
+                min(leave.start_date for leave in leaves), max(leave.end_date for leave in leaves)
+            ).filter(employee_id__in=employee_ids, status='Approved').values_list('employee_id', 'start_date', 'end_date'):
+                taken[employee_id].append((start_date, end_date))
+
+        deductions = defaultdict(Decimal)
+        approved = []
+        for leave in sorted(leaves, key=lambda leave: (leave.start_date, leave.pk)):
+            balance_field = LeaveService.get_balance_field_for_leave_type(leave.leave_type)
+            balance = balances.get(leave.employee_id)
+            days = Decimal(str(leave.days_taken))
+            if not balance_field:
+                outcomes[leave.pk] = DECISION_INVALID_LEAVE_TYPE
+            elif balance is None:
+                outcomes[leave.pk] = DECISION_NO_BALANCE
+            elif any(start_date <= leave.end_date and leave.start_date <= end_date
+                     for start_date, end_date in taken[leave.employee_id]):
+                outcomes[leave.pk] = DECISION_OVERLAPS_APPROVED_LEAVE
+            elif leave.leave_type != 'Unpaid' and (
+                Decimal(str(getattr(balance, balance_field))) - deductions[leave.employee_id, balance_field] < days
+            ):
+                outcomes[leave.pk] = DECISION_INSUFFICIENT_BALANCE
+            else:
+                if leave.leave_type != 'Unpaid':
+                    deductions[leave.employee_id, balance_field] += days
+                taken[leave.employee_id].append((leave.start_date, leave.end_date))
+                outcomes[leave.pk] = DECISION_APPROVED
+                approved.append(leave)
+
+        fields = defaultdict(dict)
+        for (employee_id, balance_field), days in deductions.items():
+            fields[balance_field][employee_id] = days
+        if fields:
+            LeaveBalance.objects.filter(employee_id__in={employee_id for employee_id, _ in deductions}).update(**{
+                balance_field: Case(
+                    *[When(employee_id=employee_id, then=F(balance_field) - Value(days))
+                      for employee_id, days in by_employee.items()],
+                    default=F(balance_field),
+                )
+                for balance_field, by_employee in fields.items()
+            })
+        return approved
+
 
 class LeaveAccrualService:
     """Service class for leave accrual logic"""
@@ -143,8 +333,212 @@ class LeaveAccrualService:
                 leave_balance = LeaveBalance.objects.get(employee=leave_accrual.employee)
                 leave_balance.annual_leave_balance += Decimal(str(MONTHLY_LEAVE_ACCRUAL_DAYS))
                 leave_balance.save()
+                LeaveLedgerEntry.objects.create(
+                    employee_id=leave_accrual.employee_id, balance_field='annual_leave_balance',
+                    delta=Decimal(str(MONTHLY_LEAVE_ACCRUAL_DAYS)), kind=LEDGER_ACCRUAL
+                )
             except LeaveBalance.DoesNotExist:
-                LeaveBalance.objects.create(
+                leave_balance = LeaveBalance.objects.create(
                     employee=leave_accrual.employee, 
                     annual_leave_balance=Decimal(str(MONTHLY_LEAVE_ACCRUAL_DAYS))
                 )
+                LeaveLedgerService.record_opening([leave_balance])
+
+    @staticmethod
+    def accrue_month(accrual_date, days=MONTHLY_LEAVE_ACCRUAL_DAYS):
+        """
+        Accrue the month of ``accrual_date`` for every employee in a fixed number of statements.
+        Employees already accrued this month are skipped. Returns the LeaveAccrualRun, or None when
+        the month was already accrued or another run for it holds the lock.
+        """
+        year, month = accrual_date.year, accrual_date.month
+        lock_key = f'leave-accrual:{year}:{month}'
+        if not cache.add(lock_key, True, LEAVE_ACCRUAL_LOCK_TIMEOUT):
+            return None
+        days = Decimal(str(days))
+        month_start = accrual_date.replace(day=1)
+        try:
+            with transaction.atomic():
+                # The unique period is the guard that holds even if the cache lock is lost
+                run = LeaveAccrualRun.objects.create(year=year, month=month, days=days)
+                LeaveService.create_missing_balances()
+
+                due = Employee.objects.exclude(leaveaccrual__last_accrued_date__gte=month_start).values('id')
+                LeaveLedgerEntry.objects.bulk_create([
+                    LeaveLedgerEntry(employee_id=employee_id, balance_field='annual_leave_balance', delta=days,
+                                     kind=LEDGER_ACCRUAL, accrual_run=run)
+                    for employee_id in due.values_list('id', flat=True)
+                ])
+                run.employees_accrued = LeaveBalance.objects.filter(employee__in=due).update(
+                    annual_leave_balance=F('annual_leave_balance') + days
+                )
+                LeaveAccrual.objects.filter(last_accrued_date__lt=month_start).update(
+                    leave_balance=F('leave_balance') + days, last_accrued_date=accrual_date
+                )
+                LeaveAccrual.objects.bulk_create([
+                    LeaveAccrual(employee_id=employee_id, leave_balance=days)
+                    for employee_id in Employee.objects.filter(leaveaccrual__isnull=True).values_list('id', flat=True)
+                ], ignore_conflicts=True)
+                run.save(update_fields=['employees_accrued'])
+        except IntegrityError:
+            return None
+        finally:
+            cache.delete(lock_key)
+        return run
+
+    @staticmethod
+    def reset_sick_leave(days=ANNUAL_SICK_LEAVE_DAYS, created_by=None):
+        """Reset every employee's sick leave to ``days``, recording the difference. Returns the number of balances changed."""
+        days = Decimal(str(days))
+        with transaction.atomic():
+            LeaveService.create_missing_balances()
+            changed = list(
+                LeaveBalance.objects.select_for_update().exclude(sick_leave_balance=days)
+                .values_list('employee_id', 'sick_leave_balance')
+            )
+            LeaveLedgerEntry.objects.bulk_create([
+                LeaveLedgerEntry(employee_id=employee_id, balance_field='sick_leave_balance', delta=days - balance,
+                                 kind=LEDGER_SICK_RESET, created_by=created_by)
+                for employee_id, balance in changed
+            ])
+            LeaveBalance.objects.filter(employee_id__in=[employee_id for employee_id, _ in changed]).update(
+                sick_leave_balance=days
+            )
+        return len(changed)
+
+
+class LeaveLedgerService:
+    """
+    The append-only history of leave balance movements. Monthly snapshots hold every employee's
+    balances at the start of a month, so a past balance is one snapshot plus that month's entries.
+    """
+
+    @staticmethod
+    def record_leave(leave, created_by=None):
+        """Record the deduction of an approved leave"""
+        return LeaveLedgerEntry.objects.create(
+            employee_id=leave.employee_id,
+            balance_field=LeaveService.get_balance_field_for_leave_type(leave.leave_type),
+            delta=-Decimal(str(leave.days_taken)), kind=LEDGER_LEAVE, leave=leave,
+            created_by=created_by or leave.approved_by
+        )
+
+    @staticmethod
+    def record_opening(leave_balances, created_by=None):
+        """Record the starting values of newly created LeaveBalance rows"""
+        LeaveLedgerEntry.objects.bulk_create([
+            LeaveLedgerEntry(employee_id=leave_balance.employee_id, balance_field=field,
+                             delta=Decimal(str(getattr(leave_balance, field))), kind=LEDGER_OPENING,
+                             created_by=created_by)
+            for leave_balance in leave_balances
+            for field in LEAVE_BALANCE_FIELDS
+            if getattr(leave_balance, field)
+        ])
+
+    @staticmethod
+    def record_changes(employee_id, before, after, kind, created_by=None):
+        """Record the fields that differ between two ``{balance_field: value}`` states of one employee"""
+        entries = []
+        for field in LEAVE_BALANCE_FIELDS:
+            delta = Decimal(str(after[field])) - Decimal(str(before[field]))
+            if delta:
+                entries.append(LeaveLedgerEntry(employee_id=employee_id, balance_field=field, delta=delta,
+                                                kind=kind, created_by=created_by))
+        return LeaveLedgerEntry.objects.bulk_create(entries)
+
+    @staticmethod
+    def get_balances(leave_balance):
+        return {field: getattr(leave_balance, field) for field in LEAVE_BALANCE_FIELDS}
+
+    @staticmethod
+    def get_month_start(value):
+        """The aware midnight opening the month of ``value``"""
+        return timezone.make_aware(datetime.datetime(value.year, value.month, 1))
+
+    @staticmethod
+    def take_snapshot(snapshot_date):
+        """
+        Snapshot every employee's balances as of the start of ``snapshot_date``'s month, from the previous
+        snapshot and the entries since. Returns the number of rows written, 0 when the month already has one.
+        """
+        as_of = LeaveLedgerService.get_month_start(snapshot_date)
+        if LeaveBalanceSnapshot.objects.filter(as_of=as_of).exists():
+            return 0
+
+        balances = defaultdict(lambda: dict.fromkeys(LEAVE_BALANCE_FIELDS, Decimal('0')))
+        entries = LeaveLedgerEntry.objects.filter(created_at__lt=as_of)
+        previous_as_of = LeaveBalanceSnapshot.objects.filter(as_of__lt=as_of).aggregate(Max('as_of'))['as_of__max']
+        if previous_as_of:
+            for snapshot in LeaveBalanceSnapshot.objects.filter(as_of=previous_as_of):
+                balances[snapshot.employee_id].update(snapshot.get_balances())
+            entries = entries.filter(created_at__gte=previous_as_of)
+        totals = entries.values_list('employee_id', 'balance_field').annotate(total=Sum('delta')).order_by()
+        for employee_id, field, total in totals:
+            balances[employee_id][field] += total
+
+        LeaveBalanceSnapshot.objects.bulk_create([
+            LeaveBalanceSnapshot(employee_id=employee_id, as_of=as_of, **fields)
+            for employee_id, fields in balances.items()
+        ], ignore_conflicts=True)
+        return len(balances)
+
+    @staticmethod
+    def get_balances_at(employee_id, at):
+        """
+        An employee's balances at the instant ``at``, read from the latest snapshot before it plus
+        the entries since. Returns the balances, that snapshot (or None) and those entries.
+        """
+        snapshot = LeaveBalanceSnapshot.objects.filter(employee_id=employee_id, as_of__lte=at).order_by('-as_of').first()
+        balances = snapshot.get_balances() if snapshot else dict.fromkeys(LEAVE_BALANCE_FIELDS, Decimal('0'))
+        entries = LeaveLedgerEntry.objects.filter(employee_id=employee_id, created_at__lt=at)
+        if snapshot:
+            entries = entries.filter(created_at__gte=snapshot.as_of)
+        entries = list(entries)
+        for entry in entries:
+            balances[entry.balance_field] += entry.delta
+        return balances, snapshot, entries
+
+
+class LeaveAvailabilityService:
+    """Per-day counts of employees on approved leave, by department"""
+
+    @staticmethod
+    def get_daily_counts(start_date, end_date, department=None):
+        """
+        ``{department: [count per day]}`` for ``start_date``..``end_date`` (inclusive). The leaves are read
+        in one query and swept once: each adds 1 where it starts and removes it after it ends, clipped to
+        the window, and a running sum turns those edges into daily counts.
+        """
+        days = (end_date - start_date).days + 1
+        leaves = LeaveService.get_leaves_between(start_date, end_date).filter(status='Approved')
+        if department:
+            leaves = leaves.filter(employee__department=department)
+
+        edges = defaultdict(lambda: [0] * (days + 1))
+        for leave_department, leave_start, leave_end in leaves.values_list(
+            'employee__department', 'start_date', 'end_date'
+        ):
+            department_edges = edges[leave_department]
+            department_edges[max((leave_start - start_date).days, 0)] += 1
+            department_edges[min((leave_end - start_date).days, days - 1) + 1] -= 1
+        if department and department not in edges:
+            edges[department] = [0] * (days + 1)  # listed even when nobody in it is on leave
+
+        return {name: list(accumulate(department_edges[:days])) for name, department_edges in sorted(edges.items())}
+
+    @staticmethod
+    def get_heatmap(start_date, end_date, department=None):
+        """The window's days, the counts per department and their total, cached until a leave in the window changes"""
+        def compute():
+            counts = LeaveAvailabilityService.get_daily_counts(start_date, end_date, department)
+            days = (end_date - start_date).days + 1
+            return {
+                'start': start_date,
+                'end': end_date,
+                'department': department,
+                'days': [start_date + datetime.timedelta(days=offset) for offset in range(days)],
+                'departments': counts,
+                'total': [sum(day_counts) for day_counts in zip(*counts.values())] if counts else [0] * days,
+            }
+
+        return get_or_compute_availability(department, start_date, end_date, compute)
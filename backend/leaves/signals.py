@@ -1,8 +1,12 @@
 from datetime import date
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from employees.models import Employee
-from .models import LeaveBalance, LeaveAccrual
+from .models import Leave, LeaveBalance, LeaveAccrual, PublicHoliday
+from .services import LeaveLedgerService
+from .working_days import working_calendar
+from .caching import invalidate_availability
 from dateutil.relativedelta import relativedelta
 
 @receiver(post_save, sender=Employee)
@@ -18,7 +22,7 @@ def create_leave_records(sender, instance, created, **kwargs):
 
         annual_leave = round(2.5 * months_worked, 2)       # 30 days / year
         sick_leave = round(14 / 12 * months_worked, 2)     # 14 days / year
-        LeaveBalance.objects.create(
+        leave_balance = LeaveBalance.objects.create(
             employee=instance,
             annual_leave_balance=annual_leave,
             sick_leave_balance=sick_leave,
@@ -30,6 +34,26 @@ def create_leave_records(sender, instance, created, **kwargs):
             unpaid_leave_balance=0.0,
             other_leave_balance=5.0
         )
+        LeaveLedgerService.record_opening([leave_balance])
         LeaveAccrual.objects.create(employee=instance)
 
 
+@receiver(post_save, sender=PublicHoliday)
+@receiver(post_delete, sender=PublicHoliday)
+def clear_working_calendar(sender, **kwargs):
+    working_calendar.clear()
+
+
+@receiver(post_save, sender=Leave)
+@receiver(post_delete, sender=Leave)
+def invalidate_availability_on_write(sender, instance, **kwargs):
+    """Drop cached heatmaps of the months the leave covers, and covered before a move, once committed"""
+    periods = {(instance.start_date, instance.end_date), getattr(instance, '_loaded_period', (None, None))}
+    periods = [(start_date, end_date) for start_date, end_date in periods if start_date and end_date]
+    instance._loaded_period = (instance.start_date, instance.end_date)
+
+    def invalidate():
+        for start_date, end_date in periods:
+            invalidate_availability(start_date, end_date)
+
+    transaction.on_commit(invalidate)
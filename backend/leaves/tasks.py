@@ -1,7 +1,6 @@
 from celery import shared_task
 from django.utils import timezone
-from .models import LeaveAccrual
-from .services import LeaveAccrualService
+from .services import LeaveAccrualService, LeaveLedgerService
 
 @shared_task
 def accrue_monthly_leave():
@@ -10,11 +9,11 @@ def accrue_monthly_leave():
     
     # Only run on the 1st of the month
     if today.day != 1:
-        return
-    
-    for leave_accrual in LeaveAccrual.objects.all():
-        # Check if we need to accrue leave for this month
-        if LeaveAccrualService.should_accrue_leave(leave_accrual.last_accrued_date, today):
-            LeaveAccrualService.accrue_monthly_leave_for_employee(leave_accrual, today)
+        return None
 
+    # Close last month in the ledger first; a month that already has its snapshot is skipped
+    LeaveLedgerService.take_snapshot(today)
 
+    # Safe to run more than once: a month that is already accrued is left alone
+    run = LeaveAccrualService.accrue_month(today)
+    return run.employees_accrued if run else None
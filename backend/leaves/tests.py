@@ -5,3 +5,7 @@ This file imports and runs all tests from the organized test files
 from leaves.tests.test_models import *
 from leaves.tests.test_services import *
 from leaves.tests.test_tasks import *
+from leaves.tests.test_views import *
+from leaves.tests.test_query_budgets import *
+from leaves.tests.test_working_days import *
+from leaves.tests.test_availability import *
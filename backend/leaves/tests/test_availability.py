@@ -0,0 +1,153 @@
+"""
+Tests for the team availability heatmap
+"""
+import datetime
+import random
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+from leaves.models import Leave
+from leaves.services import LeaveAvailabilityService
+from employees.tests.test_services import create_employee
+
+CustomUser = get_user_model()
+
+
+class LeaveAvailabilityServiceTestCase(TestCase):
+    """Test cases for LeaveAvailabilityService"""
+
+    def setUp(self):
+        """Start every test with an empty cache"""
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.it = create_employee('john', department='IT')
+        self.hr = create_employee('jane', department='HR')
+        self.start, self.end = datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)
+
+    def add_leave(self, employee, start_date, end_date, status='Approved'):
+        leave = Leave.objects.create(employee=employee, leave_type='Unpaid', start_date=start_date, end_date=end_date)
+        Leave.objects.filter(pk=leave.pk).update(status=status)
+        return leave
+
+    def test_counts_match_a_day_by_day_count(self):
+        """Test that the sweep gives the same counts as expanding every leave into days"""
+        employees = [create_employee(f'employee{index}', department=('IT', 'HR')[index % 2]) for index in range(6)]
+        rng = random.Random(7)
+        leaves = []
+        for employee in employees:
+            start_date = datetime.date(2025, 2, 1)
+            while start_date < datetime.date(2025, 5, 1):
+                end_date = start_date + datetime.timedelta(days=rng.randint(0, 9))
+                leaves.append((employee.department, start_date, end_date))
+                self.add_leave(employee, start_date, end_date)
+                start_date = end_date + datetime.timedelta(days=rng.randint(1, 12))
+
+        counts = LeaveAvailabilityService.get_daily_counts(self.start, self.end)
+
+        for offset in range(31):
+            day = self.start + datetime.timedelta(days=offset)
+            for department in ('IT', 'HR'):
+                expected = sum(1 for leave_department, start_date, end_date in leaves
+                               if leave_department == department and start_date <= day <= end_date)
+                self.assertEqual(counts.get(department, [0] * 31)[offset], expected, (department, day))
+
+    def test_only_approved_leaves_are_counted(self):
+        """Test that pending and rejected leaves leave the employee available, and leaves are clipped to the window"""
+        self.add_leave(self.it, datetime.date(2025, 2, 26), datetime.date(2025, 3, 2))
+        self.add_leave(self.hr, datetime.date(2025, 3, 3), datetime.date(2025, 3, 4), status='Pending')
+        self.add_leave(self.hr, datetime.date(2025, 3, 5), datetime.date(2025, 3, 6), status='Rejected')
+
+        counts = LeaveAvailabilityService.get_daily_counts(self.start, self.end)
+
+        self.assertEqual(list(counts), ['IT'])
+        self.assertEqual(counts['IT'][:3], [1, 1, 0])
+        self.assertEqual(sum(counts['IT']), 2)
+
+    def test_department_without_leaves_is_listed(self):
+        """Test that filtering by a department returns its days even when nobody is off"""
+        self.add_leave(self.it, datetime.date(2025, 3, 10), datetime.date(2025, 3, 11))
+
+        counts = LeaveAvailabilityService.get_daily_counts(self.start, self.end, department='HR')
+
+        self.assertEqual(counts, {'HR': [0] * 31})
+
+    def test_heatmap_is_cached(self):
+        """Test that a repeated heatmap is served without querying"""
+        self.add_leave(self.it, datetime.date(2025, 3, 10), datetime.date(2025, 3, 11))
+        heatmap = LeaveAvailabilityService.get_heatmap(self.start, self.end)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(LeaveAvailabilityService.get_heatmap(self.start, self.end), heatmap)
+        self.assertEqual(heatmap['total'][9:12], [1, 1, 0])
+        self.assertEqual(len(heatmap['days']), 31)
+
+    def test_leave_in_window_invalidates(self):
+        """Test that approving a leave inside the window recomputes it, and one outside does not"""
+        LeaveAvailabilityService.get_heatmap(self.start, self.end)
+        outside = self.add_leave(self.hr, datetime.date(2025, 5, 5), datetime.date(2025, 5, 6), status='Pending')
+        inside = self.add_leave(self.it, datetime.date(2025, 3, 10), datetime.date(2025, 3, 11), status='Pending')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            outside.approve_leave(self.admin)
+        with self.assertNumQueries(0):
+            LeaveAvailabilityService.get_heatmap(self.start, self.end)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inside.approve_leave(self.admin)
+        self.assertEqual(LeaveAvailabilityService.get_heatmap(self.start, self.end)['departments']['IT'][9], 1)
+
+    def test_moved_leave_invalidates_its_old_window(self):
+        """Test that moving a leave out of the window refreshes the window it left"""
+        leave = self.add_leave(self.it, datetime.date(2025, 3, 10), datetime.date(2025, 3, 11))
+        self.assertEqual(sum(LeaveAvailabilityService.get_heatmap(self.start, self.end)['total']), 2)
+
+        leave = Leave.objects.get(pk=leave.pk)
+        leave.start_date, leave.end_date = datetime.date(2025, 5, 5), datetime.date(2025, 5, 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.save()
+
+        self.assertEqual(sum(LeaveAvailabilityService.get_heatmap(self.start, self.end)['total']), 0)
+
+
+class LeaveAvailabilityViewTestCase(TestCase):
+    """Test cases for the availability endpoint"""
+
+    url = '/api/leaves/leaves/availability/'
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.employee = create_employee('john', department='IT')
+        leave = Leave.objects.create(employee=self.employee, leave_type='Unpaid',
+                                     start_date=datetime.date(2025, 3, 10), end_date=datetime.date(2025, 3, 12))
+        Leave.objects.filter(pk=leave.pk).update(status='Approved')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_quarter(self):
+        """Test the daily counts of a quarter"""
+        response = self.client.get(self.url, {'start': '2025-01-01', 'end': '2025-03-31', 'department': 'IT'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 90)
+        self.assertEqual(response.data['departments']['IT'][68:72], [1, 1, 1, 0])
+
+    def test_window_is_validated(self):
+        """Test that missing, reversed and longer than a quarter windows are rejected"""
+        for params in ({'start': '2025-01-01'}, {'start': '2025-03-01', 'end': '2025-02-01'},
+                       {'start': '2025-01-01', 'end': '2025-06-30'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+    def test_admin_only(self):
+        """Test that employees cannot read the heatmap"""
+        self.client.force_authenticate(self.employee.user)
+
+        self.assertEqual(self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-31'}).status_code, 403)
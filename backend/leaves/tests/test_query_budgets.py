@@ -0,0 +1,150 @@
+"""
+Query budget tests for the leave endpoints
+"""
+from django.core.cache import cache
+from django.test import TestCase
+import datetime
+from leaves.constants import LEAVE_BALANCE_FIELDS, LEDGER_ADJUSTMENT
+from leaves.models import Leave, LeaveBalance, LeaveAccrual, LeaveAccrualRun
+from leaves.services import LeaveLedgerService
+from employees.tests.test_query_budgets import QueryBudgetMixin
+
+
+class LeaveAdminQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets of the leave endpoints used by admins"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.pending = Leave.objects.filter(employee=self.employee, status='Pending').first()
+
+    def test_leave_list(self):
+        self.assertConstantQueries(1, '/api/leaves/leaves/')
+
+    def test_leave_list_paginated(self):
+        self.assertConstantQueries(1, '/api/leaves/leaves/', {'page_size': 3})
+
+    def test_admin_leave_summary(self):
+        self.assertConstantQueries(1, '/api/leaves/employees/leave-summary/')
+
+    def test_leave_range(self):
+        self.assertConstantQueries(1, '/api/leaves/leaves/range/', {'start': '2025-01-01', 'end': '2025-12-31'})
+
+    def test_leave_availability(self):
+        # One query on a miss however many leaves there are, none on a hit
+        url, params = '/api/leaves/leaves/availability/', {'start': '2025-01-01', 'end': '2025-03-31'}
+        cache.clear()
+        before = self.assertQueryBudget(1, 'get', url, params)
+        self.seed(3)
+        cache.clear()
+        self.assertEqual(self.assertQueryBudget(1, 'get', url, params), before)
+        self.assertQueryBudget(0, 'get', url, params)
+
+    def test_leave_balance_list(self):
+        self.assertConstantQueries(1, '/api/leaves/leave-balances/')
+
+    def test_leave_balance_create(self):
+        # One more for the ledger's opening entries
+        self.assertQueryBudget(6, 'post', '/api/leaves/leave-balances/',
+                               {'employee': self.employee.id, 'annual_leave_balance': '20.00'}, status_code=201)
+
+    def test_leave_balance_detail(self):
+        balance = LeaveBalance.objects.get(employee=self.employee)
+        self.assertQueryBudget(2, 'get', f'/api/leaves/leave-balances/{balance.id}/')
+
+    def test_leave_balance_update(self):
+        balance = LeaveBalance.objects.get(employee=self.employee)
+        # The edit and its ledger entry share a transaction: a savepoint pair, the locked re-read and the entry
+        self.assertQueryBudget(7, 'patch', f'/api/leaves/leave-balances/{balance.id}/',
+                               {'sick_leave_balance': '10.00'})
+
+    def test_leave_balance_history(self):
+        url = f'/api/leaves/leave-balances/employee/{self.employee.id}/history/'
+        before = self.assertQueryBudget(3, 'get', url)
+        LeaveLedgerService.record_changes(
+            self.employee.id, dict.fromkeys(LEAVE_BALANCE_FIELDS, 0), dict.fromkeys(LEAVE_BALANCE_FIELDS, 1),
+            LEDGER_ADJUSTMENT, created_by=self.admin
+        )
+        self.assertEqual(self.assertQueryBudget(3, 'get', url), before)
+
+    def test_admin_leave_create(self):
+        # One more for the overlap check
+        self.assertQueryBudget(5, 'post', '/api/leaves/add-leaves/', {
+            'employee': self.employee.id, 'leave_type': 'Unpaid', 'start_date': '2025-05-01',
+            'end_date': '2025-05-02', 'days_taken': '2', 'reason': 'Travel',
+        }, status_code=201)
+
+    def test_approve_leave(self):
+        # The claim, the balance deduction, the overlap check and the ledger entry share a transaction
+        self.assertQueryBudget(9, 'put', f'/api/leaves/leaves/{self.pending.id}/approve/')
+
+    def test_reject_leave(self):
+        self.assertQueryBudget(4, 'put', f'/api/leaves/leaves/{self.pending.id}/reject/')
+
+    def test_admin_reject_leave(self):
+        self.assertQueryBudget(2, 'post', f'/api/leaves/admin/leave/{self.pending.id}/reject/')
+
+    def test_bulk_approve(self):
+        # The same queries for any number of leaves and employees
+        url = '/api/leaves/leaves/bulk-decision/'
+        pending = list(Leave.objects.filter(status='Pending').values_list('id', flat=True))
+        before = self.assertQueryBudget(8, 'post', url, {'ids': pending, 'decision': 'approve'})
+        self.seed(3)
+        pending = list(Leave.objects.filter(status='Pending').values_list('id', flat=True))
+        self.assertEqual(self.assertQueryBudget(8, 'post', url, {'ids': pending, 'decision': 'approve'}), before)
+
+    def test_manual_accrue(self):
+        LeaveAccrual.objects.update(last_accrued_date=datetime.date(2000, 1, 1))
+        before = self.assertQueryBudget(10, 'post', '/api/leaves/manual-accrue/')
+        self.seed(3)
+        LeaveAccrualRun.objects.all().delete()
+        LeaveAccrual.objects.update(last_accrued_date=datetime.date(2000, 1, 1))
+        self.assertEqual(self.assertQueryBudget(10, 'post', '/api/leaves/manual-accrue/'), before)
+
+
+class LeaveEmployeeQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets of the leave endpoints used by employees"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.client.force_authenticate(self.employee.user)
+        self.pending = Leave.objects.filter(employee=self.employee, status='Pending').first()
+
+    def test_own_leave_list(self):
+        before = self.assertQueryBudget(2, 'get', '/api/leaves/leaves/')
+        Leave.objects.create(employee=self.employee, leave_type='Sick',
+                             start_date=self.pending.start_date, end_date=self.pending.end_date)
+        self.assertEqual(self.assertQueryBudget(2, 'get', '/api/leaves/leaves/'), before)
+
+    def test_leave_create(self):
+        # One more for the overlap check
+        self.assertQueryBudget(4, 'post', '/api/leaves/leaves/', {
+            'leave_type': 'Annual', 'start_date': '2025-06-01', 'end_date': '2025-06-02',
+            'days_taken': '2', 'reason': 'Vacation',
+        }, status_code=201)
+
+    def test_leave_detail(self):
+        self.assertQueryBudget(2, 'get', f'/api/leaves/employee/leaves/{self.pending.id}')
+
+    def test_leave_update(self):
+        # One more for the overlap check
+        self.assertQueryBudget(4, 'patch', f'/api/leaves/employee/leaves/{self.pending.id}', {
+            'start_date': '2025-03-03', 'end_date': '2025-03-04', 'reason': 'Moved',
+        })
+
+    def test_leave_delete(self):
+        self.assertQueryBudget(3, 'delete', f'/api/leaves/employee/leaves/{self.pending.id}', status_code=204)
+
+    def test_employee_leave_requests(self):
+        self.assertQueryBudget(2, 'get', '/api/leaves/employee/leaves-requests/')
+
+    def test_employee_approved_leaves(self):
+        self.assertQueryBudget(2, 'get', '/api/leaves/employee/approve/leaves-requests/')
+
+    def test_employee_leave_balance(self):
+        self.assertQueryBudget(2, 'get', '/api/leaves/leaves/employee-leave-balance')
+
+    def test_accrue_leave(self):
+        self.assertQueryBudget(9, 'post', '/api/leaves/accrue-leave/')
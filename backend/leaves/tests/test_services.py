@@ -1,13 +1,25 @@
 """
 Tests for Leave services
 """
-from django.test import TestCase
+import threading
+import time
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, IntegrityError, OperationalError, transaction
+from unittest import skipUnless
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
 from employees.models import Employee
-from leaves.models import Leave, LeaveBalance, LeaveAccrual
-from leaves.services import LeaveService, LeaveAccrualService
+from django.db.models import QuerySet, Sum
+from leaves.models import Leave, LeaveBalance, LeaveAccrual, LeaveAccrualRun, LeaveLedgerEntry, LeaveBalanceSnapshot
+from leaves.constants import LEAVE_MAX_DAYS
+from leaves.services import LeaveService, LeaveAccrualService, LeaveLedgerService
+from leaves.tasks import accrue_monthly_leave
+from employees.tests.test_services import create_employee
+from unittest.mock import patch
+import datetime
 
 CustomUser = get_user_model()
 
@@ -52,7 +64,7 @@ class LeaveServiceTestCase(TestCase):
     
     def test_calculate_leave_days(self):
         """Test leave days calculation"""
-        start_date = timezone.now().date()
+        start_date = datetime.date(2025, 3, 3)  # Monday
         end_date = start_date + timezone.timedelta(days=2)
         
         days = LeaveService.calculate_leave_days(start_date, end_date)
@@ -292,3 +304,484 @@ class LeaveAccrualServiceTestCase(TestCase):
         # Check new balance record was created
         new_balance = LeaveBalance.objects.get(employee=self.employee)
         self.assertEqual(new_balance.annual_leave_balance, Decimal('2.5'))
+
+
+class LeaveAccrualRunTestCase(TestCase):
+    """Test cases for the set-based monthly accrual"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employees = [create_employee(username) for username in ('john', 'jane', 'jack')]
+        LeaveBalance.objects.update(annual_leave_balance=Decimal('10.00'))
+        LeaveAccrual.objects.update(leave_balance=Decimal('0.00'), last_accrued_date=datetime.date(2025, 2, 1))
+        self.accrual_date = datetime.date(2025, 3, 1)
+
+    def balances(self):
+        return list(LeaveBalance.objects.order_by('employee_id').values_list('annual_leave_balance', flat=True))
+
+    def test_accrue_month(self):
+        """Test that every employee gets the month's days and the run is recorded"""
+        run = LeaveAccrualService.accrue_month(self.accrual_date)
+
+        self.assertEqual((run.year, run.month, run.employees_accrued), (2025, 3, 3))
+        self.assertEqual(self.balances(), [Decimal('12.50')] * 3)
+        self.assertEqual(set(LeaveAccrual.objects.values_list('leave_balance', 'last_accrued_date')),
+                         {(Decimal('2.50'), self.accrual_date)})
+
+    def test_accrue_month_query_count(self):
+        """Test that the number of statements does not depend on the headcount"""
+        with self.assertNumQueries(10):
+            LeaveAccrualService.accrue_month(self.accrual_date)
+        create_employee('jill')
+        LeaveAccrual.objects.update(last_accrued_date=datetime.date(2025, 3, 1))
+        with self.assertNumQueries(10):
+            LeaveAccrualService.accrue_month(datetime.date(2025, 4, 1))
+
+    def test_month_is_accrued_once(self):
+        """Test that running the same month again changes nothing"""
+        LeaveAccrualService.accrue_month(self.accrual_date)
+
+        self.assertIsNone(LeaveAccrualService.accrue_month(self.accrual_date.replace(day=15)))
+        self.assertEqual(self.balances(), [Decimal('12.50')] * 3)
+        self.assertEqual(LeaveAccrualRun.objects.count(), 1)
+
+    def test_locked_month_is_skipped(self):
+        """Test that a second scheduler does nothing while the first holds the lock"""
+        cache.add('leave-accrual:2025:3', True)
+        try:
+            self.assertIsNone(LeaveAccrualService.accrue_month(self.accrual_date))
+        finally:
+            cache.delete('leave-accrual:2025:3')
+        self.assertEqual(self.balances(), [Decimal('10.00')] * 3)
+        self.assertFalse(LeaveAccrualRun.objects.exists())
+
+    def test_employee_accrued_this_month_is_skipped(self):
+        """Test that an employee who already accrued this month is not accrued again"""
+        LeaveAccrual.objects.filter(employee=self.employees[0]).update(last_accrued_date=datetime.date(2025, 3, 1))
+
+        run = LeaveAccrualService.accrue_month(self.accrual_date)
+
+        self.assertEqual(run.employees_accrued, 2)
+        self.assertEqual(self.balances(), [Decimal('10.00'), Decimal('12.50'), Decimal('12.50')])
+
+    def test_missing_rows_are_created(self):
+        """Test that employees without balance or accrual rows are accrued too"""
+        LeaveBalance.objects.filter(employee=self.employees[0]).delete()
+        LeaveAccrual.objects.filter(employee=self.employees[0]).delete()
+
+        run = LeaveAccrualService.accrue_month(self.accrual_date)
+
+        self.assertEqual(run.employees_accrued, 3)
+        self.assertEqual(LeaveBalance.objects.get(employee=self.employees[0]).annual_leave_balance, Decimal('2.50'))
+        self.assertEqual(LeaveAccrual.objects.get(employee=self.employees[0]).leave_balance, Decimal('2.50'))
+
+    def test_task_runs_twice(self):
+        """Test that two scheduled runs on the 1st accrue once"""
+        with patch('leaves.tasks.timezone.now', return_value=timezone.make_aware(datetime.datetime(2025, 3, 1, 0, 5))):
+            self.assertEqual(accrue_monthly_leave.apply().result, 3)
+            self.assertIsNone(accrue_monthly_leave.apply().result)
+        self.assertEqual(self.balances(), [Decimal('12.50')] * 3)
+
+
+class LeaveApprovalBalanceTestCase(TestCase):
+    """Test cases for the conditional balance deduction on approval"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee('john')
+        self.approver = CustomUser.objects.create_user(username='manager', password='testpass123')
+        LeaveBalance.objects.filter(employee=self.employee).update(annual_leave_balance=Decimal('5.00'))
+
+    def create_leave(self, days):
+        start = datetime.date(2025, 3, 3)  # Monday
+        return Leave.objects.create(employee=self.employee, leave_type='Annual', start_date=start,
+                                    end_date=start + datetime.timedelta(days=days - 1))
+
+    def balance(self):
+        return LeaveBalance.objects.get(employee=self.employee).annual_leave_balance
+
+    def test_deduct_balance(self):
+        """Test that a deduction only applies while the balance covers it"""
+        self.assertTrue(LeaveService.deduct_balance(self.employee.id, 'annual_leave_balance', Decimal('5')))
+        self.assertFalse(LeaveService.deduct_balance(self.employee.id, 'annual_leave_balance', Decimal('1')))
+        self.assertEqual(self.balance(), Decimal('0.00'))
+
+    def test_stale_balance_is_not_overwritten(self):
+        """Test that an approval deducts from the stored balance, not from an earlier read"""
+        leave = self.create_leave(2)
+        LeaveBalance.objects.filter(employee=self.employee).update(annual_leave_balance=Decimal('3.00'))
+
+        self.assertTrue(LeaveService.approve_leave(leave, self.approver))
+        self.assertEqual(self.balance(), Decimal('1.00'))
+
+    def test_leave_is_approved_once(self):
+        """Test that approving an approved leave again does not deduct twice"""
+        leave = self.create_leave(2)
+        stale_copy = Leave.objects.get(pk=leave.pk)
+
+        self.assertTrue(LeaveService.approve_leave(leave, self.approver))
+        self.assertFalse(LeaveService.approve_leave(stale_copy, self.approver))
+
+        self.assertEqual(stale_copy.status, 'Approved')
+        self.assertEqual(self.balance(), Decimal('3.00'))
+
+    def test_failed_deduction_keeps_leave_unapproved(self):
+        """Test that a leave the balance no longer covers is rejected and not stored as approved"""
+        leave = self.create_leave(4)
+        LeaveBalance.objects.filter(employee=self.employee).update(annual_leave_balance=Decimal('3.00'))
+
+        self.assertFalse(LeaveService.approve_leave(leave, self.approver))
+
+        self.assertEqual(leave.remarks, 'Not enough leave balance')
+        self.assertEqual(Leave.objects.get(pk=leave.pk).status, 'Pending')
+        self.assertEqual(self.balance(), Decimal('3.00'))
+
+    def test_unpaid_approval_locks_the_balance(self):
+        """Test that an unpaid leave, which deducts nothing, still takes the employee's balance row lock"""
+        start = datetime.date(2025, 3, 3)
+        leave = Leave.objects.create(employee=self.employee, leave_type='Unpaid', start_date=start, end_date=start)
+        select_for_update = QuerySet.select_for_update
+
+        with patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=select_for_update) as lock:
+            self.assertTrue(LeaveService.approve_leave(leave, self.approver))
+
+        self.assertIn(LeaveBalance, [call.args[0].model for call in lock.call_args_list])
+
+
+class LeaveApprovalConcurrencyTestCase(TransactionTestCase):
+    """Stress test approving leaves of one employee from many threads at once"""
+
+    THREADS = 12
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee('john')
+        self.approver = CustomUser.objects.create_user(username='manager', password='testpass123')
+        LeaveBalance.objects.filter(employee=self.employee).update(annual_leave_balance=Decimal('10.00'))
+        start = datetime.date(2025, 3, 3)  # Monday
+        self.leaves = [
+            Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                 start_date=start + datetime.timedelta(days=index * 7),
+                                 end_date=start + datetime.timedelta(days=index * 7 + 1))
+            for index in range(self.THREADS)
+        ]
+
+    def approve(self, leave):
+        while True:
+            try:
+                return LeaveService.approve_leave(Leave.objects.get(pk=leave.pk), self.approver)
+            except OperationalError as e:
+                # SQLite's shared in-memory test database fails fast on a locked table
+                # where MySQL and PostgreSQL wait for the row lock; retry like they would
+                if connection.vendor != 'sqlite' or 'locked' not in str(e):
+                    raise
+                time.sleep(0.001)
+
+    def approve_concurrently(self, leaves):
+        barrier = threading.Barrier(len(leaves))
+        results, errors = [], []
+
+        def approve(leave):
+            try:
+                barrier.wait()
+                results.append(self.approve(leave))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=approve, args=(leave,)) for leave in leaves]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_no_lost_updates(self):
+        """Test that concurrent approvals deduct exactly what was approved and never overdraw"""
+        results = self.approve_concurrently(self.leaves)
+
+        approved = Leave.objects.filter(employee=self.employee, status='Approved').count()
+        balance = LeaveBalance.objects.get(employee=self.employee).annual_leave_balance
+        self.assertEqual(results.count(True), approved)
+        self.assertEqual(approved, 5)
+        self.assertEqual(balance, Decimal('10.00') - 2 * approved)
+
+    def test_same_leave_is_deducted_once(self):
+        """Test that many approvers clicking the same leave deduct it once"""
+        results = self.approve_concurrently([self.leaves[0]] * self.THREADS)
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(LeaveBalance.objects.get(employee=self.employee).annual_leave_balance, Decimal('8.00'))
+
+    def test_overlapping_unpaid_leaves_approve_once(self):
+        """Test that unpaid leaves over the same days, approved at once, end with one of them approved"""
+        start = datetime.date(2025, 6, 2)
+        unpaid = Leave.objects.bulk_create([
+            Leave(employee=self.employee, leave_type='Unpaid', start_date=start,
+                  end_date=start + datetime.timedelta(days=1), days_taken=2)
+            for _ in range(self.THREADS)
+        ])
+
+        results = self.approve_concurrently(unpaid)
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Leave.objects.filter(leave_type='Unpaid', status='Approved').count(), 1)
+
+
+class LeaveLedgerTestCase(TestCase):
+    """Test cases for LeaveLedgerService"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee('john')
+        self.approver = CustomUser.objects.create_user(username='manager', password='testpass123', is_staff=True)
+        LeaveAccrual.objects.update(last_accrued_date=datetime.date(2025, 2, 1))
+
+    def at(self, *args):
+        return timezone.make_aware(datetime.datetime(*args))
+
+    def assertLedgerMatchesBalances(self):
+        totals = {
+            (employee_id, field): total
+            for employee_id, field, total in LeaveLedgerEntry.objects.values_list('employee_id', 'balance_field')
+            .annotate(total=Sum('delta')).order_by()
+        }
+        for leave_balance in LeaveBalance.objects.all():
+            for field, value in LeaveLedgerService.get_balances(leave_balance).items():
+                self.assertEqual(totals.get((leave_balance.employee_id, field), 0), value, field)
+
+    def test_ledger_sums_to_the_balances(self):
+        """Test that every way a balance moves is recorded"""
+        create_employee('jane')
+        LeaveAccrualService.accrue_month(datetime.date(2025, 3, 1))
+        leave = Leave.objects.create(employee=self.employee, leave_type='Annual', start_date=datetime.date(2025, 3, 3),
+                                     end_date=datetime.date(2025, 3, 4))
+        LeaveService.approve_leave(leave, self.approver)
+        Leave(employee=self.employee, leave_type='Emergency Leave', start_date=datetime.date(2025, 3, 10),
+              end_date=datetime.date(2025, 3, 10)).save(requested_by=self.approver)
+        LeaveAccrualService.reset_sick_leave()
+
+        self.assertLedgerMatchesBalances()
+        self.assertEqual(
+            set(LeaveLedgerEntry.objects.filter(employee=self.employee).values_list('kind', flat=True)),
+            {'opening', 'accrual', 'leave', 'sick_reset'}
+        )
+
+    def test_approval_is_recorded(self):
+        """Test that an approved leave is recorded against the leave and its approver"""
+        leave = Leave.objects.create(employee=self.employee, leave_type='Annual', start_date=datetime.date(2025, 3, 3),
+                                     end_date=datetime.date(2025, 3, 4))
+        LeaveService.approve_leave(leave, self.approver)
+
+        entry = LeaveLedgerEntry.objects.get(kind='leave')
+        self.assertEqual((entry.leave, entry.created_by, entry.delta), (leave, self.approver, Decimal('-2.00')))
+
+    def test_entries_are_append_only(self):
+        """Test that a recorded entry cannot be changed"""
+        entry = LeaveLedgerEntry.objects.filter(employee=self.employee).first()
+        entry.delta = Decimal('99')
+
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_sick_leave_reset(self):
+        """Test that the reset records each employee's difference to 14 days"""
+        LeaveBalance.objects.filter(employee=self.employee).update(sick_leave_balance=Decimal('3.50'))
+
+        self.assertEqual(LeaveAccrualService.reset_sick_leave(), 1)
+
+        self.assertEqual(LeaveBalance.objects.get(employee=self.employee).sick_leave_balance, Decimal('14.00'))
+        self.assertEqual(LeaveLedgerEntry.objects.get(kind='sick_reset').delta, Decimal('10.50'))
+        self.assertEqual(LeaveAccrualService.reset_sick_leave(), 0)
+
+    def test_balance_at_reads_a_snapshot_and_the_entries_since(self):
+        """Test that a past balance is the month's snapshot plus the few entries after it"""
+        LeaveLedgerEntry.objects.all().delete()
+        for delta, kind, created_at in ((Decimal('10'), 'opening', self.at(2025, 1, 10)),
+                                        (Decimal('2.5'), 'accrual', self.at(2025, 2, 1, 5)),
+                                        (Decimal('-3'), 'leave', self.at(2025, 2, 15)),
+                                        (Decimal('1'), 'adjustment', self.at(2025, 3, 5))):
+            LeaveLedgerEntry.objects.create(employee=self.employee, balance_field='annual_leave_balance',
+                                            delta=delta, kind=kind, created_at=created_at)
+        self.assertEqual(LeaveLedgerService.take_snapshot(datetime.date(2025, 2, 1)), 1)
+        # The next snapshot builds on this one rather than replaying the history before it
+        LeaveLedgerEntry.objects.filter(created_at__lt=self.at(2025, 2, 1)).delete()
+        self.assertEqual(LeaveLedgerService.take_snapshot(datetime.date(2025, 3, 20)), 1)
+        self.assertEqual(LeaveLedgerService.take_snapshot(datetime.date(2025, 3, 1)), 0)
+
+        with self.assertNumQueries(2):
+            balances, snapshot, entries = LeaveLedgerService.get_balances_at(self.employee.id, self.at(2025, 3, 10))
+        self.assertEqual(balances['annual_leave_balance'], Decimal('10.50'))
+        self.assertEqual((snapshot.as_of, len(entries)), (self.at(2025, 3, 1), 1))
+
+        balances, snapshot, entries = LeaveLedgerService.get_balances_at(self.employee.id, self.at(2025, 2, 20))
+        self.assertEqual(balances['annual_leave_balance'], Decimal('9.50'))
+        self.assertEqual([entry.kind for entry in entries], ['accrual', 'leave'])
+
+        balances, snapshot, entries = LeaveLedgerService.get_balances_at(self.employee.id, self.at(2025, 1, 1))
+        self.assertIsNone(snapshot)
+        self.assertEqual(balances['annual_leave_balance'], 0)
+
+    def test_task_takes_the_snapshot(self):
+        """Test that the monthly task snapshots the month before accruing it"""
+        LeaveLedgerEntry.objects.update(created_at=self.at(2025, 1, 1))
+        with patch('leaves.tasks.timezone.now', return_value=timezone.make_aware(datetime.datetime(2025, 3, 1, 0, 5))):
+            accrue_monthly_leave.apply()
+
+        snapshot = LeaveBalanceSnapshot.objects.get()
+        self.assertEqual((snapshot.employee, snapshot.as_of), (self.employee, self.at(2025, 3, 1)))
+        leave_balance = LeaveBalance.objects.get(employee=self.employee)
+        # Taken before the accrual it precedes
+        self.assertEqual(snapshot.annual_leave_balance, leave_balance.annual_leave_balance - Decimal('2.5'))
+        self.assertEqual(snapshot.sick_leave_balance, leave_balance.sick_leave_balance)
+
+
+class LeaveOverlapTestCase(TestCase):
+    """Test cases for overlap detection and date-range lookups"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.employee = create_employee('john')
+        self.approver = CustomUser.objects.create_user(username='manager', password='testpass123')
+        self.leave = Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                          start_date=datetime.date(2025, 3, 10), end_date=datetime.date(2025, 3, 14))
+
+    def overlapping(self, start_day, end_day, **kwargs):
+        return list(LeaveService.get_overlapping_leaves(
+            self.employee.id, datetime.date(2025, 3, start_day), datetime.date(2025, 3, end_day), **kwargs
+        ))
+
+    def test_overlapping_leaves(self):
+        """Test inclusive overlaps, adjacent days, rejected leaves and leaving the leave itself out"""
+        self.assertEqual(self.overlapping(14, 20), [self.leave])
+        self.assertEqual(self.overlapping(1, 10), [self.leave])
+        self.assertEqual(self.overlapping(11, 12), [self.leave])
+        self.assertEqual(self.overlapping(15, 20), [])
+        self.assertEqual(self.overlapping(10, 14, exclude_pk=self.leave.pk), [])
+        Leave.objects.filter(pk=self.leave.pk).update(status='Rejected')
+        self.assertEqual(self.overlapping(10, 14), [])
+
+    def test_leaves_between(self):
+        """Test that a long leave that started well before the range is still found"""
+        other = create_employee('jane')
+        long_leave = Leave.objects.create(employee=other, leave_type='Maternity',
+                                          start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2025, 3, 31))
+        Leave.objects.create(employee=other, leave_type='Sick',
+                             start_date=datetime.date(2025, 4, 1), end_date=datetime.date(2025, 4, 1))
+
+        leaves = LeaveService.get_leaves_between(datetime.date(2025, 3, 12), datetime.date(2025, 3, 20))
+
+        self.assertEqual(set(leaves), {self.leave, long_leave})
+
+    def test_longest_leave_is_enforced(self):
+        """Test that the database refuses a leave longer than LEAVE_MAX_DAYS, which the range lookup relies on"""
+        start = datetime.date(2024, 1, 1)
+        longest = Leave.objects.create(employee=self.employee, leave_type='Unpaid', start_date=start,
+                                       end_date=start + datetime.timedelta(days=LEAVE_MAX_DAYS - 1))
+        self.assertIn(longest, LeaveService.get_leaves_between(longest.end_date, longest.end_date))
+
+        too_long = Leave(employee=self.employee, leave_type='Unpaid', start_date=start,
+                         end_date=start + datetime.timedelta(days=LEAVE_MAX_DAYS))
+        with self.assertRaises(ValidationError):
+            too_long.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Leave.objects.filter(pk=longest.pk).update(end_date=too_long.end_date)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Leave.objects.filter(pk=longest.pk).update(end_date=start - datetime.timedelta(days=1))
+
+    def test_approval_rejects_overlap_with_an_approved_leave(self):
+        """Test that approving a leave overlapping an approved one is rejected and deducts nothing"""
+        overlapping = Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                           start_date=datetime.date(2025, 3, 8), end_date=datetime.date(2025, 3, 10))
+        balance = LeaveBalance.objects.get(employee=self.employee).annual_leave_balance
+        self.assertTrue(LeaveService.approve_leave(self.leave, self.approver))
+
+        self.assertFalse(LeaveService.approve_leave(overlapping, self.approver))
+
+        self.assertEqual(overlapping.remarks, 'Overlaps an approved leave')
+        self.assertEqual(Leave.objects.get(pk=overlapping.pk).status, 'Pending')
+        self.assertEqual(LeaveBalance.objects.get(employee=self.employee).annual_leave_balance, balance - 5)
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_lookups_use_the_period_indexes(self):
+        """Test that the overlap check and the range lookup are index searches, not table scans"""
+        start, end = datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)
+
+        self.assertIn('leave_employee_period_idx',
+                      LeaveService.get_overlapping_leaves(self.employee.id, start, end).explain())
+        self.assertIn('leave_period_idx', LeaveService.get_leaves_between(start, end).explain())
+
+
+class LeaveBulkDecisionTestCase(TestCase):
+    """Test cases for LeaveService.decide_leaves"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.approver = CustomUser.objects.create_user(username='manager', password='testpass123', is_staff=True)
+        self.john = create_employee('john')
+        self.jane = create_employee('jane')
+        LeaveBalance.objects.update(annual_leave_balance=Decimal('3.00'), sick_leave_balance=Decimal('10.00'))
+
+    def add_leave(self, employee, leave_type, start_day, end_day):
+        return Leave.objects.create(employee=employee, leave_type=leave_type,
+                                    start_date=datetime.date(2025, 3, start_day), end_date=datetime.date(2025, 3, end_day))
+
+    def outcomes(self, leaves, decision='approve'):
+        results = LeaveService.decide_leaves([leave.pk for leave in leaves], decision, self.approver)
+        return [result['outcome'] for result in results]
+
+    def balance(self, employee, field='annual_leave_balance'):
+        return getattr(LeaveBalance.objects.get(employee=employee), field)
+
+    def test_approvals_are_grouped_per_employee(self):
+        """Test that each employee's approved days come off their balances, with one ledger entry per leave"""
+        leaves = [self.add_leave(self.john, 'Annual', 3, 4), self.add_leave(self.john, 'Sick', 10, 12),
+                  self.add_leave(self.jane, 'Annual', 3, 3), self.add_leave(self.jane, 'Unpaid', 17, 21)]
+
+        self.assertEqual(self.outcomes(leaves), ['approved'] * 4)
+
+        self.assertEqual(self.balance(self.john), Decimal('1.00'))
+        self.assertEqual(self.balance(self.john, 'sick_leave_balance'), Decimal('7.00'))
+        self.assertEqual(self.balance(self.jane), Decimal('2.00'))
+        self.assertEqual(Leave.objects.filter(status='Approved', approved_by=self.approver).count(), 4)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(kind='leave').count(), 3)
+
+    def test_insufficient_balance_leaves_the_leave_pending(self):
+        """Test that leaves are granted in date order until the balance runs out"""
+        later = self.add_leave(self.john, 'Annual', 10, 11)
+        earlier = self.add_leave(self.john, 'Annual', 3, 4)
+
+        self.assertEqual(self.outcomes([later, earlier]), ['insufficient_balance', 'approved'])
+
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'Pending')
+        self.assertEqual(self.balance(self.john), Decimal('1.00'))
+
+    def test_unknown_decided_and_overlapping_leaves(self):
+        """Test the outcomes of missing, already decided and overlapping leaves"""
+        decided = self.add_leave(self.john, 'Annual', 3, 3)
+        Leave.objects.filter(pk=decided.pk).update(status='Approved')
+        overlapping = self.add_leave(self.john, 'Sick', 3, 4)
+        missing = Leave(pk=999999)
+
+        self.assertEqual(self.outcomes([missing, decided, overlapping]),
+                         ['not_found', 'not_pending', 'overlaps_approved_leave'])
+        self.assertEqual(self.balance(self.john, 'sick_leave_balance'), Decimal('10.00'))
+
+    def test_missing_balance(self):
+        """Test that an employee without a LeaveBalance is reported, not approved"""
+        leave = self.add_leave(self.jane, 'Annual', 3, 3)
+        LeaveBalance.objects.filter(employee=self.jane).delete()
+
+        self.assertEqual(self.outcomes([leave]), ['no_balance'])
+
+    def test_reject(self):
+        """Test that rejecting leaves the balances alone"""
+        leaves = [self.add_leave(self.john, 'Annual', 3, 4), self.add_leave(self.jane, 'Sick', 3, 3)]
+
+        self.assertEqual(self.outcomes(leaves + leaves, decision='reject'), ['rejected'] * 2)
+
+        self.assertEqual(Leave.objects.filter(status='Rejected').count(), 2)
+        self.assertEqual(self.balance(self.john), Decimal('3.00'))
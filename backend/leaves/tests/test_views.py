@@ -0,0 +1,351 @@
+"""
+Tests for Leave views
+"""
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from unittest import skipUnless
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+import datetime
+from decimal import Decimal
+from leaves.models import Leave, LeaveBalance, LeaveLedgerEntry
+from leaves.views import leave_queryset, LeaveBalanceUpdateAPIView
+from leaves.constants import LEAVE_LIST_ORDERING
+from employees.tests.test_services import create_employee
+
+CustomUser = get_user_model()
+
+
+class LeaveListPaginationTestCase(TestCase):
+    """Test cases for keyset pagination on the leave list"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john')
+        for day in range(1, 6):
+            leave = Leave.objects.create(
+                employee=self.employee, leave_type='Annual',
+                start_date=datetime.date(2025, 3, day), end_date=datetime.date(2025, 3, day)
+            )
+            if day % 2:
+                Leave.objects.filter(pk=leave.pk).update(status='Rejected')
+
+    def test_leave_list_pages_pending_first(self):
+        """Test that pages keep the pending-first ordering across cursors"""
+        statuses = []
+        response = self.client.get('/api/leaves/leaves/', {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            statuses.extend(row['status'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(statuses, ['Pending'] * 2 + ['Rejected'] * 3)
+
+    def test_leave_list_without_page_size_returns_full_list(self):
+        """Test that the list stays a plain list when no page is requested"""
+        response = self.client.get('/api/leaves/leaves/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+
+
+class LeaveQueueTestCase(TestCase):
+    """Test cases for the persisted status rank and the leave list filters"""
+
+    url = '/api/leaves/leaves/'
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john')
+        self.other = create_employee('jane')
+        self.annual = Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                           start_date=datetime.date(2025, 3, 3), end_date=datetime.date(2025, 3, 5))
+        self.sick = Leave.objects.create(employee=self.employee, leave_type='Sick',
+                                         start_date=datetime.date(2025, 4, 7), end_date=datetime.date(2025, 4, 7))
+        self.other_leave = Leave.objects.create(employee=self.other, leave_type='Annual',
+                                                start_date=datetime.date(2025, 3, 10), end_date=datetime.date(2025, 3, 11))
+
+    def get_ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {row['id'] for row in response.data}
+
+    def test_status_rank_follows_status_updates(self):
+        """Test that the rank is kept by the database, also through queryset updates"""
+        Leave.objects.filter(pk=self.annual.pk).update(status='Rejected')
+        Leave.objects.filter(pk=self.sick.pk).update(status='Approved')
+
+        ranks = dict(Leave.objects.values_list('id', 'status_rank'))
+
+        self.assertEqual(ranks, {self.annual.id: 2, self.sick.id: 1, self.other_leave.id: 0})
+        self.assertEqual([row['id'] for row in self.client.get(self.url).data],
+                         [self.other_leave.id, self.sick.id, self.annual.id])
+
+    def test_filters(self):
+        """Test the status, type, employee and date range filters"""
+        Leave.objects.filter(pk=self.sick.pk).update(status='Approved')
+
+        self.assertEqual(self.get_ids({'status': 'Approved'}), {self.sick.id})
+        self.assertEqual(self.get_ids({'leave_type': 'Annual'}), {self.annual.id, self.other_leave.id})
+        self.assertEqual(self.get_ids({'employee': self.other.id}), {self.other_leave.id})
+        self.assertEqual(self.get_ids({'start': '2025-03-05', 'end': '2025-03-10'}), {self.annual.id, self.other_leave.id})
+        self.assertEqual(self.get_ids({'start': '2025-04-01', 'leave_type': 'Sick'}), {self.sick.id})
+
+    def test_invalid_filter_is_rejected(self):
+        """Test that an unknown status is a bad request rather than an empty list"""
+        self.assertEqual(self.client.get(self.url, {'status': 'Lost'}).status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_queue_is_read_from_the_index(self):
+        """Test that the pending-first ordering is served by leave_queue_idx instead of a sort"""
+        plan = leave_queryset().order_by(*LEAVE_LIST_ORDERING).explain()
+
+        self.assertIn('leave_queue_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class LeaveBulkDecisionViewTestCase(TestCase):
+    """Test cases for the bulk approve and reject endpoint"""
+
+    url = '/api/leaves/leaves/bulk-decision/'
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john')
+        LeaveBalance.objects.filter(employee=self.employee).update(annual_leave_balance=Decimal('2.00'))
+        self.leaves = [
+            Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                 start_date=datetime.date(2025, 3, day), end_date=datetime.date(2025, 3, day + 1))
+            for day in (3, 10)
+        ]
+
+    def test_outcomes_per_leave(self):
+        """Test that each leave gets its own outcome and the summary counts them"""
+        response = self.client.post(self.url, {'ids': [leave.id for leave in self.leaves], 'decision': 'approve'},
+                                    format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.leaves[0].id, 'outcome': 'approved'},
+            {'id': self.leaves[1].id, 'outcome': 'insufficient_balance'},
+        ])
+        self.assertEqual(response.data['summary'], {'approved': 1, 'insufficient_balance': 1})
+
+    def test_request_is_validated(self):
+        """Test that an empty id list or an unknown decision is a bad request"""
+        self.assertEqual(self.client.post(self.url, {'ids': [], 'decision': 'approve'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'ids': [self.leaves[0].id], 'decision': 'defer'},
+                                          format='json').status_code, 400)
+
+    def test_admin_only(self):
+        """Test that employees cannot decide leaves"""
+        self.client.force_authenticate(self.employee.user)
+
+        response = self.client.post(self.url, {'ids': [self.leaves[0].id], 'decision': 'approve'}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Leave.objects.get(pk=self.leaves[0].pk).status, 'Pending')
+
+
+class LeaveRepresentationTestCase(TestCase):
+    """Test cases for the compact leave representation"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True, first_name='Ada', last_name='Admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john')
+        leave = Leave.objects.create(employee=self.employee, leave_type='Unpaid',
+                                     start_date=datetime.date(2025, 3, 3), end_date=datetime.date(2025, 3, 3))
+        Leave.objects.filter(pk=leave.pk).update(status='Approved', approved_by=self.admin)
+
+    def test_approver_is_name_and_id_only(self):
+        """Test that a listed leave carries the approver's id and name, not their user record"""
+        response = self.client.get('/api/leaves/leaves/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['approved_by'], {'id': self.admin.id, 'first_name': 'Ada', 'last_name': 'Admin'})
+        self.assertNotIn('user', response.data[0])
+
+    def test_benchmark_command(self):
+        """Test that the benchmark reports the compact list as smaller"""
+        out = StringIO()
+        call_command('benchmark_leave_payload', count=20, stdout=out)
+
+        self.assertIn('Compact list of 20 leaves is', out.getvalue())
+
+
+class LeaveBalanceLedgerViewTestCase(TestCase):
+    """Test cases for the leave ledger through the balance endpoints"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.employee = create_employee('john')
+        self.balance = LeaveBalance.objects.get(employee=self.employee)
+
+    def test_manual_edit_is_recorded(self):
+        """Test that an admin edit records the change and who made it"""
+        previous = self.balance.sick_leave_balance
+        response = self.client.patch(f'/api/leaves/leave-balances/{self.balance.id}/', {'sick_leave_balance': '20.00'})
+
+        self.assertEqual(response.status_code, 200)
+        entry = LeaveLedgerEntry.objects.get(kind='adjustment')
+        self.assertEqual((entry.balance_field, entry.delta, entry.created_by),
+                         ('sick_leave_balance', Decimal('20.00') - previous, self.admin))
+
+    def test_edit_diffs_against_the_current_row(self):
+        """Test that a change made after the view loaded the balance is not lost from the ledger"""
+        stale = LeaveBalance.objects.get(pk=self.balance.pk)
+        LeaveBalance.objects.filter(pk=self.balance.pk).update(sick_leave_balance=Decimal('3.00'))
+
+        with mock.patch.object(LeaveBalanceUpdateAPIView, 'get_object', return_value=stale):
+            self.client.patch(f'/api/leaves/leave-balances/{self.balance.id}/', {'sick_leave_balance': '20.00'})
+
+        entry = LeaveLedgerEntry.objects.get(kind='adjustment')
+        self.assertEqual(entry.delta, Decimal('17.00'))
+
+    def test_history(self):
+        """Test that the history explains today's balance"""
+        self.client.patch(f'/api/leaves/leave-balances/{self.balance.id}/', {'annual_leave_balance': '12.50'})
+
+        response = self.client.get(f'/api/leaves/leave-balances/employee/{self.employee.id}/history/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balances']['annual_leave_balance'], Decimal('12.50'))
+        self.assertIsNone(response.data['snapshot_as_of'])
+        self.assertEqual(response.data['entries'][-1]['kind'], 'adjustment')
+
+    def test_history_before_the_ledger(self):
+        """Test a date before any movement and an invalid date"""
+        url = f'/api/leaves/leave-balances/employee/{self.employee.id}/history/'
+
+        response = self.client.get(url, {'as_of': '2000-01-01'})
+        self.assertEqual(response.data['entries'], [])
+        self.assertEqual(self.client.get(url, {'as_of': 'yesterday'}).status_code, 400)
+
+    def test_admin_site_is_read_only(self):
+        """Test that balances, ledger entries and snapshots cannot be written from the Django admin"""
+        self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+
+        response = self.client.post(f'/admin/leaves/leavebalance/{self.balance.id}/change/',
+                                    {'employee': self.employee.id, 'annual_leave_balance': '99.00'})
+        self.assertEqual(response.status_code, 403)
+        self.balance.refresh_from_db()
+        self.assertNotEqual(self.balance.annual_leave_balance, Decimal('99.00'))
+        entry = LeaveLedgerEntry.objects.filter(employee=self.employee).first()
+        for model, pk in (('leavebalance', self.balance.id), ('leaveledgerentry', entry.id)):
+            self.assertEqual(self.client.get(f'/admin/leaves/{model}/add/').status_code, 403)
+            self.assertEqual(self.client.post(f'/admin/leaves/{model}/{pk}/delete/', {'post': 'yes'}).status_code, 403)
+        self.assertEqual(self.client.get('/admin/leaves/leavebalancesnapshot/add/').status_code, 403)
+        self.assertEqual(self.client.get(f'/admin/leaves/leavebalance/{self.balance.id}/change/').status_code, 200)
+
+
+class LeaveOverlapViewTestCase(TestCase):
+    """Test cases for overlap rejection and the date-range endpoint"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123',
+            user_type='Admin', is_staff=True
+        )
+        self.client = APIClient()
+        self.employee = create_employee('john', department='IT')
+        self.other = create_employee('jane', department='HR')
+        self.leave = Leave.objects.create(employee=self.employee, leave_type='Annual',
+                                          start_date=datetime.date(2025, 3, 10), end_date=datetime.date(2025, 3, 14))
+        self.other_leave = Leave.objects.create(employee=self.other, leave_type='Sick',
+                                                start_date=datetime.date(2025, 3, 1), end_date=datetime.date(2025, 3, 3))
+
+    def test_overlapping_leave_is_rejected_at_creation(self):
+        """Test that an employee cannot file a leave overlapping their own"""
+        self.client.force_authenticate(self.employee.user)
+        data = {'leave_type': 'Sick', 'start_date': '2025-03-14', 'end_date': '2025-03-15', 'days_taken': '2',
+                'reason': 'Flu'}
+
+        response = self.client.post('/api/leaves/leaves/', data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Overlaps the pending Annual leave', str(response.data))
+        data.update(start_date='2025-03-01', end_date='2025-03-03')
+        self.assertEqual(self.client.post('/api/leaves/leaves/', data).status_code, 201)
+
+    def test_overlapping_edit_is_rejected(self):
+        """Test that moving a leave onto another one is rejected, and editing it in place is not"""
+        self.client.force_authenticate(self.employee.user)
+        later = Leave.objects.create(employee=self.employee, leave_type='Sick',
+                                     start_date=datetime.date(2025, 3, 20), end_date=datetime.date(2025, 3, 20))
+        url = f'/api/leaves/employee/leaves/{later.id}'
+
+        self.assertEqual(self.client.patch(url, {'start_date': '2025-03-12', 'end_date': '2025-03-20'}).status_code, 400)
+        self.assertEqual(self.client.patch(url, {'reason': 'Checkup'}).status_code, 200)
+
+    def test_admin_creation_is_checked(self):
+        """Test that admins cannot add an overlapping leave for an employee either"""
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.post('/api/leaves/add-leaves/', {
+            'employee': self.employee.id, 'leave_type': 'Unpaid', 'start_date': '2025-03-09',
+            'end_date': '2025-03-10', 'days_taken': '2',
+        })
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_leave_range(self):
+        """Test who is off between two dates, with filters"""
+        self.client.force_authenticate(self.admin)
+        url = '/api/leaves/leaves/range/'
+
+        response = self.client.get(url, {'start': '2025-03-03', 'end': '2025-03-10'})
+        self.assertEqual([row['id'] for row in response.data], [self.other_leave.id, self.leave.id])
+        response = self.client.get(url, {'start': '2025-03-03', 'end': '2025-03-10', 'department': 'IT'})
+        self.assertEqual([row['id'] for row in response.data], [self.leave.id])
+        response = self.client.get(url, {'start': '2025-03-04', 'end': '2025-03-09'})
+        self.assertEqual(response.data, [])
+
+    def test_leave_range_validation(self):
+        """Test that the range needs two ordered dates and is for admins"""
+        self.client.force_authenticate(self.admin)
+        url = '/api/leaves/leaves/range/'
+
+        self.assertEqual(self.client.get(url, {'start': '2025-03-03'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2025-03-10', 'end': '2025-03-03'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2025-03-03', 'end': '2025-03-10',
+                                               'employee': 'x'}).status_code, 400)
+        self.client.force_authenticate(self.employee.user)
+        self.assertEqual(self.client.get(url, {'start': '2025-03-03', 'end': '2025-03-10'}).status_code, 403)
@@ -0,0 +1,99 @@
+"""
+Tests for the working-day calendar
+"""
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from employees.tests.test_services import create_employee
+from leaves.models import Leave, PublicHoliday
+from leaves.working_days import working_calendar
+
+CustomUser = get_user_model()
+
+
+class WorkingCalendarTestCase(TestCase):
+    """Test cases for WorkingCalendar"""
+
+    def setUp(self):
+        """Set up test data"""
+        working_calendar.clear()
+        self.addCleanup(working_calendar.clear)
+
+    def test_weekends_are_skipped(self):
+        """Test that Saturday and Sunday are not working days by default"""
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2025, 3, 3), datetime.date(2025, 3, 9)), 5)
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2025, 3, 8), datetime.date(2025, 3, 9)), 0)
+        self.assertFalse(working_calendar.is_working_day(datetime.date(2025, 3, 8)))
+        self.assertTrue(working_calendar.is_working_day(datetime.date(2025, 3, 10)))
+
+    def test_holidays_are_skipped(self):
+        """Test that a new holiday is counted at once"""
+        working_calendar.working_days_between(datetime.date(2025, 3, 3), datetime.date(2025, 3, 7))
+        PublicHoliday.objects.create(date=datetime.date(2025, 3, 31), name='Eid al-Fitr')
+
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2025, 3, 31), datetime.date(2025, 4, 4)), 4)
+        self.assertFalse(working_calendar.is_working_day(datetime.date(2025, 3, 31)))
+
+    def test_range_across_years(self):
+        """Test a range spanning a new year and a whole leap year"""
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2023, 12, 29), datetime.date(2024, 1, 2)), 3)
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)), 262)
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2023, 12, 29), datetime.date(2025, 1, 1)),
+                         1 + 262 + 1)
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2025, 1, 2), datetime.date(2025, 1, 1)), 0)
+
+    def test_years_are_cached(self):
+        """Test that a counted year is not read again"""
+        working_calendar.working_days_between(datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+
+        with self.assertNumQueries(0):
+            for day in range(1, 29):
+                working_calendar.working_days_between(datetime.date(2025, 2, day), datetime.date(2025, 12, 31))
+
+    @override_settings(WORKING_CALENDAR_WEEKEND=(4, 5))
+    def test_configurable_weekend(self):
+        """Test a Friday and Saturday weekend"""
+        self.assertEqual(working_calendar.working_days_between(datetime.date(2025, 3, 7), datetime.date(2025, 3, 9)), 1)
+
+
+class LeaveWorkingDaysTestCase(TestCase):
+    """Test cases for charging leave in working days"""
+
+    def setUp(self):
+        """Set up test data"""
+        working_calendar.clear()
+        self.addCleanup(working_calendar.clear)
+        self.employee = create_employee('john')
+
+    def create_leave(self, leave_type, start_date, end_date):
+        return Leave.objects.create(employee=self.employee, leave_type=leave_type, start_date=start_date,
+                                    end_date=end_date)
+
+    def test_days_taken_skip_weekends_and_holidays(self):
+        """Test that a leave over a weekend and a holiday is charged its working days"""
+        PublicHoliday.objects.create(date=datetime.date(2025, 3, 31), name='Eid al-Fitr')
+
+        leave = self.create_leave('Annual', datetime.date(2025, 3, 27), datetime.date(2025, 4, 2))
+
+        self.assertEqual(leave.days_taken, 4)
+
+    def test_maternity_leave_counts_calendar_days(self):
+        """Test that leave types charged in calendar days keep counting weekends"""
+        leave = self.create_leave('Maternity', datetime.date(2025, 3, 1), datetime.date(2025, 3, 9))
+
+        self.assertEqual(leave.days_taken, 9)
+
+    def test_weekend_only_leave_is_rejected(self):
+        """Test that a leave with nothing to charge cannot be filed"""
+        client = APIClient()
+        client.force_authenticate(self.employee.user)
+
+        response = client.post('/api/leaves/leaves/', {
+            'leave_type': 'Annual', 'start_date': '2025-03-08', 'end_date': '2025-03-09', 'days_taken': '2',
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('weekends or public holidays', str(response.data))
+        self.assertFalse(Leave.objects.exists())
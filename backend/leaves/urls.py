@@ -8,8 +8,12 @@ from .views import (
     RejectLeaveAPIView, 
     LeaveBalanceListCreateAPIView,
     LeaveBalanceUpdateAPIView,
+    LeaveBalanceHistoryAPIView,
+    LeaveRangeAPIView,
+    LeaveAvailabilityAPIView,
     LeaveApproveAPIView,
     LeaveRejectAPIView,
+    LeaveBulkDecisionAPIView,
     EmployeeLeaveListAPIView,
     EmployeeApprovedLeaveListAPIView,
     AdminLeaveSummaryAPIView,
@@ -22,11 +26,16 @@ urlpatterns = [
     path('employee/leaves/<int:pk>', LeaveDetailAPIView.as_view(), name='leave_detail'),
     path('employee/leaves-requests/', EmployeeLeaveListAPIView.as_view(), name='employee_leave_list'),
     path('employee/approve/leaves-requests/', EmployeeApprovedLeaveListAPIView.as_view(), name='employee_leave_list_APPROVED'),
+    path('leaves/range/', LeaveRangeAPIView.as_view(), name='leave-range'),
+    path('leaves/availability/', LeaveAvailabilityAPIView.as_view(), name='leave-availability'),
+    path('leaves/bulk-decision/', LeaveBulkDecisionAPIView.as_view(), name='leave-bulk-decision'),
     path('leaves/<int:pk>/approve/', LeaveApproveAPIView.as_view(), name='leave-approve'),
     path('leaves/<int:pk>/reject/', LeaveRejectAPIView.as_view(), name='leave-reject'),
     path('leaves/employee-leave-balance', LeaveBalanceAPIView.as_view(), name='employee-leave-balance'),
     path('leave-balances/', LeaveBalanceListCreateAPIView.as_view(), name='leave-balance-list-create'),
     path('leave-balances/<int:pk>/', LeaveBalanceUpdateAPIView.as_view(), name='leave-balance-update'),
+    path('leave-balances/employee/<int:employee_id>/history/', LeaveBalanceHistoryAPIView.as_view(),
+         name='leave-balance-history'),
     path('accrue-leave/', LeaveAccrualAPIView.as_view(), name='accrue_leave'),
     path('manual-accrue/', ManualLeaveAccrualAPIView.as_view(), name='manual_accrue'),
     path('admin/leave/<int:pk>/reject/', RejectLeaveAPIView.as_view(), name='reject-leave'),
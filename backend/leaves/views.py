@@ -2,46 +2,58 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import Leave, LeaveBalance, LeaveAccrual
-from .serializers import LeaveSerializer, LeaveBalanceSerializer, LeaveAccrualSerializer, AdminCreateLeaveSerializer
+from .serializers import (
+    LeaveSerializer, LeaveBalanceSerializer, LeaveAccrualSerializer, AdminCreateLeaveSerializer, LeaveLedgerEntrySerializer,
+    LeaveBulkDecisionSerializer
+)
 from employees.models import Employee
+import datetime
+from collections import Counter
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Case, When, Value, IntegerField, Sum
+from django.utils.dateparse import parse_date
 from django.utils.timezone import now
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from payroll.pagination import KeysetPagination
+from .constants import (
+    LEAVE_LIST_ORDERING, LEAVE_BALANCE_FIELDS, LEDGER_OPENING, LEDGER_ADJUSTMENT, AVAILABILITY_MAX_DAYS
+)
+from .filters import LeaveFilter
+from .services import LeaveService, LeaveAccrualService, LeaveLedgerService, LeaveAvailabilityService
+
+
+class LeaveKeysetPagination(KeysetPagination):
+    ordering = LEAVE_LIST_ORDERING
+
+
+def leave_queryset():
+    """Leaves with the employee and approver LeaveSerializer nests joined in, so lists run a single query"""
+    return Leave.objects.select_related('employee', 'approved_by')
 
 
 # List and create leave
 class LeaveListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = LeaveSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LeaveKeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = LeaveFilter
 
     def get_queryset(self):
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Leave.objects.annotate(
-                custom_order=Case(
-                    When(status='Pending', then=Value(0)),
-                    When(status='Approved', then=Value(1)),
-                    When(status='Rejected', then=Value(2)),
-                    default=Value(3),
-                    output_field=IntegerField()
-                )
-            ).order_by('custom_order', '-applied_on')
+            return leave_queryset().order_by(*LEAVE_LIST_ORDERING)
         employee = get_object_or_404(Employee, user=self.request.user)
-        return Leave.objects.filter(employee=employee).annotate(
-            custom_order=Case(
-                When(status='Pending', then=Value(0)),
-                When(status='Approved', then=Value(1)),
-                When(status='Rejected', then=Value(2)),
-                default=Value(3),
-                output_field=IntegerField()
-            )
-        ).order_by('custom_order', '-applied_on')
+        return leave_queryset().filter(employee=employee).order_by(*LEAVE_LIST_ORDERING)
 
     def perform_create(self, serializer):
-        employee = get_object_or_404(Employee, user=self.request.user)
-        serializer.save(employee=employee)
+        # The serializer looked the employee up to check the leave against their other leaves
+        if serializer.validated_data.get('employee') is None:
+            raise Http404("No Employee matches the given query.")
+        serializer.save()
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -77,7 +89,7 @@ class LeaveDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         employee = get_object_or_404(Employee, user=self.request.user)
-        return Leave.objects.filter(employee=employee)
+        return leave_queryset().filter(employee=employee)
     
 
 class EmployeeLeaveListAPIView(generics.ListAPIView):
@@ -86,7 +98,7 @@ class EmployeeLeaveListAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         employee = get_object_or_404(Employee, user=self.request.user)
-        return Leave.objects.filter(employee=employee)
+        return leave_queryset().filter(employee=employee)
     
 class EmployeeApprovedLeaveListAPIView(generics.ListAPIView):
     serializer_class = LeaveSerializer
@@ -94,7 +106,7 @@ class EmployeeApprovedLeaveListAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         employee = get_object_or_404(Employee, user=self.request.user)
-        return Leave.objects.filter(employee=employee).filter(status='Approved')
+        return leave_queryset().filter(employee=employee).filter(status='Approved')
     
 
 class AdminLeaveSummaryAPIView(generics.ListAPIView):
@@ -102,14 +114,55 @@ class AdminLeaveSummaryAPIView(generics.ListAPIView):
     permission_classes = [IsAdminUser]
 
     def get_queryset(self):
-        return Leave.objects.filter(status='Approved')
+        return leave_queryset().filter(status='Approved')
 
     
+class LeaveRangeAPIView(generics.ListAPIView):
+    """Leaves overlapping ?start=..&end=.. (inclusive dates), optionally by status, department or employee"""
+    serializer_class = LeaveSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        start_date, end_date = parse_date(params.get('start', '')), parse_date(params.get('end', ''))
+        if start_date is None or end_date is None:
+            raise ValidationError({'error': 'start and end must be dates (YYYY-MM-DD)'})
+        if start_date > end_date:
+            raise ValidationError({'error': 'end must not be before start'})
+        leaves = LeaveService.get_leaves_between(start_date, end_date, leave_queryset())
+        if params.get('status'):
+            leaves = leaves.filter(status=params['status'])
+        if params.get('department'):
+            leaves = leaves.filter(employee__department=params['department'])
+        if params.get('employee'):
+            if not params['employee'].isdigit():
+                raise ValidationError({'error': 'employee must be an employee id'})
+            leaves = leaves.filter(employee_id=params['employee'])
+        return leaves.order_by('start_date', 'id')
+
+
+class LeaveAvailabilityAPIView(APIView):
+    """Employees on approved leave per day and department over ?start=..&end=.. (at most a quarter)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        start_date, end_date = parse_date(params.get('start', '')), parse_date(params.get('end', ''))
+        if start_date is None or end_date is None:
+            raise ValidationError({'error': 'start and end must be dates (YYYY-MM-DD)'})
+        if start_date > end_date:
+            raise ValidationError({'error': 'end must not be before start'})
+        if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+            raise ValidationError({'error': f'The window cannot be longer than {AVAILABILITY_MAX_DAYS} days'})
+        heatmap = LeaveAvailabilityService.get_heatmap(start_date, end_date, params.get('department') or None)
+        return Response(heatmap, status=status.HTTP_200_OK)
+
+
 class LeaveApproveAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        leave = get_object_or_404(Leave, pk=pk)
+        leave = get_object_or_404(leave_queryset(), pk=pk)
         leave.approve_leave(approver=request.user)
         serializer = LeaveSerializer(leave)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -119,12 +172,29 @@ class LeaveRejectAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        leave = get_object_or_404(Leave, pk=pk)
+        leave = get_object_or_404(leave_queryset(), pk=pk)
         leave.reject_leave(approver=request.user)
         serializer = LeaveSerializer(leave)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class LeaveBulkDecisionAPIView(APIView):
+    """Approve or reject many pending leaves at once: {"ids": [...], "decision": "approve" | "reject"}"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = LeaveBulkDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = LeaveService.decide_leaves(
+            serializer.validated_data['ids'], serializer.validated_data['decision'], request.user
+        )
+        return Response({
+            'decision': serializer.validated_data['decision'],
+            'summary': Counter(result['outcome'] for result in results),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
 """Leave balance and accrual management"""
 # Leave balance for logged-in user
 class LeaveBalanceAPIView(APIView):
@@ -137,7 +207,7 @@ class LeaveBalanceAPIView(APIView):
         employee = Employee.objects.filter(user=user_id).first()
         if not employee:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
-        balance = get_object_or_404(LeaveBalance, employee=employee)
+        balance = get_object_or_404(LeaveBalance.objects.select_related('employee'), employee=employee)
         serializer = LeaveBalanceSerializer(balance)
         return Response(serializer.data)
     
@@ -149,16 +219,58 @@ class LeaveBalanceListCreateAPIView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         employee = serializer.validated_data['employee']
-        leave_balance, created = LeaveBalance.objects.update_or_create(
-            employee=employee,
-            defaults=serializer.validated_data
-        )
+        with transaction.atomic():
+            # update_or_create, keeping the previous balances to record what changed
+            leave_balance = LeaveBalance.objects.select_for_update().filter(employee=employee).first()
+            if leave_balance is None:
+                before, kind = dict.fromkeys(LEAVE_BALANCE_FIELDS, 0), LEDGER_OPENING
+                leave_balance = LeaveBalance.objects.create(**serializer.validated_data)
+            else:
+                before, kind = LeaveLedgerService.get_balances(leave_balance), LEDGER_ADJUSTMENT
+                for field, value in serializer.validated_data.items():
+                    setattr(leave_balance, field, value)
+                leave_balance.save()
+            LeaveLedgerService.record_changes(employee.id, before, LeaveLedgerService.get_balances(leave_balance),
+                                              kind, self.request.user)
 
 class LeaveBalanceUpdateAPIView(generics.RetrieveUpdateAPIView):
     queryset = LeaveBalance.objects.all()
     serializer_class = LeaveBalanceSerializer
     permission_classes = [IsAdminUser]
 
+    def perform_update(self, serializer):
+        """Save the edit and record what it changed in the leave ledger"""
+        with transaction.atomic():
+            # Re-read the row under lock so a concurrent approval can't slip between the read and the save
+            serializer.instance = LeaveBalance.objects.select_for_update().get(pk=serializer.instance.pk)
+            before = LeaveLedgerService.get_balances(serializer.instance)
+            leave_balance = serializer.save()
+            LeaveLedgerService.record_changes(leave_balance.employee_id, before,
+                                              LeaveLedgerService.get_balances(leave_balance),
+                                              LEDGER_ADJUSTMENT, self.request.user)
+
+class LeaveBalanceHistoryAPIView(APIView):
+    """An employee's balances as of a date (default today) and the ledger entries since the snapshot they start from"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, employee_id):
+        employee = get_object_or_404(Employee, id=employee_id)
+        as_of = timezone.localdate()
+        if request.query_params.get('as_of'):
+            as_of = parse_date(request.query_params['as_of'])
+            if as_of is None:
+                return Response({'error': 'as_of must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        # Balances at the end of the day
+        at = timezone.make_aware(datetime.datetime.combine(as_of + datetime.timedelta(days=1), datetime.time.min))
+        balances, snapshot, entries = LeaveLedgerService.get_balances_at(employee.id, at)
+        return Response({
+            'employee': employee.id,
+            'as_of': as_of,
+            'balances': balances,
+            'snapshot_as_of': snapshot.as_of if snapshot else None,
+            'entries': LeaveLedgerEntrySerializer(entries, many=True).data,
+        })
+
 # Accrue leave manually if needed
 class LeaveAccrualAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -174,19 +286,12 @@ class ManualLeaveAccrualAPIView(APIView):
     permission_classes = [IsAdminUser]
 
     def post(self, request):
+        """Run this month's accrual now; the scheduled run then finds it done and does nothing"""
         today = timezone.now().date()
-
-        for employee in Employee.objects.all():
-            leave_balance, _ = LeaveBalance.objects.get_or_create(employee=employee)
-            leave_balance.annual_leave_balance += 1.83
-            leave_balance.save()
-
-            accrual, _ = LeaveAccrual.objects.get_or_create(employee=employee)
-            accrual.leave_balance = leave_balance.annual_leave_balance
-            accrual.last_accrued_date = today
-            accrual.save()
-
-        return Response({'message': 'Leave accrued for all employees'})
+        run = LeaveAccrualService.accrue_month(today)
+        if run is None:
+            return Response({'message': f'Leave for {today.month}/{today.year} is already accrued.'})
+        return Response({'message': f'Leave accrued for {run.employees_accrued} employees'})
     
 
 class ApproveLeaveAPIView(APIView):
@@ -0,0 +1,71 @@
+"""
+The working-day calendar shared by leave and payroll.
+
+Each year is precomputed into a cumulative count of its working days, so the working days
+between two dates are two lookups per year spanned. Weekends come from the
+WORKING_CALENDAR_WEEKEND setting and holidays from PublicHoliday. A process keeps a year for
+WORKING_CALENDAR_CACHE_SECONDS; saving or deleting a holiday clears it in that process at once.
+"""
+import calendar
+import datetime
+import time
+from array import array
+from django.conf import settings
+from .constants import WEEKEND_DAYS, WORKING_CALENDAR_CACHE_SECONDS
+from .models import PublicHoliday
+
+
+class WorkingCalendar:
+    """Working days per year, counted once and looked up by day of the year"""
+
+    def __init__(self):
+        self._years = {}
+
+    def get_weekend(self):
+        return frozenset(getattr(settings, 'WORKING_CALENDAR_WEEKEND', WEEKEND_DAYS))
+
+    def build_year(self, year):
+        """``counts[n]`` is the number of working days among the first ``n`` days of the year"""
+        weekend = self.get_weekend()
+        holidays = set(PublicHoliday.objects.filter(date__year=year).values_list('date', flat=True))
+        day = datetime.date(year, 1, 1)
+        one_day = datetime.timedelta(days=1)
+        counts = array('H', [0])
+        total = 0
+        for _ in range(366 if calendar.isleap(year) else 365):
+            if day.weekday() not in weekend and day not in holidays:
+                total += 1
+            counts.append(total)
+            day += one_day
+        return counts
+
+    def get_year(self, year):
+        cached = self._years.get(year)
+        now = time.monotonic()
+        if cached is None or cached[0] <= now:
+            cached = (now + WORKING_CALENDAR_CACHE_SECONDS, self.build_year(year))
+            self._years[year] = cached
+        return cached[1]
+
+    def working_days_between(self, start_date, end_date):
+        """Working days from ``start_date`` to ``end_date``, both included; 0 when the range is empty"""
+        if end_date < start_date:
+            return 0
+        total = 0
+        for year in range(start_date.year, end_date.year + 1):
+            counts = self.get_year(year)
+            first = start_date.timetuple().tm_yday if year == start_date.year else 1
+            last = end_date.timetuple().tm_yday if year == end_date.year else len(counts) - 1
+            total += counts[last] - counts[first - 1]
+        return total
+
+    def is_working_day(self, day):
+        counts = self.get_year(day.year)
+        day_of_year = day.timetuple().tm_yday
+        return counts[day_of_year] != counts[day_of_year - 1]
+
+    def clear(self):
+        self._years.clear()
+
+
+working_calendar = WorkingCalendar()
@@ -0,0 +1,115 @@
+"""
+Keyset (seek) pagination shared by the list endpoints.
+
+The cursor carries the ordering values of the last row of the page, and the next page is
+selected with a "row comes after these values" filter. Every page is an index range scan of
+the same cost, unlike OFFSET pagination whose cost grows with the page number.
+"""
+import base64
+import datetime
+import json
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over a fixed ordering whose last field is unique (usually the id).
+    It only applies when the client asks for it with ``page_size`` or ``cursor``;
+    otherwise the endpoint keeps returning the full list.
+    """
+    ordering = ('-id',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.next_values = None
+
+    def is_requested(self, request):
+        return (self.cursor_query_param in request.query_params
+                or self.page_size_query_param in request.query_params)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        values = [value.isoformat() if isinstance(value, (datetime.date, datetime.datetime))
+                  else str(value) if isinstance(value, Decimal) else value
+                  for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, TypeError):
+            raise NotFound('Invalid cursor.')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor.')
+        return values
+
+    def get_keyset_filter(self, values):
+        """(a, b, c) > (x, y, z) in the ordering's directions, expanded into OR-ed prefixes"""
+        condition = Q()
+        for index, (field, value) in enumerate(zip(self.ordering, values)):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            prefix = {f.lstrip('-'): v for f, v in zip(self.ordering[:index], values[:index])}
+            condition |= Q(**prefix, **{f'{name}__{lookup}': value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                # Values are converted to the fields' types here, so a tampered cursor fails now
+                queryset = queryset.filter(self.get_keyset_filter(self.decode_cursor(cursor)))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound('Invalid cursor.')
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_values = None
+        if len(rows) > page_size:
+            last = page[-1]
+            self.next_values = [getattr(last, field.lstrip('-')) for field in self.ordering]
+        return page
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
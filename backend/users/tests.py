@@ -3,3 +3,4 @@ Tests for the users application - Main test runner
 This file imports and runs all tests from the organized test files
 """
 from users.tests.test_models import *
+from users.tests.test_query_budgets import *
@@ -0,0 +1,44 @@
+"""
+Query budget tests for the user endpoints
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from employees.tests.test_query_budgets import QueryBudgetMixin
+
+
+class UserQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets of the authentication and user endpoints"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        # Rate limit counters live in the cache
+        cache.clear()
+        self.admin.set_password('Str0ng!Password')
+        self.admin.save()
+
+    def test_login(self):
+        self.assertQueryBudget(3, 'post', '/api/users/login/',
+                               {'username': 'admin', 'password': 'Str0ng!Password'})
+
+    def test_register(self):
+        self.assertQueryBudget(3, 'post', '/api/users/register/', {
+            'username': 'newuser', 'email': 'newuser@example.com', 'password': 'Str0ng!Password1',
+        }, status_code=201)
+
+    def test_user_list(self):
+        self.client.force_authenticate(self.admin)
+        self.assertConstantQueries(1, '/api/users/list/')
+
+    def test_logout(self):
+        self.client.force_authenticate(self.admin)
+        refresh = RefreshToken.for_user(self.admin)
+        self.assertQueryBudget(6, 'post', '/api/users/logout/', {'refresh_token': str(refresh)})
+
+    def test_change_password(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(1, 'post', '/api/users/change-password/', {
+            'current_password': 'Str0ng!Password', 'new_password': 'N3w!Password12',
+            'confirm_password': 'N3w!Password12',
+        })